@@ -1,5 +1,6 @@
 from .agent import AIAgent
 from .note_analyzer import NoteAnalyzer
+from .batch_analyzer import BatchNoteAnalyzer
 from .web_scraper import WebScraper
 from .calendar_manager import CalendarManager
 from .router import router
@@ -7,6 +8,7 @@ from .router import router
 __all__ = [
     "AIAgent",
     "NoteAnalyzer", 
+    "BatchNoteAnalyzer",
     "WebScraper",
     "CalendarManager",
     "router"
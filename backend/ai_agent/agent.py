@@ -21,6 +21,8 @@ from .web_scraper import WebScraper
 from .note_analyzer import NoteAnalyzer
 from .calendar_manager import CalendarManager
 from .prompts import AGENT_PROMPTS
+from .semantic_index import semantic_index
+from config import settings
 
 
 class AIAgent:
@@ -225,13 +227,14 @@ class AIAgent:
             )
             step_note_db = await notes_crud.create_note(self.db, step_note, self.user.id)
             step_notes.append(step_note_db)
-            
-            # Создаем связь с основной заметкой
-            connection = NoteConnectionCreate(
-                note_b_id=step_note_db.id,
-                relation="PLAN_STEP"
-            )
-            await notes_crud.create_connection(self.db, main_note_db.id, connection, self.user.id)
+        
+        # Связываем этапы с основной заметкой одним запросом
+        await notes_crud.create_connections(
+            self.db,
+            main_note_db.id,
+            [NoteConnectionCreate(note_b_id=step_note_db.id, relation="PLAN_STEP") for step_note_db in step_notes],
+            self.user.id
+        )
         
         # Сообщение в зависимости от языка
         language = analysis.get("language", "ru")
@@ -495,20 +498,47 @@ class AIAgent:
         """
         Создание автоматических связей с существующими заметками
         """
-        # Получаем все заметки пользователя
-        user_notes = await notes_crud.get_user_notes(self.db, self.user.id, 0, 1000)
+        # Кандидаты по косинусной близости (саму заметку индексирует notes.crud)
+        try:
+            candidates = await semantic_index.search(
+                self.user.id, content, k=settings.SEMANTIC_CANDIDATES_K, exclude_ids={note_id}
+            )
+        except Exception as e:
+            print(f"Ошибка семантического поиска кандидатов: {e}")
+            candidates = []
+        
+        candidate_ids = [candidate_id for candidate_id, _ in candidates]
+        if not candidate_ids:
+            # Индекс еще строится - берем последние заметки пользователя
+            result = await self.db.execute(
+                select(Note.id)
+                .where(Note.user_id == self.user.id, Note.id != note_id)
+                .order_by(Note.id.desc())
+                .limit(settings.SEMANTIC_CANDIDATES_K)
+            )
+            candidate_ids = list(result.scalars().all())
+        if not candidate_ids:
+            return
+        
+        result = await self.db.execute(
+            select(Note).filter(Note.id.in_(candidate_ids), Note.user_id == self.user.id)
+        )
+        notes_by_id = {note.id: note for note in result.scalars().all()}
+        user_notes = [notes_by_id[candidate_id] for candidate_id in candidate_ids if candidate_id in notes_by_id]
         
         # Анализируем связи
         connections = await self.note_analyzer.find_connections(content, user_notes)
         
-        # Создаем связи
-        for connection in connections:
-            if connection["note_id"] != note_id:
-                conn_data = NoteConnectionCreate(
-                    note_b_id=connection["note_id"],
-                    relation=connection["relation"]
-                )
-                await notes_crud.create_connection(self.db, note_id, conn_data, self.user.id)
+        # Создаем связи одним запросом (связь с самой собой и существующие пропускаются)
+        await notes_crud.create_connections(
+            self.db,
+            note_id,
+            [
+                NoteConnectionCreate(note_b_id=connection["note_id"], relation=connection["relation"])
+                for connection in connections
+            ],
+            self.user.id
+        )
     
     async def _schedule_link_search(self, note_id: int, content: str) -> None:
         """
@@ -570,6 +600,7 @@ class AIAgent:
             links = await self.web_scraper.search_related_content(note.content)
             
             # Создаем заметки с найденными ссылками
+            link_connections = []
             for link in links:
                 link_note = NoteCreate(
                     title=f"Связанная ссылка: {link['title']}",
@@ -577,13 +608,10 @@ class AIAgent:
                 )
                 
                 link_note_db = await notes_crud.create_note(self.db, link_note, self.user.id)
-                
-                # Создаем связь с исходной заметкой
-                connection = NoteConnectionCreate(
-                    note_b_id=link_note_db.id,
-                    relation="RELATED_LINK"
-                )
-                await notes_crud.create_connection(self.db, note.id, connection, self.user.id)
+                link_connections.append(NoteConnectionCreate(note_b_id=link_note_db.id, relation="RELATED_LINK"))
+            
+            # Связываем их с исходной заметкой одним запросом
+            await notes_crud.create_connections(self.db, note.id, link_connections, self.user.id)
     
     async def _reorganize_notes(self):
         """
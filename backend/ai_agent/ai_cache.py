@@ -0,0 +1,51 @@
+import hashlib
+from datetime import timedelta
+from functools import lru_cache
+from typing import Any
+
+from .prompts import AGENT_PROMPTS
+
+# Единое пространство ключей кеша результатов AI для API, агента и Celery:
+#   aicache:<схема>:<вид>:<модель>:<версия промпта>[:<параметры>]:<sha256 текста>
+# Версия промпта - хеш его текста, поэтому изменение prompts.py
+# автоматически делает старые записи недоступными (они истекут по TTL).
+AI_CACHE_PREFIX = "aicache"
+# Версия структуры записей: менять при изменении формата сохраняемых результатов
+AI_CACHE_SCHEMA = "v1"
+
+# Модель полного и пакетного анализа заметок
+ANALYSIS_MODEL = "gpt-4o-mini"
+# Полный и пакетный анализ возвращают одинаковую нормализованную структуру
+# и делят одни записи кеша
+ANALYSIS_PROMPTS = ("full_analysis", "batch_analysis")
+ANALYSIS_CACHE_TTL = timedelta(days=7)
+
+
+def content_hash(text: str) -> str:
+    """Хеш текста заметки"""
+    return hashlib.sha256((text or "").encode()).hexdigest()
+
+
+def prompt_version(*templates: str) -> str:
+    """Версия набора шаблонов промптов (короткий хеш их текста)"""
+    digest = hashlib.md5("\x00".join(templates).encode()).hexdigest()
+    return digest[:10]
+
+
+@lru_cache(maxsize=None)
+def agent_prompt_version(*names: str) -> str:
+    """Версия промптов из AGENT_PROMPTS по именам"""
+    return prompt_version(*(AGENT_PROMPTS[name] for name in names))
+
+
+def ai_cache_key(kind: str, content: str, version: str, model: str, *params: Any) -> str:
+    """Ключ результата AI для текста с учетом версии промпта, модели и параметров"""
+    parts = [AI_CACHE_PREFIX, AI_CACHE_SCHEMA, kind, model, version]
+    parts.extend(str(param) for param in params)
+    parts.append(content_hash(content))
+    return ":".join(parts)
+
+
+def analysis_cache_key(content: str) -> str:
+    """Ключ полного анализа заметки (NoteAnalyzer.analyze_all и BatchNoteAnalyzer)"""
+    return ai_cache_key("analysis", content, agent_prompt_version(*ANALYSIS_PROMPTS), ANALYSIS_MODEL)
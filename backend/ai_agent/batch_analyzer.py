@@ -0,0 +1,184 @@
+import asyncio
+import json
+from typing import List, Dict, Any, Optional, Sequence, Set, Tuple
+
+from redis_config import ai_result_cache
+from .note_analyzer import NoteAnalyzer
+from .prompts import AGENT_PROMPTS
+from .ai_cache import ANALYSIS_MODEL, ANALYSIS_CACHE_TTL, analysis_cache_key
+
+
+class BatchNoteAnalyzer:
+    """
+    Пакетный анализ заметок.
+    Упаковывает несколько коротких заметок в один запрос к модели в пределах
+    бюджета токенов и выполняет пакеты параллельно с ограничением по количеству
+    одновременных запросов. Результаты возвращаются по ID заметки.
+    """
+
+    def __init__(
+        self,
+        note_analyzer: Optional[NoteAnalyzer] = None,
+        token_budget: int = 3000,
+        max_notes_per_batch: int = 20,
+        max_concurrency: int = 4,
+        max_note_chars: int = 1500
+    ):
+        self.note_analyzer = note_analyzer or NoteAnalyzer()
+        self.token_budget = token_budget
+        self.max_notes_per_batch = max_notes_per_batch
+        self.max_concurrency = max_concurrency
+        self.max_note_chars = max_note_chars
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """
+        Грубая оценка количества токенов (кириллица ~3 символа на токен)
+        """
+        return len(text) // 3 + 1
+
+    def pack(self, notes: Sequence[Tuple[int, str]]) -> List[List[Tuple[int, str]]]:
+        """
+        Жадная упаковка заметок в пакеты в пределах бюджета токенов
+        """
+        batches: List[List[Tuple[int, str]]] = []
+        current: List[Tuple[int, str]] = []
+        current_tokens = 0
+
+        for note_id, content in notes:
+            content = (content or "")[:self.max_note_chars]
+            # +20 токенов на JSON-обертку заметки в промпте
+            tokens = self.estimate_tokens(content) + 20
+
+            if current and (
+                current_tokens + tokens > self.token_budget
+                or len(current) >= self.max_notes_per_batch
+            ):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+
+            current.append((note_id, content))
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+
+        return batches
+
+    async def analyze(self, notes: Sequence[Tuple[int, str]]) -> Dict[int, Dict[str, Any]]:
+        """
+        Анализ списка заметок (id, content). Возвращает {note_id: анализ}
+        """
+        results, _ = await self.analyze_with_cache_info(notes)
+        return results
+
+    async def analyze_with_cache_info(
+        self,
+        notes: Sequence[Tuple[int, str]]
+    ) -> Tuple[Dict[int, Dict[str, Any]], Set[int]]:
+        """
+        Анализ списка заметок с общим кешем результатов AI.
+        Возвращает {note_id: анализ} и множество ID, взятых из кеша.
+        В модель отправляются только заметки, которых нет в кеше.
+        """
+        if not notes:
+            return {}, set()
+
+        contents = {note_id: content or "" for note_id, content in notes}
+        keys = {note_id: analysis_cache_key(content) for note_id, content in contents.items()}
+
+        results: Dict[int, Dict[str, Any]] = {}
+        cached_ids: Set[int] = set()
+        cached_values = await ai_result_cache.get_many(list(keys.values()))
+        for (note_id, _), cached in zip(keys.items(), cached_values):
+            if cached:
+                # Копия: объект из кеша в памяти общий для всех запросов
+                results[note_id] = dict(cached)
+                cached_ids.add(note_id)
+
+        pending = [(note_id, content) for note_id, content in notes if note_id not in results]
+        if not pending:
+            return results, cached_ids
+
+        batches = self.pack(pending)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(batch: List[Tuple[int, str]]) -> Tuple[Dict[int, Dict[str, Any]], Set[int]]:
+            async with semaphore:
+                return await self._analyze_batch(batch)
+
+        batch_results = await asyncio.gather(*(run(batch) for batch in batches), return_exceptions=True)
+
+        to_cache: Dict[str, Dict[str, Any]] = {}
+        for batch, batch_result in zip(batches, batch_results):
+            if isinstance(batch_result, Exception):
+                print(f"Ошибка пакетного анализа: {batch_result}")
+                batch_result = ({}, set())
+            analyses, answered = batch_result
+            for note_id, _ in batch:
+                # Заметки, которые модель пропустила, анализируем эвристиками
+                results[note_id] = analyses.get(note_id) or self.note_analyzer._normalize_analysis(contents[note_id], {})
+                # Кешируем только ответы модели, эвристики - нет
+                if note_id in answered:
+                    to_cache[keys[note_id]] = results[note_id]
+
+        await ai_result_cache.set_many(to_cache, ttl=ANALYSIS_CACHE_TTL)
+        return results, cached_ids
+
+    async def _analyze_batch(self, batch: List[Tuple[int, str]]) -> Tuple[Dict[int, Dict[str, Any]], Set[int]]:
+        """
+        Анализ одного пакета заметок одним запросом к модели.
+        Возвращает анализы по ID и множество ID, на которые ответила модель.
+        """
+        if len(batch) == 1:
+            note_id, content = batch[0]
+            if len(content.strip()) < 10:
+                return {note_id: self.note_analyzer._normalize_analysis(content, {})}, set()
+            try:
+                return {note_id: await self.note_analyzer._request_full_analysis(content)}, {note_id}
+            except Exception as e:
+                print(f"Ошибка полного анализа AI: {e}")
+                return {note_id: self.note_analyzer._normalize_analysis(content, {})}, set()
+
+        notes_payload = [
+            {"id": note_id, "content": content}
+            for note_id, content in batch
+            if len(content.strip()) >= 10
+        ]
+
+        items: List[Any] = []
+        if notes_payload:
+            try:
+                prompt = AGENT_PROMPTS["batch_analysis"].format(
+                    notes=json.dumps(notes_payload, ensure_ascii=False)
+                )
+
+                response = await self.note_analyzer.openai_client.chat.completions.create(
+                    model=ANALYSIS_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.2,
+                    max_tokens=min(4000, 250 * len(notes_payload)),
+                    response_format={"type": "json_object"}
+                )
+
+                data = json.loads(response.choices[0].message.content)
+                items = data.get("results", []) if isinstance(data, dict) else []
+
+            except Exception as e:
+                print(f"Ошибка анализа пакета из {len(batch)} заметок: {e}")
+
+        by_id: Dict[int, Dict[str, Any]] = {}
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            try:
+                by_id[int(item.get("id"))] = item
+            except (TypeError, ValueError):
+                continue
+
+        analyses = {
+            note_id: self.note_analyzer._normalize_analysis(content, by_id.get(note_id, {}))
+            for note_id, content in batch
+        }
+        return analyses, set(by_id) & set(analyses)
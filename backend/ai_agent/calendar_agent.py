@@ -1,17 +1,21 @@
+import asyncio
+import json
 import re
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Optional, List, Dict, Any
-from sqlalchemy.orm import Session
-from openai import OpenAI
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from openai import AsyncOpenAI
 
 from models import Note, NoteCalendarEvent
 from auth.google_oauth import google_oauth_service
+from google_calendar.client import calendar_client
 from config import settings
 
 
 class CalendarAgent:
     def __init__(self):
-        self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         
         # Шаблоны для определения временных выражений
         self.time_patterns = [
@@ -50,7 +54,7 @@ class CalendarAgent:
             'врач', 'доктор', 'прием', 'визит', 'поход', 'поездка'
         ]
 
-    def analyze_note_for_events(self, db: Session, note: Note, user_id: int) -> List[NoteCalendarEvent]:
+    async def analyze_note_for_events(self, db: AsyncSession, note: Note, user_id: int) -> List[NoteCalendarEvent]:
         """Анализировать заметку на предмет событий календаря"""
         
         # Проверить, есть ли в заметке временные маркеры
@@ -58,40 +62,52 @@ class CalendarAgent:
             return []
         
         # Использовать GPT для анализа и извлечения событий
-        events_data = self._extract_events_with_gpt(note.content)
+        events_data = await self._extract_events_with_gpt(note.content)
+        if not events_data:
+            return []
+        
+        # Один токен на все события заметки
+        try:
+            access_token = await google_oauth_service.get_access_token(db, user_id)
+        except Exception as e:
+            print(f"Ошибка подключения к Google Calendar: {e}")
+            return []
+        
+        # События создаются в Google Calendar параллельно
+        google_events = await asyncio.gather(*(
+            self._create_google_event(access_token, event_data, note)
+            for event_data in events_data
+        ))
         
         created_events = []
-        for event_data in events_data:
+        for event_data, google_event in zip(events_data, google_events):
+            if not google_event:
+                continue
             try:
-                # Создать событие в Google Calendar
-                calendar_service = google_oauth_service.get_calendar_service(db, user_id)
-                google_event = self._create_google_event(calendar_service, event_data, note)
+                # Сохранить связь в базе данных
+                note_event = NoteCalendarEvent(
+                    note_id=note.id,
+                    google_event_id=google_event['id'],
+                    calendar_id=event_data.get('calendar_id', 'primary'),
+                    event_title=event_data['title'],
+                    event_description=event_data.get('description', ''),
+                    start_datetime=datetime.fromisoformat(event_data['start_time'].replace('Z', '+00:00')),
+                    end_datetime=datetime.fromisoformat(event_data['end_time'].replace('Z', '+00:00')),
+                    location=event_data.get('location'),
+                    is_all_day=event_data.get('is_all_day', False),
+                    reminder_minutes=event_data.get('reminder_minutes', 30),
+                    created_by_ai=True
+                )
                 
-                if google_event:
-                    # Сохранить связь в базе данных
-                    note_event = NoteCalendarEvent(
-                        note_id=note.id,
-                        google_event_id=google_event['id'],
-                        calendar_id=event_data.get('calendar_id', 'primary'),
-                        event_title=event_data['title'],
-                        event_description=event_data.get('description', ''),
-                        start_datetime=datetime.fromisoformat(event_data['start_time'].replace('Z', '+00:00')),
-                        end_datetime=datetime.fromisoformat(event_data['end_time'].replace('Z', '+00:00')),
-                        location=event_data.get('location'),
-                        is_all_day=event_data.get('is_all_day', False),
-                        reminder_minutes=event_data.get('reminder_minutes', 30),
-                        created_by_ai=True
-                    )
-                    
-                    db.add(note_event)
-                    created_events.append(note_event)
+                db.add(note_event)
+                created_events.append(note_event)
                     
             except Exception as e:
                 print(f"Ошибка создания события: {e}")
                 continue
         
         if created_events:
-            db.commit()
+            await db.commit()
             
         return created_events
 
@@ -110,7 +126,7 @@ class CalendarAgent:
         
         return has_event_keywords and (has_time_patterns or has_date_patterns)
 
-    def _extract_events_with_gpt(self, note_content: str) -> List[Dict[str, Any]]:
+    async def _extract_events_with_gpt(self, note_content: str) -> List[Dict[str, Any]]:
         """Использовать GPT для извлечения событий из заметки с поддержкой языка"""
         
         # Определяем язык заметки
@@ -177,7 +193,7 @@ class CalendarAgent:
         try:
             user_message = f"Текст заметки:\n{note_content}" if is_russian else f"Note text:\n{note_content}"
             
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -189,14 +205,12 @@ class CalendarAgent:
             content = response.choices[0].message.content.strip()
             
             # Попытаться распарсить JSON
-            import json
             if content.startswith('[') and content.endswith(']'):
                 return json.loads(content)
             elif content.startswith('{') and content.endswith('}'):
                 return [json.loads(content)]
             else:
                 # Попытаться найти JSON в тексте
-                import re
                 json_match = re.search(r'\[.*\]', content, re.DOTALL)
                 if json_match:
                     return json.loads(json_match.group())
@@ -211,7 +225,7 @@ class CalendarAgent:
             print(f"Ошибка анализа с GPT: {e}")
             return []
 
-    def _create_google_event(self, calendar_service, event_data: Dict[str, Any], note: Note) -> Optional[Dict[str, Any]]:
+    async def _create_google_event(self, access_token: str, event_data: Dict[str, Any], note: Note) -> Optional[Dict[str, Any]]:
         """Создать событие в Google Calendar"""
         
         try:
@@ -240,47 +254,43 @@ class CalendarAgent:
                 event_body['location'] = event_data['location']
             
             # Создать событие
-            event = calendar_service.events().insert(
-                calendarId='primary',
-                body=event_body
-            ).execute()
-            
-            return event
+            return await calendar_client.insert_event(access_token, 'primary', event_body)
             
         except Exception as e:
             print(f"Ошибка создания Google события: {e}")
             return None
 
-    def get_note_events(self, db: Session, note_id: int) -> List[NoteCalendarEvent]:
+    async def get_note_events(self, db: AsyncSession, note_id: int) -> List[NoteCalendarEvent]:
         """Получить все события календаря для заметки"""
-        return db.query(NoteCalendarEvent).filter(
-            NoteCalendarEvent.note_id == note_id
-        ).all()
+        result = await db.execute(
+            select(NoteCalendarEvent).filter(NoteCalendarEvent.note_id == note_id)
+        )
+        return list(result.scalars().all())
 
-    def delete_note_events(self, db: Session, note_id: int, user_id: int):
+    async def delete_note_events(self, db: AsyncSession, note_id: int, user_id: int):
         """Удалить все события календаря для заметки"""
-        events = self.get_note_events(db, note_id)
+        events = await self.get_note_events(db, note_id)
         
         if not events:
             return
         
         try:
-            calendar_service = google_oauth_service.get_calendar_service(db, user_id)
+            access_token = await google_oauth_service.get_access_token(db, user_id)
+            
+            # Удалить из Google Calendar (параллельно)
+            results = await asyncio.gather(*(
+                calendar_client.delete_event(access_token, event.calendar_id, event.google_event_id)
+                for event in events
+            ), return_exceptions=True)
             
-            for event in events:
-                try:
-                    # Удалить из Google Calendar
-                    calendar_service.events().delete(
-                        calendarId=event.calendar_id,
-                        eventId=event.google_event_id
-                    ).execute()
-                except Exception as e:
-                    print(f"Ошибка удаления события {event.google_event_id}: {e}")
+            for event, result in zip(events, results):
+                if isinstance(result, Exception):
+                    print(f"Ошибка удаления события {event.google_event_id}: {result}")
                 
                 # Удалить из БД
-                db.delete(event)
+                await db.delete(event)
             
-            db.commit()
+            await db.commit()
             
         except Exception as e:
             print(f"Ошибка удаления событий: {e}")
@@ -5,7 +5,7 @@ from typing import Dict, List, Optional, Any
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from google_calendar.discovery import build_calendar_service
 from googleapiclient.errors import HttpError
 import json
 
@@ -57,7 +57,7 @@ class CalendarManager:
                     pickle.dump(self.credentials, token)
             
             # Создаем сервис
-            self.service = build('calendar', 'v3', credentials=self.credentials)
+            self.service = build_calendar_service(self.credentials)
             return True
             
         except Exception as e:
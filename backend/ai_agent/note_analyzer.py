@@ -2,7 +2,9 @@ import json
 import re
 from typing import List, Dict, Any, Optional
 import openai
+from redis_config import ai_result_cache
 from .prompts import AGENT_PROMPTS
+from .ai_cache import ANALYSIS_MODEL, ANALYSIS_CACHE_TTL, analysis_cache_key
 
 
 class NoteAnalyzer:
@@ -44,7 +46,12 @@ class NoteAnalyzer:
             "General": ["note", "record", "information", "miscellaneous", "other"]
         }
     }
-    
+
+    SUPPORTED_LANGUAGES = ['ru', 'en', 'es', 'fr', 'de', 'it', 'pt', 'zh', 'ja', 'ko']
+
+    # Сколько символов заметки отправляется в объединенный запрос анализа
+    FULL_ANALYSIS_MAX_CHARS = 4000
+
     def __init__(self, openai_client: Optional[openai.AsyncOpenAI] = None):
         self.openai_client = openai_client or openai.AsyncOpenAI()
     
@@ -68,7 +75,7 @@ class NoteAnalyzer:
             detected_lang = response.choices[0].message.content.strip().lower()
             
             # Проверяем на корректность
-            if detected_lang in ['ru', 'en', 'es', 'fr', 'de', 'it', 'pt', 'zh', 'ja', 'ko']:
+            if detected_lang in self.SUPPORTED_LANGUAGES:
                 return detected_lang
             else:
                 return "en"
@@ -97,7 +104,124 @@ class NoteAnalyzer:
             return "ru"
         else:
             return "en"
-    
+
+    async def analyze_all(self, content: str, refresh: bool = False) -> Dict[str, Any]:
+        """
+        Полный анализ заметки одним запросом к модели.
+        Возвращает язык, категорию, важность, резюме, теги, ключевые слова,
+        темы и настроение. Поля, которые модель не вернула или вернула
+        некорректно, заполняются эвристиками по ключевым словам.
+        Результаты модели кешируются по хешу текста, версии промпта и модели
+        (refresh=True - запросить модель заново).
+        """
+        if not content or len(content.strip()) < 10:
+            return self._normalize_analysis(content or "", {})
+
+        cache_key = analysis_cache_key(content)
+        try:
+            if refresh:
+                result = await self._request_full_analysis(content)
+                await ai_result_cache.set(cache_key, result, ttl=ANALYSIS_CACHE_TTL)
+            else:
+                result = await ai_result_cache.get_or_compute(
+                    cache_key,
+                    lambda: self._request_full_analysis(content),
+                    ttl=ANALYSIS_CACHE_TTL
+                )
+        except Exception as e:
+            # Эвристический результат при ошибке модели не кешируется
+            print(f"Ошибка полного анализа AI: {e}")
+            return self._normalize_analysis(content, {})
+
+        # Копия: объект из кеша в памяти общий для всех запросов
+        return dict(result)
+
+    async def _request_full_analysis(self, content: str) -> Dict[str, Any]:
+        """Запрос полного анализа к модели (без кеша, ошибки пробрасываются)"""
+        prompt = AGENT_PROMPTS["full_analysis"].format(content=content[:self.FULL_ANALYSIS_MAX_CHARS])
+
+        response = await self.openai_client.chat.completions.create(
+            model=ANALYSIS_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.2,
+            max_tokens=600,
+            response_format={"type": "json_object"}
+        )
+
+        data = json.loads(response.choices[0].message.content)
+        if not isinstance(data, dict):
+            raise ValueError("ответ модели не является JSON объектом")
+
+        return self._normalize_analysis(content, data)
+
+    def _normalize_analysis(self, content: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Проверка полей ответа модели с fallback на эвристики для каждого поля
+        """
+        is_short = len(content.strip()) < 10
+
+        language = data.get("language")
+        if not isinstance(language, str) or language.strip().lower() not in self.SUPPORTED_LANGUAGES:
+            language = self._detect_language_fallback(content) if content.strip() else "en"
+        else:
+            language = language.strip().lower()
+
+        category = data.get("category")
+        if not isinstance(category, str) or category.strip() not in self.CATEGORIES["en"]:
+            category = "General" if is_short else self._categorize_by_keywords(content, language)
+        else:
+            category = category.strip()
+
+        try:
+            importance = max(1, min(10, int(data.get("importance"))))
+        except (TypeError, ValueError):
+            importance = 3 if is_short else self._assess_importance_by_keywords(content)
+
+        summary = data.get("summary")
+        if not isinstance(summary, str) or not summary.strip():
+            summary = content[:200] + "..." if len(content) > 200 else content
+        else:
+            summary = summary.strip()
+
+        tags = self._clean_string_list(data.get("tags"), 5)
+        if tags is None:
+            tags = [] if is_short else self._extract_tags_by_keywords(content)
+
+        keywords = self._clean_string_list(data.get("keywords"), 10)
+        if keywords is None:
+            keywords = [] if is_short else self._extract_tags_by_keywords(content)
+
+        topics = self._clean_string_list(data.get("topics"), 5)
+        if topics is None:
+            topics = []
+
+        sentiment = data.get("sentiment")
+        if not isinstance(sentiment, str) or sentiment.strip().lower() not in ("positive", "negative", "neutral"):
+            sentiment = "neutral"
+        else:
+            sentiment = sentiment.strip().lower()
+
+        return {
+            "language": language,
+            "category": category,
+            "importance": importance,
+            "summary": summary,
+            "tags": tags,
+            "keywords": keywords,
+            "topics": topics,
+            "sentiment": sentiment,
+        }
+
+    @staticmethod
+    def _clean_string_list(value: Any, limit: int) -> Optional[List[str]]:
+        """
+        Список непустых строк из ответа модели или None, если формат неверный
+        """
+        if not isinstance(value, list):
+            return None
+        items = [str(item).strip() for item in value if isinstance(item, (str, int, float)) and str(item).strip()]
+        return items[:limit] if items else None
+
     async def categorize_note(self, content: str) -> str:
         """
         Улучшенная категоризация заметки с поддержкой языков
@@ -422,7 +546,8 @@ class NoteAnalyzer:
     
     async def find_connections(self, new_content: str, existing_notes: List[Any]) -> List[Dict[str, Any]]:
         """
-        Поиск связей между заметками
+        Поиск связей между заметками.
+        existing_notes - кандидаты, отсортированные по близости (см. SemanticIndex)
         """
         if not new_content or not existing_notes:
             return []
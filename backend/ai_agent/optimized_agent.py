@@ -1,14 +1,16 @@
 import asyncio
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
-import hashlib
 import json
 from concurrent.futures import ThreadPoolExecutor
 import openai
 
-from redis_config import cache
+from redis_config import ai_result_cache
 from models import Note
 from config import settings
+from .note_analyzer import NoteAnalyzer
+from .batch_analyzer import BatchNoteAnalyzer
+from .ai_cache import ai_cache_key, prompt_version
 
 class OptimizedAIAgent:
     """Оптимизированный AI агент с батчингом и кешированием"""
@@ -16,6 +18,7 @@ class OptimizedAIAgent:
     def __init__(self):
         self.client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         self.executor = ThreadPoolExecutor(max_workers=5)
+        self.batch_analyzer = BatchNoteAnalyzer(NoteAnalyzer(self.client))
         
         # Оптимизированные промпты
         self.prompts = {
@@ -37,44 +40,56 @@ Work, Learning, Personal, Finance, Health, Idea, Travel, Shopping, General.
 Теги:""",
         }
     
-    def _get_cache_key(self, prefix: str, text: str) -> str:
-        """Генерация ключа кеша"""
-        text_hash = hashlib.md5(text.encode()).hexdigest()
-        return f"ai:{prefix}:{text_hash}"
+    # Модель для видов анализа, где она используется (остальные - эвристики)
+    CACHE_MODELS = {'category': 'gpt-3.5-turbo'}
+    
+    def _get_cache_key(self, kind: str, text: str) -> str:
+        """Ключ в общем кеше результатов AI (с версией промпта и моделью)"""
+        if kind == "quick_analysis":
+            version = prompt_version(*self.prompts.values())
+        else:
+            version = prompt_version(self.prompts.get(kind, ""))
+        return ai_cache_key(f"agent_{kind}", text, version, self.CACHE_MODELS.get(kind, "heuristic"))
     
     async def batch_analyze(self, notes: List[Note]) -> List[Dict[str, Any]]:
-        """Пакетный анализ заметок"""
-        tasks = []
-        for note in notes:
-            task = self.analyze_note(note)
-            tasks.append(task)
-        
-        # Выполняем все анализы параллельно
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        """
+        Пакетный анализ заметок: некешированные заметки упаковываются в общие запросы к модели.
+        Кеш общий с NoteAnalyzer.analyze_all и Celery задачами анализа.
+        """
+        results, cached_ids = await self.batch_analyzer.analyze_with_cache_info(
+            [(note.id, note.content) for note in notes]
+        )
         
-        # Обрабатываем результаты
-        analyzed = []
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                print(f"Ошибка анализа заметки {notes[i].id}: {result}")
+        analyzed: List[Dict[str, Any]] = []
+        for note in notes:
+            result = results.get(note.id)
+            if result is None:
+                print(f"Ошибка анализа заметки {note.id}: нет результата")
                 analyzed.append({
-                    'note_id': notes[i].id,
-                    'error': str(result)
+                    'note_id': note.id,
+                    'error': 'no analysis result'
                 })
-            else:
-                analyzed.append(result)
+                continue
+            
+            analyzed.append({
+                'note_id': note.id,
+                'category': result['category'],
+                'importance': result['importance'],
+                'summary': result['summary'],
+                'tags': result['tags'],
+                'analyzed_at': datetime.utcnow().isoformat(),
+                'from_cache': note.id in cached_ids
+            })
         
         return analyzed
     
     async def analyze_note(self, note: Note) -> Dict[str, Any]:
         """Анализ одной заметки с кешированием"""
         # Проверяем кеш для полного анализа
-        cache_key = self._get_cache_key("full_analysis", note.content)
-        cached = cache.get(cache_key)
+        cache_key = self._get_cache_key("quick_analysis", note.content)
+        cached = await ai_result_cache.get(cache_key)
         if cached:
-            cached['note_id'] = note.id
-            cached['from_cache'] = True
-            return cached
+            return {**cached, 'note_id': note.id, 'from_cache': True}
         
         # Параллельный анализ всех аспектов
         tasks = [
@@ -97,40 +112,41 @@ Work, Learning, Personal, Finance, Health, Idea, Travel, Shopping, General.
         }
         
         # Сохраняем в кеш
-        cache.set(cache_key, analysis, ttl=timedelta(days=7))
+        await ai_result_cache.set(cache_key, analysis, ttl=timedelta(days=7))
         
         return analysis
     
     async def _categorize_cached(self, text: str) -> str:
         """Категоризация с кешированием"""
-        cache_key = self._get_cache_key("category", text)
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-        
+        try:
+            return await ai_result_cache.get_or_compute(
+                self._get_cache_key("category", text),
+                lambda: self._categorize(text),
+                ttl=timedelta(days=30)
+            )
+        except Exception:
+            # Ошибка модели не кешируется
+            return "General"
+    
+    async def _categorize(self, text: str) -> str:
+        """Категоризация: ключевые слова, затем модель (ошибки модели пробрасываются)"""
         # Быстрая категоризация по ключевым словам
         category = self._quick_categorize(text)
         if category:
-            cache.set(cache_key, category, ttl=timedelta(days=30))
             return category
         
         # AI категоризация если не удалось быстро
-        try:
-            response = await self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{
-                    "role": "user",
-                    "content": self.prompts['category'].format(text=text[:500])
-                }],
-                max_tokens=10,
-                temperature=0.3,
-                timeout=5
-            )
-            category = response.choices[0].message.content.strip()
-            cache.set(cache_key, category, ttl=timedelta(days=30))
-            return category
-        except Exception:
-            return "General"
+        response = await self.client.chat.completions.create(
+            model=self.CACHE_MODELS['category'],
+            messages=[{
+                "role": "user",
+                "content": self.prompts['category'].format(text=text[:500])
+            }],
+            max_tokens=10,
+            temperature=0.3,
+            timeout=5
+        )
+        return response.choices[0].message.content.strip()
     
     def _quick_categorize(self, text: str) -> Optional[str]:
         """Быстрая категоризация по ключевым словам"""
@@ -159,15 +175,13 @@ Work, Learning, Personal, Finance, Health, Idea, Travel, Shopping, General.
     
     async def _assess_importance_cached(self, text: str) -> int:
         """Оценка важности с кешированием"""
-        cache_key = self._get_cache_key("importance", text)
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
+        async def compute() -> int:
+            # Быстрая оценка по ключевым словам
+            return self._quick_assess_importance(text)
         
-        # Быстрая оценка по ключевым словам
-        importance = self._quick_assess_importance(text)
-        cache.set(cache_key, importance, ttl=timedelta(days=30))
-        return importance
+        return await ai_result_cache.get_or_compute(
+            self._get_cache_key("importance", text), compute, ttl=timedelta(days=30)
+        )
     
     def _quick_assess_importance(self, text: str) -> int:
         """Быстрая оценка важности"""
@@ -201,39 +215,36 @@ Work, Learning, Personal, Finance, Health, Idea, Travel, Shopping, General.
     
     async def _generate_summary_cached(self, text: str) -> str:
         """Генерация резюме с кешированием"""
-        cache_key = self._get_cache_key("summary", text)
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-        
+        return await ai_result_cache.get_or_compute(
+            self._get_cache_key("summary", text),
+            lambda: self._generate_summary(text),
+            ttl=timedelta(days=30)
+        )
+    
+    async def _generate_summary(self, text: str) -> str:
+        """Резюме без обращения к модели"""
         # Простое резюме для коротких текстов
         if len(text) < 100:
-            cache.set(cache_key, text, ttl=timedelta(days=30))
             return text
         
         # Извлекаем первые предложения
         sentences = text.split('.')[:3]
         summary = '. '.join(sentences).strip()
         if summary and len(summary) < 200:
-            cache.set(cache_key, summary, ttl=timedelta(days=30))
             return summary
         
         # Обрезаем по длине
-        summary = text[:150] + "..."
-        cache.set(cache_key, summary, ttl=timedelta(days=30))
-        return summary
+        return text[:150] + "..."
     
     async def _suggest_tags_cached(self, text: str) -> List[str]:
         """Предложение тегов с кешированием"""
-        cache_key = self._get_cache_key("tags", text)
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
+        async def compute() -> List[str]:
+            # Извлекаем теги из текста
+            return self._extract_tags(text)
         
-        # Извлекаем теги из текста
-        tags = self._extract_tags(text)
-        cache.set(cache_key, tags, ttl=timedelta(days=30))
-        return tags
+        return await ai_result_cache.get_or_compute(
+            self._get_cache_key("tags", text), compute, ttl=timedelta(days=30)
+        )
     
     def _extract_tags(self, text: str) -> List[str]:
         """Извлечение тегов из текста"""
@@ -222,7 +222,58 @@ AGENT_PROMPTS = {
     Return tags as a JSON array: ["tag1", "tag2", "tag3"]
     Tags should be relevant and useful for searching and organizing.
     """,
-    
+
+    "full_analysis": """
+    Analyze the note and return all fields in a single JSON object.
+    IMPORTANT: Category names are always in English. Summary, tags, keywords and topics
+    must be in the same language as the note content.
+
+    Note content:
+    {content}
+
+    Return JSON object with fields:
+    {{
+        "language": "language code (en, ru, es, fr, de, ...)",
+        "category": "one of: Learning, Project, Idea, Links, Work, Research, General, Finance, Health, Travel, Shopping, Personal, Tech",
+        "importance": "number from 1 to 10 (1-3 low, 4-6 medium, 7-8 high, 9-10 critical)",
+        "summary": "brief summary, maximum 2-3 sentences",
+        "tags": ["3-5 relevant tags"],
+        "keywords": ["up to 10 keywords"],
+        "topics": ["up to 5 main topics"],
+        "sentiment": "positive | negative | neutral"
+    }}
+
+    Return only the JSON object without additional text.
+    """,
+
+    "batch_analysis": """
+    Analyze each note from the list independently.
+    IMPORTANT: Category names are always in English. Summary, tags, keywords and topics
+    must be in the same language as the content of the corresponding note.
+
+    Notes (JSON array of objects with "id" and "content"):
+    {notes}
+
+    Return JSON object with a "results" array containing exactly one object per note:
+    {{
+        "results": [
+            {{
+                "id": 123,
+                "language": "language code (en, ru, es, fr, de, ...)",
+                "category": "one of: Learning, Project, Idea, Links, Work, Research, General, Finance, Health, Travel, Shopping, Personal, Tech",
+                "importance": "number from 1 to 10",
+                "summary": "brief summary, maximum 2-3 sentences",
+                "tags": ["3-5 relevant tags"],
+                "keywords": ["up to 10 keywords"],
+                "topics": ["up to 5 main topics"],
+                "sentiment": "positive | negative | neutral"
+            }}
+        ]
+    }}
+
+    Use the same "id" values as in the input. Return only the JSON object without additional text.
+    """,
+
     "connection_finding": """
     Find connections between the new note and existing notes.
     IMPORTANT: Maintain language consistency in relation descriptions.
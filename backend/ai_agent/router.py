@@ -272,17 +272,17 @@ async def organize_notes(
     current_user: User = Depends(get_current_active_user)
 ):
     """
-    Организация и реорганизация заметок пользователя
+    Организация заметок пользователя по сообществам графа связей.
+    Группы берутся из предрассчитанной аналитики графа (notes/analytics.py)
+    без обращения к модели, поэтому работают для любого числа заметок.
     """
     try:
-        agent = AIAgent(db, current_user)
-        
-        # Получаем все заметки пользователя
         from notes import crud as notes_crud
-        notes = await notes_crud.get_user_notes(db, current_user.id, 0, 1000)
+        from notes.analytics import get_graph_analytics, get_note_communities
         
-        # Организуем заметки
-        organized_groups = await agent.note_analyzer.organize_notes(notes)
+        analytics, _ = await get_graph_analytics(db, current_user.id)
+        organized_groups = await get_note_communities(db, current_user.id)
+        total_notes = analytics.nodes
         
         # Создаем сводную заметку
         summary_content = f"Организация заметок:\n\n"
@@ -303,10 +303,10 @@ async def organize_notes(
         return {
             "success": True,
             "note_id": note.id,
-            "total_notes": len(notes),
+            "total_notes": total_notes,
             "organized_groups": len(organized_groups),
             "groups": organized_groups,
-            "message": f"Организовано {len(notes)} заметок в {len(organized_groups)} групп"
+            "message": f"Организовано {total_notes} заметок в {len(organized_groups)} групп"
         }
         
     except Exception as e:
@@ -352,14 +352,15 @@ async def search_related_links(
             
             link_note_db = await notes_crud.create_note(db, link_note, current_user.id)
             created_notes.append(link_note_db)
-            
-            # Создаем связь с исходной заметкой
-            from notes.schemas import NoteConnectionCreate
-            connection = NoteConnectionCreate(
-                note_b_id=link_note_db.id,
-                relation="RELATED_LINK"
-            )
-            await notes_crud.create_connection(db, note.id, connection, current_user.id)
+        
+        # Связываем созданные заметки с исходной одним запросом
+        from notes.schemas import NoteConnectionCreate
+        await notes_crud.create_connections(
+            db,
+            note.id,
+            [NoteConnectionCreate(note_b_id=link_note.id, relation="RELATED_LINK") for link_note in created_notes],
+            current_user.id
+        )
         
         return {
             "success": True,
@@ -0,0 +1,297 @@
+import abc
+import asyncio
+import hashlib
+import re
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple, Iterable, Sequence
+
+import numpy as np
+import openai
+from sqlalchemy import DateTime, Integer, LargeBinary, String, and_, column, delete, func, literal, select, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from database import AsyncSessionLocal
+from models import Note, NoteEmbedding
+from redis_config import redis_cache_async
+
+# Повторное построение индекса пользователя ставится не чаще раза в REBUILD_TTL
+REBUILD_TTL = timedelta(hours=1)
+
+
+class Embedder(abc.ABC):
+    """Базовый класс эмбеддера: текст -> нормализованный вектор фиксированной размерности"""
+
+    dimension: int = 0
+
+    @property
+    @abc.abstractmethod
+    def name(self) -> str:
+        """Идентификатор эмбеддера и размерности: векторы разных эмбеддеров несравнимы"""
+
+    @abc.abstractmethod
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Нормализованные векторы текстов, матрица (len(texts), dimension) float32"""
+
+
+class OpenAIEmbedder(Embedder):
+    """Эмбеддинги через OpenAI Embeddings API"""
+
+    def __init__(
+        self,
+        openai_client: Optional[openai.AsyncOpenAI] = None,
+        model: str = "text-embedding-3-small",
+        dimension: int = 1536,
+        max_chars: int = 8000
+    ):
+        self.client = openai_client or openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        self.model = model
+        self.dimension = dimension
+        self.max_chars = max_chars
+
+    @property
+    def name(self) -> str:
+        return f"openai:{self.model}:{self.dimension}"
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        response = await self.client.embeddings.create(
+            model=self.model,
+            input=[(text or " ")[:self.max_chars] for text in texts]
+        )
+        vectors = np.array([item.embedding for item in response.data], dtype=np.float32)
+        return _normalize_rows(vectors)
+
+
+class HashingEmbedder(Embedder):
+    """
+    Детерминированный локальный эмбеддер (feature hashing по словам).
+    Не требует сети - используется в тестах и при отключенном OpenAI.
+    """
+
+    def __init__(self, dimension: int = 256):
+        self.dimension = dimension
+
+    @property
+    def name(self) -> str:
+        return f"hashing:{self.dimension}"
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r'\w+', (text or "").lower()):
+                digest = hashlib.md5(token.encode()).digest()
+                index = int.from_bytes(digest[:4], "little") % self.dimension
+                sign = 1.0 if digest[4] & 1 else -1.0
+                vectors[row, index] += sign
+        return _normalize_rows(vectors)
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-нормализация строк (нулевые строки остаются нулевыми)"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _stack_vectors(rows: Sequence[Tuple[int, bytes]], dimension: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Строки (note_id, vector) из БД -> массив ID и матрица векторов float32"""
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    vectors = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32)
+    return ids, vectors.reshape(len(rows), dimension)
+
+
+def top_k(
+    ids: np.ndarray,
+    vectors: np.ndarray,
+    query: np.ndarray,
+    k: int,
+    exclude_ids: Iterable[int] = ()
+) -> List[Tuple[int, float]]:
+    """Top-k строк матрицы по косинусной близости к нормализованному запросу: [(note_id, score)]"""
+    scores = vectors @ query
+
+    excluded = np.isin(ids, np.fromiter(exclude_ids, dtype=np.int64))
+    scores = np.where(excluded, -np.inf, scores)
+
+    k = min(k, int((~excluded).sum()))
+    if k <= 0:
+        return []
+
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [(int(ids[i]), float(scores[i])) for i in top]
+
+
+class SemanticIndex:
+    """
+    Векторный индекс заметок пользователя для поиска похожих заметок.
+    Векторы хранятся построчно в таблице note_embeddings, поэтому API и воркеры
+    Celery обновляют индекс независимо друг от друга. Для поиска векторы
+    пользователя собираются в матрицу и кешируются в процессе, пока не
+    изменится отпечаток строк (количество, последнее обновление, сумма ID).
+    Кандидаты ищутся по косинусной близости (top-k).
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        cache_size: int = 64
+    ):
+        self.embedder = embedder
+        self.session_factory = session_factory
+        self.cache_size = cache_size
+        # user_id -> (отпечаток, ids, vectors), вытеснение по LRU
+        self._cache: "OrderedDict[int, Tuple[Tuple, np.ndarray, np.ndarray]]" = OrderedDict()
+
+    def _empty(self) -> Tuple[np.ndarray, np.ndarray]:
+        return (
+            np.zeros(0, dtype=np.int64),
+            np.zeros((0, self.embedder.dimension), dtype=np.float32)
+        )
+
+    def _user_filter(self, user_id: int):
+        # Векторы другого эмбеддера не используются и перезаписываются при индексации
+        return and_(NoteEmbedding.user_id == user_id, NoteEmbedding.embedder == self.embedder.name)
+
+    async def _load(self, user_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Векторы пользователя (из кеша процесса, если строки в БД не менялись)"""
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(
+                    func.count(),
+                    func.max(NoteEmbedding.updated_at),
+                    func.coalesce(func.sum(NoteEmbedding.note_id), 0)
+                ).where(self._user_filter(user_id))
+            )
+            fingerprint = tuple(result.one())
+
+            cached = self._cache.get(user_id)
+            if cached and cached[0] == fingerprint:
+                self._cache.move_to_end(user_id)
+                return cached[1], cached[2]
+
+            if not fingerprint[0]:
+                self._cache.pop(user_id, None)
+                return self._empty()
+
+            result = await db.execute(
+                select(NoteEmbedding.note_id, NoteEmbedding.vector)
+                .where(self._user_filter(user_id))
+                .order_by(NoteEmbedding.note_id)
+            )
+            rows = result.all()
+
+        ids, vectors = await asyncio.to_thread(_stack_vectors, rows, self.embedder.dimension)
+        self._cache[user_id] = (fingerprint, ids, vectors)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return ids, vectors
+
+    async def upsert(self, user_id: int, note_id: int, text: str) -> None:
+        """Добавить или обновить вектор заметки"""
+        await self.upsert_many(user_id, [(note_id, text)])
+
+    async def upsert_many(self, user_id: int, items: Sequence[Tuple[int, str]]) -> None:
+        """
+        Добавить или обновить векторы нескольких заметок одним INSERT ... ON CONFLICT.
+        Заметки, удаленные или принадлежащие другому пользователю, пропускаются.
+        """
+        if not items:
+            return
+
+        vectors = await self.embedder.embed([text for _, text in items])
+        rows = [
+            (note_id, vector.astype(np.float32).tobytes())
+            for (note_id, _), vector in zip(items, vectors)
+        ]
+        new = values(
+            column("note_id", Integer),
+            column("vector", LargeBinary),
+            name="new_embeddings"
+        ).data(rows)
+        stmt = pg_insert(NoteEmbedding).from_select(
+            ["note_id", "user_id", "embedder", "vector", "updated_at"],
+            select(
+                new.c.note_id,
+                literal(user_id, Integer),
+                literal(self.embedder.name, String),
+                new.c.vector,
+                literal(datetime.utcnow(), DateTime)
+            )
+            .select_from(new)
+            .join(Note, and_(Note.id == new.c.note_id, Note.user_id == user_id))
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[NoteEmbedding.note_id],
+            set_={name: stmt.excluded[name] for name in ("embedder", "vector", "updated_at")}
+        )
+        async with self.session_factory() as db:
+            await db.execute(stmt)
+            await db.commit()
+
+    async def remove(self, user_id: int, note_id: int) -> None:
+        """Удалить заметку из индекса"""
+        async with self.session_factory() as db:
+            await db.execute(
+                delete(NoteEmbedding)
+                .where(NoteEmbedding.note_id == note_id, NoteEmbedding.user_id == user_id)
+            )
+            await db.commit()
+
+    async def size(self, user_id: int) -> int:
+        """Количество заметок в индексе пользователя"""
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(func.count()).select_from(NoteEmbedding).where(self._user_filter(user_id))
+            )
+            return result.scalar_one()
+
+    async def schedule_rebuild(self, user_id: int) -> None:
+        """
+        Поставить построение индекса пользователя в очередь, если оно еще не стоит.
+        Так индекс заполняется для заметок, созданных до его появления
+        (или до смены эмбеддера).
+        """
+        from tasks.ai_tasks import rebuild_semantic_index
+
+        try:
+            key = f"semantic_index:rebuild:{user_id}:{self.embedder.name}"
+            if not await redis_cache_async.set(key, 1, nx=True, ex=REBUILD_TTL):
+                return
+            rebuild_semantic_index.delay(user_id=user_id)
+        except Exception as e:
+            print(f"Ошибка постановки построения семантического индекса: {e}")
+
+    async def search(
+        self,
+        user_id: int,
+        text: str,
+        k: int = 20,
+        exclude_ids: Iterable[int] = ()
+    ) -> List[Tuple[int, float]]:
+        """
+        Top-k заметок пользователя, наиболее похожих на текст: [(note_id, score)].
+        Пустой индекс ставит его построение в очередь и возвращает пустой список.
+        """
+        ids, vectors = await self._load(user_id)
+        if not len(ids):
+            await self.schedule_rebuild(user_id)
+            return []
+
+        query = (await self.embedder.embed([text]))[0]
+        return await asyncio.to_thread(top_k, ids, vectors, query, k, tuple(exclude_ids))
+
+
+def create_embedder() -> Embedder:
+    """Эмбеддер по настройке SEMANTIC_EMBEDDER (openai | hashing)"""
+    if settings.SEMANTIC_EMBEDDER == "hashing":
+        return HashingEmbedder()
+    return OpenAIEmbedder()
+
+
+# Глобальный экземпляр индекса
+semantic_index = SemanticIndex(create_embedder())
@@ -1,15 +1,16 @@
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
-import httpx
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
+from datetime import datetime
+from typing import Dict, Any
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 
 from models import User, GoogleToken
 from config import settings
+from jwt_auth.auth import invalidate_cached_user
+from google_calendar.client import calendar_client, token_expires_at
+from google_calendar.credentials import credential_cache
+from google_calendar.service import google_calendar_service
 
 
 class GoogleOAuthService:
@@ -52,52 +53,43 @@ class GoogleOAuthService:
         
         return authorization_url
 
-    def exchange_code_for_tokens(self, code: str) -> Dict[str, Any]:
+    async def exchange_code_for_tokens(self, code: str) -> Dict[str, Any]:
         """Обменять authorization code на токены"""
-        flow = Flow.from_client_config(
-            self.client_config,
-            scopes=self.scopes
-        )
-        flow.redirect_uri = self.redirect_uri
-        
         try:
-            flow.fetch_token(code=code)
-            credentials = flow.credentials
-            
-            # Получить информацию о пользователе
-            user_info = self._get_user_info(credentials.token)
-            
-            return {
-                'access_token': credentials.token,
-                'refresh_token': credentials.refresh_token,
-                'expires_at': credentials.expiry,
-                'scope': ' '.join(credentials.scopes),
-                'user_info': user_info
-            }
-            
+            tokens = await calendar_client.exchange_code(
+                code,
+                settings.GOOGLE_CLIENT_ID,
+                settings.GOOGLE_CLIENT_SECRET,
+                self.redirect_uri
+            )
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Failed to exchange code for tokens: {str(e)}"
             )
+        
+        # Получить информацию о пользователе
+        user_info = await self._get_user_info(tokens['access_token'])
+        
+        return {
+            'access_token': tokens['access_token'],
+            'refresh_token': tokens.get('refresh_token'),
+            'expires_at': token_expires_at(tokens.get('expires_in')),
+            'scope': tokens.get('scope') or ' '.join(self.scopes),
+            'user_info': user_info
+        }
 
-    def _get_user_info(self, access_token: str) -> Dict[str, Any]:
+    async def _get_user_info(self, access_token: str) -> Dict[str, Any]:
         """Получить информацию о пользователе из Google API"""
         try:
-            headers = {'Authorization': f'Bearer {access_token}'}
-            response = httpx.get(
-                'https://www.googleapis.com/oauth2/v2/userinfo',
-                headers=headers
-            )
-            response.raise_for_status()
-            return response.json()
+            return await calendar_client.get_userinfo(access_token)
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Failed to get user info: {str(e)}"
             )
 
-    def create_or_update_user(self, db: Session, token_data: Dict[str, Any]) -> User:
+    async def create_or_update_user(self, db: AsyncSession, token_data: Dict[str, Any]) -> User:
         """Создать или обновить пользователя после OAuth"""
         try:
             user_info = token_data['user_info']
@@ -106,9 +98,11 @@ class GoogleOAuthService:
             print(f"DEBUG: Processing user with Google ID: {google_id}, email: {user_info['email']}")
             
             # Найти пользователя по Google ID или email
-            user = db.query(User).filter(User.google_id == google_id).first()
+            result = await db.execute(select(User).filter(User.google_id == google_id))
+            user = result.scalars().first()
             if not user:
-                user = db.query(User).filter(User.email == user_info['email']).first()
+                result = await db.execute(select(User).filter(User.email == user_info['email']))
+                user = result.scalars().first()
             
             if user:
                 print(f"DEBUG: Updating existing user: {user.email}")
@@ -133,12 +127,12 @@ class GoogleOAuthService:
                     google_picture=user_info.get('picture')
                 )
                 db.add(user)
-                db.commit()  # ПЕРВЫЙ COMMIT для сохранения пользователя
-                db.refresh(user)  # Получить ID
+                await db.flush()  # Получить ID пользователя в той же транзакции
                 print(f"DEBUG: Created user with ID: {user.id}")
 
             # Создать или обновить токены
-            google_token = db.query(GoogleToken).filter(GoogleToken.user_id == user.id).first()
+            result = await db.execute(select(GoogleToken).filter(GoogleToken.user_id == user.id))
+            google_token = result.scalar_one_or_none()
             if google_token:
                 print(f"DEBUG: Updating existing token for user {user.id}")
                 google_token.access_token = token_data['access_token']
@@ -157,8 +151,10 @@ class GoogleOAuthService:
                 )
                 db.add(google_token)
 
-            db.commit()  # ВТОРОЙ COMMIT для сохранения токена
-            db.refresh(user)
+            await db.commit()  # Пользователь и токен сохраняются одной транзакцией
+            await db.refresh(user)
+            await invalidate_cached_user(user.email)
+            credential_cache.invalidate(user.id)
             print(f"DEBUG: Successfully saved user and token")
             return user
             
@@ -166,70 +162,25 @@ class GoogleOAuthService:
             print(f"ERROR in create_or_update_user: {str(e)}")
             import traceback
             print(f"Traceback: {traceback.format_exc()}")
-            db.rollback()
+            await db.rollback()
             raise
 
-    def refresh_token_if_needed(self, db: Session, user_id: int) -> Optional[GoogleToken]:
-        """Обновить токен если он истекает"""
-        google_token = db.query(GoogleToken).filter(GoogleToken.user_id == user_id).first()
-        
-        if not google_token:
-            return None
-            
-        # Проверить, нужно ли обновить токен (за 5 минут до истечения)
-        if google_token.expires_at <= datetime.utcnow() + timedelta(minutes=5):
-            if not google_token.refresh_token:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Refresh token not available. Please re-authenticate."
-                )
-            
-            try:
-                credentials = Credentials(
-                    token=google_token.access_token,
-                    refresh_token=google_token.refresh_token,
-                    token_uri="https://oauth2.googleapis.com/token",
-                    client_id=settings.GOOGLE_CLIENT_ID,
-                    client_secret=settings.GOOGLE_CLIENT_SECRET
-                )
-                
-                credentials.refresh(Request())
-                
-                # Обновить токен в БД
-                google_token.access_token = credentials.token
-                google_token.expires_at = credentials.expiry
-                google_token.updated_at = datetime.utcnow()
-                
-                db.commit()
-                db.refresh(google_token)
-                
-            except Exception as e:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail=f"Failed to refresh token: {str(e)}"
-                )
-        
-        return google_token
-
-    def get_calendar_service(self, db: Session, user_id: int):
-        """Получить Google Calendar service для пользователя"""
-        google_token = self.refresh_token_if_needed(db, user_id)
-        
-        if not google_token:
+    async def get_access_token(self, db: AsyncSession, user_id: int) -> str:
+        """
+        Действующий access токен Google пользователя (из кеша процесса,
+        при промахе из БД с обновлением перед истечением)
+        """
+        access_token = await google_calendar_service.get_access_token(user_id, db)
+        if not access_token:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Google account not connected"
             )
-        
-        credentials = Credentials(
-            token=google_token.access_token,
-            refresh_token=google_token.refresh_token,
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=settings.GOOGLE_CLIENT_ID,
-            client_secret=settings.GOOGLE_CLIENT_SECRET
-        )
-        
-        return build('calendar', 'v3', credentials=credentials)
+        return access_token
+
+    def invalidate_calendar_service(self, user_id: int) -> None:
+        """Сбросить закешированный токен пользователя (в этом процессе)"""
+        credential_cache.invalidate(user_id)
 
 
 google_oauth_service = GoogleOAuthService() 
\ No newline at end of file
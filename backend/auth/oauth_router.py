@@ -2,11 +2,11 @@ import logging
 import os
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from fastapi.responses import JSONResponse, RedirectResponse
-from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
-from database import get_db, get_async_db
+from database import get_async_db
 from jwt_auth.auth import create_access_token, get_current_active_user, oauth2_scheme, create_refresh_token, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
 from models import User
+from redis_config import async_cache
 from .google_oauth import google_oauth_service
 
 logger = logging.getLogger(__name__)
@@ -27,31 +27,27 @@ def google_login():
 @router.get("/google/callback")
 async def google_callback(
     code: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """Обработать callback от Google OAuth"""
     try:
         print(f"DEBUG: Processing Google OAuth callback with code: {code[:20]}...")
         logger.info(f"Processing Google OAuth callback with code: {code[:20]}...")
         
-        token_data = google_oauth_service.exchange_code_for_tokens(code)
+        token_data = await google_oauth_service.exchange_code_for_tokens(code)
         print(f"DEBUG: Successfully exchanged code for tokens")
         print(f"DEBUG: Token data keys: {list(token_data.keys())}")
         print(f"DEBUG: User info: {token_data.get('user_info', {})}")
         logger.info("Successfully exchanged code for tokens")
         
-        user = google_oauth_service.create_or_update_user(db, token_data)
+        user = await google_oauth_service.create_or_update_user(db, token_data)
         print(f"DEBUG: User created/updated: {user.email}, ID: {user.id}")
         logger.info(f"User created/updated: {user.email}")
 
         # Создать JWT access токен и refresh токен для аутентификации в приложении
         access_token = create_access_token(data={"sub": user.email})
+        refresh_token = await create_refresh_token(user.id, db)
         
-        # Для создания refresh токена нужна async session
-        from database import AsyncSessionLocal
-        async with AsyncSessionLocal() as async_db:
-            refresh_token = await create_refresh_token(user.id, async_db)
-            
         print(f"DEBUG: JWT tokens created")
         logger.info("JWT tokens created")
         
@@ -161,10 +157,16 @@ async def disconnect_google(
     if google_token:
         await db.delete(google_token)
         # Очистить Google данные пользователя
-        current_user.google_id = None
-        current_user.google_email = None
-        current_user.google_name = None
-        current_user.google_picture = None
+        # (current_user может быть взят из кеша и не привязан к сессии)
+        user = await db.get(User, current_user.id)
+        user.google_id = None
+        user.google_email = None
+        user.google_name = None
+        user.google_picture = None
         await db.commit()
+        # Сбрасываем весь кеш пользователя по индексу ключей (профиль из кеша
+        # по токену, тела ответов и статистику заметок), а не только профиль
+        await async_cache.clear_user(current_user.id)
+        google_oauth_service.invalidate_calendar_service(current_user.id)
     
     return {"message": "Google account disconnected successfully"} 
\ No newline at end of file
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест: календарные эндпоинты заметок на синхронной сессии и
+googleapiclient (блокирующий вызов в threadpool FastAPI) против асинхронных
+(AsyncSession + AsyncCalendarClient).
+
+Google Calendar заменяется локальным stub-сервером aiohttp с задержкой --latency,
+приложение вызывается в процессе через httpx.ASGITransport. Токен пользователя
+кладется в кеш токенов процесса, поэтому БД не нужна.
+
+Старое поведение воспроизводит sync-эндпоинт (def + блокирующий HTTP запрос),
+новое - реальный GET /notes/calendar/events. Во время нагрузки измеряются:
+  - занятость threadpool (anyio, по умолчанию 40 потоков) и очередь к нему;
+  - задержка /health/cache - любого другого sync-эндпоинта, которому нужен поток.
+
+Запуск из каталога backend:
+    python -m benchmarks.calendar_threadpool --requests 1000 --concurrency 200
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import anyio.to_thread
+import httpx
+from aiohttp import web
+from fastapi import APIRouter
+
+from database import get_async_db
+from google_calendar.client import calendar_client
+from google_calendar.credentials import CachedToken, credential_cache
+from jwt_auth.auth import get_current_active_user
+from models import User
+
+BENCH_USER = User(id=10_000_001, email="bench@example.com", username="bench")
+BENCH_TOKEN = "bench-access-token"
+
+
+async def start_stub_google(latency: float) -> web.AppRunner:
+    """Stub Google Calendar API: events.list с фиксированной задержкой"""
+
+    async def list_events(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        now = datetime.utcnow()
+        items = [
+            {
+                "id": f"event-{n}",
+                "summary": f"Событие {n}",
+                "start": {"dateTime": (now + timedelta(hours=n)).isoformat() + "Z"},
+                "end": {"dateTime": (now + timedelta(hours=n, minutes=30)).isoformat() + "Z"},
+            }
+            for n in range(int(request.query.get("maxResults", 10)))
+        ]
+        return web.json_response({"items": items})
+
+    stub = web.Application()
+    stub.router.add_get("/calendars/{calendar_id}/events", list_events)
+    runner = web.AppRunner(stub)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner
+
+
+def legacy_router(stub_url: str) -> APIRouter:
+    """Старое поведение: def-эндпоинт с блокирующим запросом к Google (как .execute())"""
+    router = APIRouter()
+
+    @router.get("/bench/legacy/calendar/events")
+    def legacy_events(max_results: int = 50):
+        response = httpx.get(
+            f"{stub_url}/calendars/primary/events",
+            params={"maxResults": max_results},
+            headers={"Authorization": f"Bearer {BENCH_TOKEN}"},
+        )
+        response.raise_for_status()
+        return response.json().get("items", [])
+
+    return router
+
+
+class ThreadpoolProbe:
+    """Фоновая задача: занятость threadpool и задержка sync-эндпоинта во время нагрузки"""
+
+    def __init__(self, client: httpx.AsyncClient, interval: float = 0.01):
+        self.client = client
+        self.interval = interval
+        self.max_borrowed = 0
+        self.max_waiting = 0
+        self.health_latencies = []
+        self._tasks = []
+
+    async def _sample_threadpool(self):
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        while True:
+            stats = limiter.statistics()
+            self.max_borrowed = max(self.max_borrowed, stats.borrowed_tokens)
+            self.max_waiting = max(self.max_waiting, stats.tasks_waiting)
+            await asyncio.sleep(self.interval)
+
+    async def _probe_health(self):
+        while True:
+            start = time.perf_counter()
+            await self.client.get("/health/cache")
+            self.health_latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(self.interval * 5)
+
+    async def __aenter__(self):
+        self._tasks = [
+            asyncio.create_task(self._sample_threadpool()),
+            asyncio.create_task(self._probe_health()),
+        ]
+        return self
+
+    async def __aexit__(self, *exc):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+def percentile(samples, fraction: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))] if samples else 0.0
+
+
+async def run_load(client: httpx.AsyncClient, path: str, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(path, params={"max_results": 10})
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    async with ThreadpoolProbe(client) as probe:
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+    return elapsed, latencies, errors, probe
+
+
+def report(name: str, requests: int, result) -> None:
+    elapsed, latencies, errors, probe = result
+    print(
+        f"{name:>6}: {requests / elapsed:8.1f} req/s, "
+        f"p50 {percentile(latencies, 0.5) * 1000:7.1f} мс, p99 {percentile(latencies, 0.99) * 1000:7.1f} мс, "
+        f"ошибок {errors}"
+    )
+    print(
+        f"{'':>6}  threadpool: занято до {probe.max_borrowed}, в очереди до {probe.max_waiting}; "
+        f"/health/cache p99 {percentile(probe.health_latencies, 0.99) * 1000:.1f} мс"
+    )
+
+
+async def main_async(args) -> None:
+    runner = await start_stub_google(args.latency)
+    port = runner.addresses[0][1]
+    stub_url = f"http://127.0.0.1:{port}"
+    calendar_client.base_url = stub_url
+    if args.max_connections:
+        calendar_client.max_connections = args.max_connections
+
+    from main import app
+
+    async def bench_user():
+        return BENCH_USER
+
+    async def no_db():
+        yield None
+
+    app.include_router(legacy_router(stub_url))
+    app.dependency_overrides[get_current_active_user] = bench_user
+    app.dependency_overrides[get_async_db] = no_db
+    credential_cache.put(BENCH_USER.id, CachedToken(
+        access_token=BENCH_TOKEN,
+        refresh_token=None,
+        expires_at=datetime.utcnow() + timedelta(hours=1)
+    ))
+
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    print(
+        f"Запросов: {args.requests}, параллельно: {args.concurrency}, "
+        f"задержка Google: {args.latency * 1000:.0f} мс, потоков threadpool: {limiter.total_tokens:.0f}, "
+        f"соединений httpx: {calendar_client.max_connections}"
+    )
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            result = await run_load(client, "/bench/legacy/calendar/events", args.requests, args.concurrency)
+            report("sync", args.requests, result)
+            result = await run_load(client, "/notes/calendar/events", args.requests, args.concurrency)
+            report("async", args.requests, result)
+    finally:
+        app.dependency_overrides.clear()
+        credential_cache.invalidate(BENCH_USER.id)
+        await calendar_client.aclose()
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000, help="всего запросов на вариант")
+    parser.add_argument("--concurrency", type=int, default=200, help="одновременных запросов")
+    parser.add_argument("--latency", type=float, default=0.1, help="задержка ответа Google, c")
+    parser.add_argument(
+        "--max-connections", type=int, default=None,
+        help="пул соединений AsyncCalendarClient (по умолчанию GOOGLE_API_MAX_CONNECTIONS)"
+    )
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
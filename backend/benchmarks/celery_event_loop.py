@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: asyncio.run на каждую задачу против общего event loop воркера (tasks.runtime).
+
+Тело задачи - короткая асинхронная работа, как у Celery задач проекта:
+с флагом --db это запрос SELECT 1 через асинхронный движок, без флага -
+только создание/переиспользование клиента и несколько переключений контекста.
+
+Старое поведение (asyncio.run) не может переиспользовать пул asyncpg между
+разными loop, поэтому в нем каждое выполнение открывает свое соединение.
+
+Запуск из каталога backend:
+    python -m benchmarks.celery_event_loop --tasks 500
+    python -m benchmarks.celery_event_loop --tasks 200 --db
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+from sqlalchemy.pool import NullPool
+
+from database import AsyncSessionLocal, create_async_db_engine
+from tasks.runtime import run_async, get_openai_client, shutdown_worker_loop
+
+
+async def _workload_no_db(client_factory):
+    client_factory()
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+async def _workload_db(session_factory):
+    async with session_factory() as db:
+        await db.execute(text("SELECT 1"))
+
+
+def bench_asyncio_run(tasks: int, use_db: bool) -> float:
+    """Старое поведение: новый loop (и новое соединение) на каждую задачу"""
+    import openai
+    from config import settings
+
+    start = time.perf_counter()
+    for _ in range(tasks):
+        if use_db:
+            async def _one():
+                engine = create_async_db_engine(poolclass=NullPool)
+                try:
+                    async with engine.connect() as conn:
+                        await conn.execute(text("SELECT 1"))
+                finally:
+                    await engine.dispose()
+            asyncio.run(_one())
+        else:
+            asyncio.run(_workload_no_db(lambda: openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)))
+    return time.perf_counter() - start
+
+
+def bench_worker_loop(tasks: int, use_db: bool) -> float:
+    """Новое поведение: общий loop воркера, пул соединений и клиент переиспользуются"""
+    start = time.perf_counter()
+    for _ in range(tasks):
+        if use_db:
+            run_async(_workload_db(AsyncSessionLocal))
+        else:
+            run_async(_workload_no_db(get_openai_client))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=500, help="количество задач в каждом прогоне")
+    parser.add_argument("--db", action="store_true", help="выполнять запрос к БД в теле задачи")
+    args = parser.parse_args()
+
+    results = {
+        "asyncio.run": bench_asyncio_run(args.tasks, args.db),
+        "worker loop": bench_worker_loop(args.tasks, args.db),
+    }
+    shutdown_worker_loop()
+
+    print(f"Задач: {args.tasks}, БД: {'да' if args.db else 'нет'}")
+    for name, elapsed in results.items():
+        print(f"{name:>12}: {elapsed:8.3f} c, {args.tasks / elapsed:10.1f} задач/с")
+    print(f"Ускорение: x{results['asyncio.run'] / results['worker loop']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк: удаление ключей кеша через KEYS + DEL против SCAN + UNLINK
+(RedisCache.clear_pattern) и удаления по индексу пользователя (RedisCache.clear_user).
+
+Keyspace заполняется ключами вида bench:user:<id>:item:<n> (по умолчанию миллион),
+удаляются ключи одного пользователя. Параллельно отдельный поток выполняет PING
+и записывает задержки - так видно, насколько удаление блокирует остальных
+клиентов Redis (API и брокер Celery на том же инстансе).
+
+Нужен реальный Redis (REDIS_HOST/REDIS_PORT). Бенчмарк очищает выбранную DB,
+поэтому по умолчанию использует DB 15; DB 0 (Celery) и 1 (кеш) запрещены.
+
+Запуск из каталога backend:
+    python -m benchmarks.redis_invalidation --keys 1000000 --users 1000
+"""
+
+import argparse
+import os
+import threading
+import time
+
+import redis
+
+from redis_config import RedisCache, SCAN_BATCH_SIZE, get_user_index_key
+
+PROTECTED_DBS = (0, 1)
+
+
+class LatencyProbe:
+    """Поток, измеряющий задержку PING во время удаления"""
+
+    def __init__(self, client: redis.Redis):
+        self.client = client
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            self.client.ping()
+            self.samples.append(time.perf_counter() - start)
+            time.sleep(0.001)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self) -> str:
+        if not self.samples:
+            return "нет замеров"
+        samples = sorted(self.samples)
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        return f"PING max {samples[-1] * 1000:8.1f} мс, p99 {p99 * 1000:6.1f} мс"
+
+
+def populate(client: redis.Redis, keys: int, users: int, indexed_user: int) -> None:
+    """Заполнить DB ключами пользователей; ключи indexed_user попадают в его индекс"""
+    client.flushdb()
+    index_key = get_user_index_key(indexed_user)
+    with client.pipeline(transaction=False) as pipe:
+        for n in range(keys):
+            user = n % users
+            key = f"bench:user:{user}:item:{n}"
+            pipe.set(key, "x", ex=3600)
+            if user == indexed_user:
+                pipe.sadd(index_key, key)
+            if n % 10000 == 9999:
+                pipe.execute()
+        pipe.execute()
+
+
+def keys_and_delete(client: redis.Redis, pattern: str) -> int:
+    """Старое поведение: KEYS целиком и один DEL"""
+    keys = client.keys(pattern)
+    return client.delete(*keys) if keys else 0
+
+
+def run(name: str, client: redis.Redis, probe_client: redis.Redis, func) -> None:
+    with LatencyProbe(probe_client) as probe:
+        start = time.perf_counter()
+        deleted = func()
+        elapsed = time.perf_counter() - start
+    print(f"{name:>14}: {elapsed:8.3f} c, удалено {deleted:7d}, {probe.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=1_000_000, help="размер keyspace")
+    parser.add_argument("--users", type=int, default=1000, help="количество пользователей")
+    parser.add_argument("--db", type=int, default=15, help="DB Redis для бенчмарка (будет очищена)")
+    parser.add_argument("--batch", type=int, default=SCAN_BATCH_SIZE, help="размер пачки SCAN/UNLINK")
+    args = parser.parse_args()
+
+    if args.db in PROTECTED_DBS:
+        parser.error(f"DB {args.db} используется приложением")
+
+    params = dict(
+        host=os.getenv('REDIS_HOST', 'localhost'),
+        port=int(os.getenv('REDIS_PORT', 6379)),
+        db=args.db,
+        decode_responses=True,
+    )
+    client = redis.Redis(**params)
+    probe_client = redis.Redis(**params)
+    cache = RedisCache(client)
+
+    user = 0
+    pattern = f"bench:user:{user}:*"
+    print(f"Ключей: {args.keys}, пользователей: {args.users}, пачка: {args.batch}")
+
+    populate(client, args.keys, args.users, user)
+    run("KEYS + DEL", client, probe_client, lambda: keys_and_delete(client, pattern))
+
+    populate(client, args.keys, args.users, user)
+    run("SCAN + UNLINK", client, probe_client, lambda: cache.clear_pattern(pattern, args.batch))
+
+    populate(client, args.keys, args.users, user)
+    run("индекс", client, probe_client, lambda: cache.clear_user(user, args.batch))
+
+    client.flushdb()
+
+
+if __name__ == "__main__":
+    main()
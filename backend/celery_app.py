@@ -1,5 +1,6 @@
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init, worker_process_shutdown
 import os
 from dotenv import load_dotenv
 
@@ -11,7 +12,7 @@ celery_app = Celery(
     'mementum_tasks',
     broker=os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0'),
     backend=os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0'),
-    include=['tasks.note_tasks', 'tasks.ai_tasks', 'tasks.calendar_tasks']
+    include=['tasks.note_tasks', 'tasks.ai_tasks', 'tasks.calendar_tasks', 'tasks.graph_tasks']
 )
 
 # Конфигурация Celery
@@ -61,7 +62,12 @@ celery_app.conf.update(
         'tasks.ai_tasks.analyze_note_async': {'queue': 'ai_tasks'},
         'tasks.ai_tasks.generate_summary_async': {'queue': 'ai_tasks'},
         'tasks.ai_tasks.categorize_note_async': {'queue': 'ai_tasks'},
+        'tasks.ai_tasks.batch_analyze_notes': {'queue': 'ai_tasks'},
+        'tasks.ai_tasks.analyze_all_notes_job': {'queue': 'ai_tasks'},
+        'tasks.ai_tasks.index_note_async': {'queue': 'ai_tasks'},
+        'tasks.ai_tasks.rebuild_semantic_index': {'queue': 'ai_tasks'},
         'tasks.calendar_tasks.sync_calendar_async': {'queue': 'low_priority'},
+        'tasks.graph_tasks.compute_graph_analytics': {'queue': 'low_priority'},
     },
     
     # Настройки повторных попыток
@@ -92,6 +98,14 @@ celery_app.conf.update(
             'task': 'tasks.calendar_tasks.sync_all_calendars',
             'schedule': crontab(minute='*/15'),  # Каждые 15 минут
         },
+        'prune-graph-changes': {
+            'task': 'tasks.maintenance.prune_graph_changes',
+            'schedule': crontab(hour=3, minute=30),  # Каждый день в 03:30
+        },
+        'refresh-graph-analytics': {
+            'task': 'tasks.graph_tasks.refresh_stale_graph_analytics',
+            'schedule': crontab(minute='*/30'),  # Каждые 30 минут
+        },
     },
 )
 
@@ -100,4 +114,22 @@ if os.getenv('ENVIRONMENT') == 'production':
     celery_app.conf.update(
         worker_send_task_events=True,
         task_send_sent_event=True,
-    ) 
\ No newline at end of file
+    ) 
+
+
+@worker_process_init.connect
+def reset_db_pools(**kwargs):
+    """Каждый процесс воркера открывает собственные соединения, а не наследует их от родителя"""
+    from database import dispose_engines
+    from redis_config import async_cache_pool
+    from tasks.runtime import reset_worker_loop
+    dispose_engines()
+    async_cache_pool.reset()
+    reset_worker_loop()
+
+
+@worker_process_shutdown.connect
+def stop_worker_loop(**kwargs):
+    """Закрыть соединения и event loop процесса воркера"""
+    from tasks.runtime import shutdown_worker_loop
+    shutdown_worker_loop()
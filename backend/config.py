@@ -12,11 +12,45 @@ class Settings(BaseSettings):
     GOOGLE_CLIENT_ID: str = Field(default=os.getenv("GOOGLE_CLIENT_ID"))
     GOOGLE_CLIENT_SECRET: str = Field(default=os.getenv("GOOGLE_CLIENT_SECRET"))
     GOOGLE_REDIRECT_URI: str = Field(default=os.getenv("GOOGLE_REDIRECT_URI"))
+    # Адреса Google API (можно направить на локальный stub-сервер)
+    GOOGLE_CALENDAR_BASE_URL: str = Field(default="https://www.googleapis.com/calendar/v3")
+    GOOGLE_OAUTH_TOKEN_URI: str = Field(default="https://oauth2.googleapis.com/token")
+    GOOGLE_USERINFO_URL: str = Field(default="https://www.googleapis.com/oauth2/v2/userinfo")
+    GOOGLE_API_TIMEOUT: float = Field(default=10.0)  # секунды
+    GOOGLE_API_MAX_CONNECTIONS: int = Field(default=20)
+    # Кеш токенов Google в памяти процесса: размер и максимальный возраст записи (секунды)
+    GOOGLE_CREDENTIAL_CACHE_SIZE: int = Field(default=1024)
+    GOOGLE_CREDENTIAL_CACHE_TTL: int = Field(default=300)
+    # Периодическая синхронизация календарей: пользователей параллельно и запросов к Google в секунду
+    GOOGLE_SYNC_CONCURRENCY: int = Field(default=5)
+    GOOGLE_SYNC_RATE_LIMIT: float = Field(default=10.0)
     # FRONTEND_URLS : str
     REDIS_URL: str = Field(default=os.getenv("REDIS_URL"))
     CELERY_BROKER_URL: str = Field(default=os.getenv("REDIS_URL"))
     CELERY_RESULT_BACKEND: str = Field(default=os.getenv("REDIS_URL"))
     OPENAI_API_KEY : str = Field(default=os.getenv("OPENAI_API_KEY"))
+    # Анализ заметки одним запросом к модели вместо отдельного запроса на каждое поле
+    AI_BATCHED_ANALYSIS: bool = Field(default=True)
+    # Семантический индекс заметок для поиска связей
+    SEMANTIC_EMBEDDER: str = Field(default="openai")  # openai | hashing
+    SEMANTIC_CANDIDATES_K: int = Field(default=20)
+    # Пул соединений с БД (один движок на процесс: API, Celery worker, maintenance)
+    DB_POOL_SIZE: int = Field(default=5)
+    DB_MAX_OVERFLOW: int = Field(default=10)
+    DB_POOL_TIMEOUT: int = Field(default=30)
+    DB_POOL_RECYCLE: int = Field(default=1800)  # секунды, -1 - без пересоздания
+    DB_POOL_PRE_PING: bool = Field(default=True)
+    DB_ECHO: bool = Field(default=False)  # логирование SQL запросов
+    # Время жизни кешированных тел ответов чтения заметок (секунды), см. notes/http_cache.py
+    NOTES_RESPONSE_CACHE_TTL: int = Field(default=300)
+    # Сколько дней хранится журнал изменений графа заметок (/notes/graph?since=)
+    GRAPH_CHANGES_RETENTION_DAYS: int = Field(default=30)
+    # Максимум заметок в одном импорте (POST /notes/import)
+    NOTES_IMPORT_MAX_NOTES: int = Field(default=100000)
+    # Максимальная длительность потока статуса задачи /notes/task/{id}/stream (секунды)
+    TASK_STREAM_MAX_DURATION: int = Field(default=600)
+    # Время жизни кеша пользователя по токену (секунды)
+    AUTH_USER_CACHE_TTL: int = Field(default=60)
     class Config:
         env_file = str(Path(__file__).parent.parent / ".env")
 
@@ -1,11 +1,15 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 import asyncio
 import os
+from typing import Any, Dict
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.dialects.postgresql import psycopg2
 
+from config import settings
+
 DB_PORT = os.getenv("POSTGRES_PORT", "5432")  # по умолчанию 5432
 DB_HOST = os.getenv("POSTGRES_HOST", "db")  # имя контейнера с базой
 DB_DB = os.getenv("POSTGRES_DB")
@@ -18,13 +22,39 @@ DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_POR
 # Асинхронный URL для приложения
 ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_DB}"
 
-# Синхронный движок для Alembic
-engine = create_engine(DATABASE_URL, echo=True)
 
-# Асинхронный движок для приложения
-async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=True)
+def _engine_options() -> Dict[str, Any]:
+    """Параметры пула соединений из настроек"""
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "echo": settings.DB_ECHO,
+    }
+
+
+def create_db_engine(url: str = DATABASE_URL, **overrides) -> Engine:
+    """Создать синхронный движок с настройками пула из config"""
+    return create_engine(url, **{**_engine_options(), **overrides})
+
+
+def create_async_db_engine(url: str = ASYNC_DATABASE_URL, **overrides) -> AsyncEngine:
+    """Создать асинхронный движок с настройками пула из config"""
+    return create_async_engine(url, **{**_engine_options(), **overrides})
+
+
+# Движки создаются один раз на процесс и используются всеми модулями
+# (API, Celery задачи, maintenance). Новые движки в модулях не создаем.
 
-# Синхронная сессия для Alembic
+# Синхронный движок (календарь, maintenance)
+engine = create_db_engine()
+
+# Асинхронный движок для приложения и Celery задач
+async_engine = create_async_db_engine()
+
+# Синхронная сессия
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Асинхронная сессия для приложения
@@ -32,6 +62,30 @@ AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire
 
 Base = declarative_base()
 
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Состояние пулов соединений текущего процесса"""
+    stats = {}
+    for name, pool in (("sync", engine.pool), ("async", async_engine.sync_engine.pool)):
+        stats[name] = {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "status": pool.status(),
+        }
+    return stats
+
+
+def dispose_engines() -> None:
+    """
+    Сбросить пулы после fork (Celery prefork): соединения родителя
+    не закрываются, а просто забываются, дочерний процесс откроет свои.
+    """
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
 def get_db():
     """Синхронная функция для получения сессии БД (для Alembic)"""
     db = SessionLocal()
@@ -0,0 +1,297 @@
+import asyncio
+import weakref
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional
+from urllib.parse import quote
+
+import httpx
+
+from config import settings
+
+
+class GoogleAPIError(Exception):
+    """Ошибка ответа Google API (HTTP статус >= 400)"""
+
+    def __init__(self, status_code: int, message: str, reason: Optional[str] = None):
+        super().__init__(f"{status_code} {reason}: {message}" if reason else f"{status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+        self.reason = reason
+
+
+def token_expires_at(expires_in: Optional[int]) -> datetime:
+    """Время истечения access токена по expires_in ответа token endpoint"""
+    return datetime.utcnow() + timedelta(seconds=int(expires_in or 3600))
+
+
+class AsyncCalendarClient:
+    """
+    Неблокирующий клиент Google Calendar REST API (v3) и OAuth token endpoint.
+    Один пул соединений httpx на event loop процесса; адреса берутся из настроек,
+    поэтому клиент можно направить на локальный stub-сервер.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        token_uri: Optional[str] = None,
+        userinfo_url: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.base_url = (base_url or settings.GOOGLE_CALENDAR_BASE_URL).rstrip("/")
+        self.token_uri = token_uri or settings.GOOGLE_OAUTH_TOKEN_URI
+        self.userinfo_url = userinfo_url or settings.GOOGLE_USERINFO_URL
+        self.timeout = timeout or settings.GOOGLE_API_TIMEOUT
+        self.max_connections = max_connections or settings.GOOGLE_API_MAX_CONNECTIONS
+        self.transport = transport
+        # Пул соединений httpx привязан к event loop: свой клиент на каждый loop
+        # (API, loop воркера Celery, asyncio.run в скриптах). Записи закрытых
+        # и собранных сборщиком loop удаляются из словаря автоматически
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                transport=self.transport
+            )
+            self._clients[loop] = client
+        return client
+
+    async def aclose(self) -> None:
+        """
+        Закрыть пулы соединений: клиент текущего loop - сразу, клиенты других
+        работающих loop - в их собственном loop
+        """
+        current = asyncio.get_running_loop()
+        for loop, client in list(self._clients.items()):
+            if client.is_closed:
+                continue
+            if loop is current:
+                await client.aclose()
+            elif loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        self._clients.clear()
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        access_token: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+        data: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        headers = {"Authorization": f"Bearer {access_token}"} if access_token else None
+        if params:
+            params = {key: value for key, value in params.items() if value is not None}
+        response = await self._get_client().request(
+            method, url, headers=headers, params=params, json=json, data=data
+        )
+        if response.status_code >= 400:
+            raise self._error(response)
+        if response.status_code == 204 or not response.content:
+            return {}
+        return response.json()
+
+    @staticmethod
+    def _error(response: httpx.Response) -> GoogleAPIError:
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        error = payload.get("error", {}) if isinstance(payload, dict) else {}
+        if isinstance(error, str):
+            # Ошибки OAuth token endpoint: {"error": "invalid_grant", "error_description": ...}
+            return GoogleAPIError(response.status_code, payload.get("error_description", error), error)
+        reason = None
+        if error.get("errors"):
+            reason = error["errors"][0].get("reason")
+        return GoogleAPIError(
+            response.status_code,
+            error.get("message") or response.text,
+            reason or error.get("status")
+        )
+
+    def _calendar_url(self, *parts: str) -> str:
+        return "/".join([self.base_url, *(quote(part, safe="") for part in parts)])
+
+    # ---------- OAuth ----------
+
+    async def exchange_code(
+        self,
+        code: str,
+        client_id: str,
+        client_secret: str,
+        redirect_uri: str
+    ) -> Dict[str, Any]:
+        """Обменять код авторизации на access и refresh токены"""
+        return await self._request("POST", self.token_uri, data={
+            "grant_type": "authorization_code",
+            "code": code,
+            "client_id": client_id,
+            "client_secret": client_secret,
+            "redirect_uri": redirect_uri,
+        })
+
+    async def refresh_access_token(
+        self,
+        refresh_token: str,
+        client_id: str,
+        client_secret: str
+    ) -> Dict[str, Any]:
+        """Получить новый access токен по refresh токену"""
+        return await self._request("POST", self.token_uri, data={
+            "grant_type": "refresh_token",
+            "refresh_token": refresh_token,
+            "client_id": client_id,
+            "client_secret": client_secret,
+        })
+
+    async def get_userinfo(self, access_token: str) -> Dict[str, Any]:
+        """Профиль пользователя Google (email, name, picture)"""
+        return await self._request("GET", self.userinfo_url, access_token)
+
+    # ---------- Календари ----------
+
+    async def list_calendars(
+        self,
+        access_token: str,
+        page_token: Optional[str] = None,
+        max_results: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Одна страница calendarList (items, nextPageToken)"""
+        return await self._request(
+            "GET",
+            self._calendar_url("users", "me", "calendarList"),
+            access_token,
+            params={"pageToken": page_token, "maxResults": max_results}
+        )
+
+    async def iter_calendars(self, access_token: str) -> AsyncIterator[Dict[str, Any]]:
+        """Все календари пользователя с переходом по pageToken"""
+        page_token = None
+        while True:
+            page = await self.list_calendars(access_token, page_token)
+            for calendar in page.get("items", []):
+                yield calendar
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                break
+
+    # ---------- События ----------
+
+    async def list_events(
+        self,
+        access_token: str,
+        calendar_id: str = "primary",
+        page_token: Optional[str] = None,
+        **params: Any
+    ) -> Dict[str, Any]:
+        """
+        Одна страница событий (items, nextPageToken, nextSyncToken).
+        params - параметры events.list: timeMin, timeMax, maxResults, singleEvents, orderBy...
+        """
+        params["pageToken"] = page_token
+        for key, value in params.items():
+            if isinstance(value, bool):
+                params[key] = "true" if value else "false"
+        return await self._request(
+            "GET",
+            self._calendar_url("calendars", calendar_id, "events"),
+            access_token,
+            params=params
+        )
+
+    async def iter_events(
+        self,
+        access_token: str,
+        calendar_id: str = "primary",
+        **params: Any
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Все события по запросу с переходом по pageToken"""
+        page_token = None
+        while True:
+            page = await self.list_events(access_token, calendar_id, page_token, **params)
+            for event in page.get("items", []):
+                yield event
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                break
+
+    async def list_all_events(
+        self,
+        access_token: str,
+        calendar_id: str = "primary",
+        limit: Optional[int] = None,
+        **params: Any
+    ) -> List[Dict[str, Any]]:
+        """События всех страниц (не больше limit)"""
+        events = []
+        async for event in self.iter_events(access_token, calendar_id, **params):
+            events.append(event)
+            if limit is not None and len(events) >= limit:
+                break
+        return events
+
+    async def get_event(self, access_token: str, calendar_id: str, event_id: str) -> Dict[str, Any]:
+        """Событие по ID"""
+        return await self._request(
+            "GET", self._calendar_url("calendars", calendar_id, "events", event_id), access_token
+        )
+
+    async def insert_event(self, access_token: str, calendar_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Создать событие"""
+        return await self._request(
+            "POST", self._calendar_url("calendars", calendar_id, "events"), access_token, json=body
+        )
+
+    async def update_event(
+        self,
+        access_token: str,
+        calendar_id: str,
+        event_id: str,
+        body: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Заменить событие целиком (PUT)"""
+        return await self._request(
+            "PUT", self._calendar_url("calendars", calendar_id, "events", event_id), access_token, json=body
+        )
+
+    async def patch_event(
+        self,
+        access_token: str,
+        calendar_id: str,
+        event_id: str,
+        body: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Изменить только переданные поля события (PATCH)"""
+        return await self._request(
+            "PATCH", self._calendar_url("calendars", calendar_id, "events", event_id), access_token, json=body
+        )
+
+    async def delete_event(self, access_token: str, calendar_id: str, event_id: str) -> bool:
+        """Удалить событие; False, если его уже нет (404/410)"""
+        try:
+            await self._request(
+                "DELETE", self._calendar_url("calendars", calendar_id, "events", event_id), access_token
+            )
+            return True
+        except GoogleAPIError as e:
+            if e.status_code in (404, 410):
+                return False
+            raise
+
+
+# Общий клиент процесса (API и event loop Celery воркера)
+calendar_client = AsyncCalendarClient()
@@ -0,0 +1,67 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from config import settings
+
+# Токен считается истекшим заранее, чтобы не истек во время запроса
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+
+class CachedToken(NamedTuple):
+    """Токен Google пользователя в кеше процесса"""
+    access_token: str
+    refresh_token: Optional[str]
+    expires_at: datetime
+
+
+class CredentialCache:
+    """
+    Кеш токенов Google пользователей в памяти процесса (общий для потоков).
+    Запись живет до expires_at токена (минус TOKEN_REFRESH_MARGIN), но не дольше
+    max_age: изменения в других процессах (отключение Google) видны не позже max_age.
+    """
+
+    def __init__(self, maxsize: int, max_age: timedelta):
+        self.maxsize = maxsize
+        self.max_age = max_age.total_seconds()
+        # user_id -> (время истечения записи по monotonic, токен)
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[CachedToken]:
+        """Действующий токен пользователя или None"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            stale_at, token = entry
+            if stale_at < time.monotonic() or token.expires_at - TOKEN_REFRESH_MARGIN <= datetime.utcnow():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return token
+
+    def put(self, user_id: int, token: CachedToken) -> None:
+        """Сохранить токен (только если он еще не истекает)"""
+        if not token.expires_at or token.expires_at - TOKEN_REFRESH_MARGIN <= datetime.utcnow():
+            return
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.max_age, token)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        """Забыть токен пользователя (новые токены или отключение Google)"""
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+# Общий кеш токенов процесса (синхронные и асинхронные клиенты календаря)
+credential_cache = CredentialCache(
+    maxsize=settings.GOOGLE_CREDENTIAL_CACHE_SIZE,
+    max_age=timedelta(seconds=settings.GOOGLE_CREDENTIAL_CACHE_TTL)
+)
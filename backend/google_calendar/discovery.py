@@ -0,0 +1,23 @@
+import json
+from functools import lru_cache
+from typing import Any, Dict
+
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+
+@lru_cache(maxsize=None)
+def get_calendar_discovery() -> Dict[str, Any]:
+    """
+    Discovery-документ Calendar API v3 из статической копии, поставляемой
+    с googleapiclient: разбирается один раз на процесс, без запроса к сети
+    """
+    document = get_static_doc("calendar", "v3")
+    if document is None:
+        raise RuntimeError("Статический discovery-документ calendar v3 не найден")
+    return json.loads(document)
+
+
+def build_calendar_service(credentials):
+    """Сервис Calendar API из закешированного discovery-документа"""
+    return build_from_document(get_calendar_discovery(), credentials=credentials)
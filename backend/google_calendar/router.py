@@ -97,20 +97,22 @@ async def get_events(
     time_min: Optional[str] = Query(None, description="Начальное время в ISO формате"),
     time_max: Optional[str] = Query(None, description="Конечное время в ISO формате"),
     max_results: int = Query(250, description="Максимальное количество событий"),
+    page_token: Optional[str] = Query(None, description="Токен следующей страницы (nextPageToken)"),
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_async_db)
 ):
-    """Получает события календаря"""
+    """Получает события календаря (постранично)"""
     try:
-        events = await google_calendar_service.get_events(
+        events, next_page_token = await google_calendar_service.get_events_page(
             user_id=current_user.id,
             db=db,
             calendar_id=calendar_id,
             time_min=time_min,
             time_max=time_max,
-            max_results=max_results
+            max_results=max_results,
+            page_token=page_token
         )
-        return EventsListResponse(events=events)
+        return EventsListResponse(events=events, nextPageToken=next_page_token)
     except ValueError as e:
         raise HTTPException(status_code=401, detail=str(e))
     except Exception as e:
@@ -1,17 +1,18 @@
 import os
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
+from typing import List, Optional, Dict, Any, Tuple
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update
 from models import GoogleToken, User
+from .client import calendar_client, GoogleAPIError, token_expires_at
+from .credentials import CachedToken, credential_cache, TOKEN_REFRESH_MARGIN
 from .schemas import *
 import json
 
+# Максимальный размер страницы events.list в Google Calendar API
+MAX_EVENTS_PAGE_SIZE = 2500
+
 
 class GoogleCalendarService:
     def __init__(self):
@@ -62,26 +63,20 @@ class GoogleCalendarService:
         db: AsyncSession
     ) -> GoogleTokenResponse:
         """Обменивает код на токены и сохраняет их в БД"""
-        flow = Flow.from_client_config(
-            {
-                "web": {
-                    "client_id": self.client_id,
-                    "client_secret": self.client_secret,
-                    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                    "token_uri": "https://oauth2.googleapis.com/token",
-                    "redirect_uris": [self.redirect_uri]
-                }
-            },
-            scopes=self.scopes
-        )
-        flow.redirect_uri = self.redirect_uri
-        
         # Получаем токены
-        flow.fetch_token(code=code)
-        credentials = flow.credentials
+        try:
+            tokens = await calendar_client.exchange_code(
+                code, self.client_id, self.client_secret, self.redirect_uri
+            )
+        except GoogleAPIError as error:
+            raise ValueError(f"Failed to exchange code: {error}")
+        
+        access_token = tokens["access_token"]
+        refresh_token = tokens.get("refresh_token")
+        scope = tokens.get("scope") or ' '.join(self.scopes)
         
         # Вычисляем время истечения
-        expires_at = datetime.utcnow() + timedelta(seconds=credentials.expiry.timestamp() - datetime.utcnow().timestamp())
+        expires_at = token_expires_at(tokens.get("expires_in"))
         
         # Сохраняем или обновляем токены в БД
         result = await db.execute(
@@ -90,15 +85,15 @@ class GoogleCalendarService:
         existing_token = result.scalar_one_or_none()
         
         if existing_token:
-            # Обновляем существующий токен
+            # Обновляем существующий токен (refresh токен Google присылает не всегда)
             await db.execute(
                 update(GoogleToken)
                 .where(GoogleToken.user_id == user_id)
                 .values(
-                    access_token=credentials.token,
-                    refresh_token=credentials.refresh_token,
+                    access_token=access_token,
+                    refresh_token=refresh_token or existing_token.refresh_token,
                     expires_at=expires_at,
-                    scope=' '.join(self.scopes),
+                    scope=scope,
                     updated_at=datetime.utcnow()
                 )
             )
@@ -106,24 +101,32 @@ class GoogleCalendarService:
             # Создаем новый токен
             new_token = GoogleToken(
                 user_id=user_id,
-                access_token=credentials.token,
-                refresh_token=credentials.refresh_token,
+                access_token=access_token,
+                refresh_token=refresh_token,
                 expires_at=expires_at,
-                scope=' '.join(self.scopes)
+                scope=scope
             )
             db.add(new_token)
         
         await db.commit()
+        credential_cache.invalidate(user_id)
         
         return GoogleTokenResponse(
-            access_token=credentials.token,
-            refresh_token=credentials.refresh_token,
+            access_token=access_token,
+            refresh_token=refresh_token,
             expires_at=expires_at,
-            scope=' '.join(self.scopes)
+            scope=scope
         )
 
-    async def get_user_credentials(self, user_id: int, db: AsyncSession) -> Optional[Credentials]:
-        """Получает учетные данные пользователя из БД"""
+    async def get_access_token(self, user_id: int, db: AsyncSession) -> Optional[str]:
+        """
+        Возвращает действующий access токен пользователя, при необходимости обновляя его.
+        Токен берется из кеша процесса, БД читается только при промахе
+        """
+        cached = credential_cache.get(user_id)
+        if cached is not None:
+            return cached.access_token
+        
         result = await db.execute(
             select(GoogleToken).filter(GoogleToken.user_id == user_id)
         )
@@ -132,42 +135,57 @@ class GoogleCalendarService:
         if not token:
             return None
         
-        credentials = Credentials(
-            token=token.access_token,
-            refresh_token=token.refresh_token,
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=self.client_id,
-            client_secret=self.client_secret,
-            scopes=token.scope.split(' ')
-        )
-        
         # Проверяем и обновляем токен если нужно
-        if credentials.expired and credentials.refresh_token:
-            credentials.refresh(Request())
+        if token.expires_at and token.expires_at - TOKEN_REFRESH_MARGIN <= datetime.utcnow():
+            if not token.refresh_token:
+                return None
+            try:
+                tokens = await calendar_client.refresh_access_token(
+                    token.refresh_token, self.client_id, self.client_secret
+                )
+            except GoogleAPIError as e:
+                print(f"Ошибка обновления токена Google: {e}")
+                return None
             
             # Обновляем токен в БД
             await db.execute(
                 update(GoogleToken)
                 .where(GoogleToken.user_id == user_id)
                 .values(
-                    access_token=credentials.token,
-                    expires_at=datetime.utcnow() + timedelta(seconds=3600),
+                    access_token=tokens["access_token"],
+                    expires_at=token_expires_at(tokens.get("expires_in")),
                     updated_at=datetime.utcnow()
                 )
             )
             await db.commit()
+            credential_cache.put(user_id, CachedToken(
+                access_token=tokens["access_token"],
+                refresh_token=token.refresh_token,
+                expires_at=token_expires_at(tokens.get("expires_in"))
+            ))
+            return tokens["access_token"]
         
-        return credentials
+        credential_cache.put(user_id, CachedToken(
+            access_token=token.access_token,
+            refresh_token=token.refresh_token,
+            expires_at=token.expires_at
+        ))
+        return token.access_token
+
+    async def _require_access_token(self, user_id: int, db: AsyncSession) -> str:
+        access_token = await self.get_access_token(user_id, db)
+        if not access_token:
+            raise ValueError("User not authenticated with Google")
+        return access_token
 
     async def get_user_info(self, user_id: int, db: AsyncSession) -> Optional[GoogleCalendarUser]:
         """Получает информацию о пользователе Google"""
-        credentials = await self.get_user_credentials(user_id, db)
-        if not credentials:
+        access_token = await self.get_access_token(user_id, db)
+        if not access_token:
             return None
         
         try:
-            service = build('oauth2', 'v2', credentials=credentials)
-            user_info = service.userinfo().get().execute()
+            user_info = await calendar_client.get_userinfo(access_token)
             
             return GoogleCalendarUser(
                 email=user_info.get('email', ''),
@@ -175,20 +193,14 @@ class GoogleCalendarService:
                 picture=user_info.get('picture'),
                 is_connected=True
             )
-        except HttpError:
+        except GoogleAPIError:
             return None
 
     async def get_calendars(self, user_id: int, db: AsyncSession) -> List[Calendar]:
         """Получает список календарей пользователя"""
-        credentials = await self.get_user_credentials(user_id, db)
-        if not credentials:
-            raise ValueError("User not authenticated with Google")
+        access_token = await self._require_access_token(user_id, db)
         
         try:
-            service = build('calendar', 'v3', credentials=credentials)
-            calendars_result = service.calendarList().list().execute()
-            calendars = calendars_result.get('items', [])
-            
             return [
                 Calendar(
                     id=cal['id'],
@@ -199,11 +211,41 @@ class GoogleCalendarService:
                     selected=cal.get('selected', False),
                     accessRole=cal.get('accessRole')
                 )
-                for cal in calendars
+                async for cal in calendar_client.iter_calendars(access_token)
             ]
-        except HttpError as error:
+        except GoogleAPIError as error:
             raise ValueError(f"Failed to fetch calendars: {error}")
 
+    async def get_events_page(
+        self, 
+        user_id: int, 
+        db: AsyncSession,
+        calendar_id: str = 'primary',
+        time_min: Optional[str] = None,
+        time_max: Optional[str] = None,
+        max_results: int = 250,
+        page_token: Optional[str] = None
+    ) -> Tuple[List[CalendarEvent], Optional[str]]:
+        """Получает страницу событий календаря и токен следующей страницы"""
+        access_token = await self._require_access_token(user_id, db)
+        
+        try:
+            page = await calendar_client.list_events(
+                access_token,
+                calendar_id,
+                page_token,
+                maxResults=max_results,
+                singleEvents=True,
+                orderBy='startTime',
+                timeMin=time_min,
+                timeMax=time_max
+            )
+        except GoogleAPIError as error:
+            raise ValueError(f"Failed to fetch events: {error}")
+        
+        events = [self._to_calendar_event(event) for event in page.get('items', [])]
+        return events, page.get('nextPageToken')
+
     async def get_events(
         self, 
         user_id: int, 
@@ -213,66 +255,24 @@ class GoogleCalendarService:
         time_max: Optional[str] = None,
         max_results: int = 250
     ) -> List[CalendarEvent]:
-        """Получает события календаря"""
-        credentials = await self.get_user_credentials(user_id, db)
-        if not credentials:
-            raise ValueError("User not authenticated with Google")
+        """Получает события календаря (все страницы, не больше max_results)"""
+        access_token = await self._require_access_token(user_id, db)
         
         try:
-            service = build('calendar', 'v3', credentials=credentials)
-            
-            # Параметры запроса
-            params = {
-                'calendarId': calendar_id,
-                'maxResults': max_results,
-                'singleEvents': True,
-                'orderBy': 'startTime'
-            }
-            
-            if time_min:
-                params['timeMin'] = time_min
-            if time_max:
-                params['timeMax'] = time_max
-            
-            events_result = service.events().list(**params).execute()
-            events = events_result.get('items', [])
-            
-            return [
-                CalendarEvent(
-                    id=event['id'],
-                    summary=event.get('summary', 'No Title'),
-                    description=event.get('description'),
-                    start=CalendarEventDateTime(
-                        dateTime=event['start'].get('dateTime'),
-                        date=event['start'].get('date'),
-                        timeZone=event['start'].get('timeZone')
-                    ),
-                    end=CalendarEventDateTime(
-                        dateTime=event['end'].get('dateTime'),
-                        date=event['end'].get('date'),
-                        timeZone=event['end'].get('timeZone')
-                    ),
-                    location=event.get('location'),
-                    attendees=[
-                        CalendarEventAttendee(
-                            email=attendee['email'],
-                            displayName=attendee.get('displayName'),
-                            responseStatus=attendee.get('responseStatus')
-                        )
-                        for attendee in event.get('attendees', [])
-                    ] if event.get('attendees') else None,
-                    colorId=event.get('colorId'),
-                    creator=CalendarEventCreator(
-                        email=event['creator']['email'],
-                        displayName=event['creator'].get('displayName')
-                    ) if event.get('creator') else None,
-                    htmlLink=event.get('htmlLink'),
-                    status=event.get('status')
-                )
-                for event in events
-            ]
-        except HttpError as error:
+            events = await calendar_client.list_all_events(
+                access_token,
+                calendar_id,
+                limit=max_results,
+                maxResults=min(max_results, MAX_EVENTS_PAGE_SIZE),
+                singleEvents=True,
+                orderBy='startTime',
+                timeMin=time_min,
+                timeMax=time_max
+            )
+        except GoogleAPIError as error:
             raise ValueError(f"Failed to fetch events: {error}")
+        
+        return [self._to_calendar_event(event) for event in events]
 
     async def create_event(
         self, 
@@ -281,58 +281,104 @@ class GoogleCalendarService:
         event_data: CreateEventRequest
     ) -> CalendarEvent:
         """Создает новое событие в календаре"""
-        credentials = await self.get_user_credentials(user_id, db)
-        if not credentials:
-            raise ValueError("User not authenticated with Google")
+        access_token = await self._require_access_token(user_id, db)
+        
+        # Подготавливаем данные события
+        event_body = {
+            'summary': event_data.summary,
+            'start': event_data.start.dict(exclude_none=True),
+            'end': event_data.end.dict(exclude_none=True)
+        }
+        
+        if event_data.description:
+            event_body['description'] = event_data.description
+        if event_data.location:
+            event_body['location'] = event_data.location
+        if event_data.colorId:
+            event_body['colorId'] = event_data.colorId
+        if event_data.attendees:
+            event_body['attendees'] = [
+                attendee.dict(exclude_none=True) 
+                for attendee in event_data.attendees
+            ]
         
         try:
-            service = build('calendar', 'v3', credentials=credentials)
-            
-            # Подготавливаем данные события
-            event_body = {
-                'summary': event_data.summary,
-                'start': event_data.start.dict(exclude_none=True),
-                'end': event_data.end.dict(exclude_none=True)
-            }
-            
-            if event_data.description:
-                event_body['description'] = event_data.description
-            if event_data.location:
-                event_body['location'] = event_data.location
-            if event_data.colorId:
-                event_body['colorId'] = event_data.colorId
-            if event_data.attendees:
-                event_body['attendees'] = [
-                    attendee.dict(exclude_none=True) 
-                    for attendee in event_data.attendees
-                ]
-            
             # Создаем событие
-            event = service.events().insert(
-                calendarId=event_data.calendar_id,
-                body=event_body
-            ).execute()
-            
-            return CalendarEvent(
-                id=event['id'],
-                summary=event.get('summary', ''),
-                description=event.get('description'),
-                start=CalendarEventDateTime(
-                    dateTime=event['start'].get('dateTime'),
-                    date=event['start'].get('date'),
-                    timeZone=event['start'].get('timeZone')
-                ),
-                end=CalendarEventDateTime(
-                    dateTime=event['end'].get('dateTime'),
-                    date=event['end'].get('date'),
-                    timeZone=event['end'].get('timeZone')
-                ),
-                location=event.get('location'),
-                htmlLink=event.get('htmlLink'),
-                status=event.get('status')
-            )
-        except HttpError as error:
+            event = await calendar_client.insert_event(access_token, event_data.calendar_id, event_body)
+        except GoogleAPIError as error:
             raise ValueError(f"Failed to create event: {error}")
+        
+        return self._to_calendar_event(event)
+
+    async def update_event(
+        self, 
+        user_id: int, 
+        db: AsyncSession,
+        event_data: UpdateEventRequest
+    ) -> CalendarEvent:
+        """Изменяет переданные поля события"""
+        access_token = await self._require_access_token(user_id, db)
+        
+        event_body = event_data.dict(exclude_none=True, exclude={'calendar_id', 'event_id'})
+        
+        try:
+            event = await calendar_client.patch_event(
+                access_token, event_data.calendar_id, event_data.event_id, event_body
+            )
+        except GoogleAPIError as error:
+            raise ValueError(f"Failed to update event: {error}")
+        
+        return self._to_calendar_event(event)
+
+    async def delete_event(
+        self, 
+        user_id: int, 
+        db: AsyncSession,
+        event_id: str,
+        calendar_id: str = 'primary'
+    ) -> bool:
+        """Удаляет событие (False, если его уже нет)"""
+        access_token = await self._require_access_token(user_id, db)
+        
+        try:
+            return await calendar_client.delete_event(access_token, calendar_id, event_id)
+        except GoogleAPIError as error:
+            raise ValueError(f"Failed to delete event: {error}")
+
+    @staticmethod
+    def _to_calendar_event(event: Dict[str, Any]) -> CalendarEvent:
+        """Событие Google Calendar API -> CalendarEvent"""
+        return CalendarEvent(
+            id=event['id'],
+            summary=event.get('summary', 'No Title'),
+            description=event.get('description'),
+            start=CalendarEventDateTime(
+                dateTime=event['start'].get('dateTime'),
+                date=event['start'].get('date'),
+                timeZone=event['start'].get('timeZone')
+            ),
+            end=CalendarEventDateTime(
+                dateTime=event['end'].get('dateTime'),
+                date=event['end'].get('date'),
+                timeZone=event['end'].get('timeZone')
+            ),
+            location=event.get('location'),
+            attendees=[
+                CalendarEventAttendee(
+                    email=attendee['email'],
+                    displayName=attendee.get('displayName'),
+                    responseStatus=attendee.get('responseStatus')
+                )
+                for attendee in event.get('attendees', [])
+            ] if event.get('attendees') else None,
+            colorId=event.get('colorId'),
+            creator=CalendarEventCreator(
+                email=event['creator']['email'],
+                displayName=event['creator'].get('displayName')
+            ) if event.get('creator') else None,
+            htmlLink=event.get('htmlLink'),
+            status=event.get('status')
+        )
 
     async def disconnect_user(self, user_id: int, db: AsyncSession) -> bool:
         """Отключает пользователя от Google Calendar"""
@@ -346,6 +392,7 @@ class GoogleCalendarService:
             if token:
                 await db.delete(token)
                 await db.commit()
+            credential_cache.invalidate(user_id)
             
             return True
         except Exception:
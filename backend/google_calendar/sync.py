@@ -0,0 +1,222 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import CalendarSyncState, Note, NoteCalendarEvent
+from .client import calendar_client, GoogleAPIError
+from .rate_limit import AsyncRateLimiter
+from .service import google_calendar_service, MAX_EVENTS_PAGE_SIZE
+
+# Причины 403, означающие превышение квоты (запрос можно повторить позже)
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+RATE_LIMIT_RETRIES = 3
+
+
+class SyncTokenExpired(Exception):
+    """Google отклонил syncToken (410 Gone): нужна полная синхронизация"""
+
+
+def _is_rate_limited(error: GoogleAPIError) -> bool:
+    return error.status_code == 429 or (error.status_code == 403 and error.reason in RATE_LIMIT_REASONS)
+
+
+async def _list_events_page(
+    access_token: str,
+    calendar_id: str,
+    page_token: Optional[str],
+    limiter: Optional[AsyncRateLimiter],
+    **params: Any
+) -> Dict[str, Any]:
+    """Страница events.list под общим ограничителем частоты, с повтором при превышении квоты"""
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        if limiter is not None:
+            await limiter.acquire()
+        try:
+            return await calendar_client.list_events(access_token, calendar_id, page_token, **params)
+        except GoogleAPIError as e:
+            if e.status_code == 410:
+                raise SyncTokenExpired(str(e))
+            if not _is_rate_limited(e) or attempt == RATE_LIMIT_RETRIES:
+                raise
+            await asyncio.sleep(2 ** attempt)
+
+
+async def fetch_calendar_changes(
+    access_token: str,
+    calendar_id: str,
+    sync_token: Optional[str],
+    limiter: Optional[AsyncRateLimiter] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Изменения календаря с момента sync_token (все страницы) и новый nextSyncToken.
+    Без sync_token - полный список событий (первая синхронизация).
+    """
+    params: Dict[str, Any] = {"maxResults": MAX_EVENTS_PAGE_SIZE}
+    if sync_token:
+        # Дельта включает удаленные события (status = cancelled)
+        params["syncToken"] = sync_token
+
+    events = []
+    page_token = None
+    while True:
+        page = await _list_events_page(access_token, calendar_id, page_token, limiter, **params)
+        events.extend(page.get("items", []))
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            # nextSyncToken приходит только на последней странице
+            return events, page.get("nextSyncToken")
+
+
+def _event_time(value: Dict[str, Any]) -> Tuple[Optional[datetime], bool]:
+    """Время начала/окончания события Google: (datetime в UTC без зоны, событие на весь день)"""
+    if value.get("dateTime"):
+        moment = datetime.fromisoformat(value["dateTime"])
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        return moment, False
+    if value.get("date"):
+        return datetime.fromisoformat(value["date"]), True
+    return None, False
+
+
+def _apply_event(note_event: NoteCalendarEvent, event: Dict[str, Any]) -> bool:
+    """Перенести изменения события Google в связанное с заметкой событие"""
+    values = {
+        "event_title": event.get("summary") or note_event.event_title,
+        "location": event.get("location"),
+    }
+    start, is_all_day = _event_time(event.get("start", {}))
+    end, _ = _event_time(event.get("end", {}))
+    if start and end:
+        values.update(start_datetime=start, end_datetime=end, is_all_day=is_all_day)
+
+    changed = False
+    for field, value in values.items():
+        if getattr(note_event, field) != value:
+            setattr(note_event, field, value)
+            changed = True
+    return changed
+
+
+async def _note_events(
+    db: AsyncSession,
+    user_id: int,
+    calendar_id: str,
+    google_event_ids: Optional[List[str]] = None
+) -> List[NoteCalendarEvent]:
+    """События заметок пользователя в календаре (только указанные ID, если переданы)"""
+    query = (
+        select(NoteCalendarEvent)
+        .join(Note, Note.id == NoteCalendarEvent.note_id)
+        .where(Note.user_id == user_id, NoteCalendarEvent.calendar_id == calendar_id)
+    )
+    if google_event_ids is not None:
+        query = query.where(NoteCalendarEvent.google_event_id.in_(google_event_ids))
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+
+async def apply_calendar_changes(
+    db: AsyncSession,
+    user_id: int,
+    calendar_id: str,
+    events: List[Dict[str, Any]],
+    full: bool
+) -> int:
+    """
+    Применить изменения из Google к событиям заметок. При инкрементальной
+    синхронизации читаются только затронутые события; при полной - все события
+    календаря, и отсутствующие в Google удаляются. Возвращает число изменений.
+    """
+    by_id = {event["id"]: event for event in events}
+    if full:
+        note_events = await _note_events(db, user_id, calendar_id)
+    elif by_id:
+        note_events = await _note_events(db, user_id, calendar_id, list(by_id))
+    else:
+        return 0
+
+    changed = 0
+    for note_event in note_events:
+        event = by_id.get(note_event.google_event_id)
+        if event is None or event.get("status") == "cancelled":
+            if event is not None or full:
+                await db.delete(note_event)
+                changed += 1
+        elif _apply_event(note_event, event):
+            changed += 1
+    return changed
+
+
+async def sync_calendar(
+    db: AsyncSession,
+    access_token: str,
+    state: CalendarSyncState,
+    limiter: Optional[AsyncRateLimiter] = None
+) -> Dict[str, Any]:
+    """Синхронизировать один календарь по сохраненному syncToken (410 - полная синхронизация)"""
+    full = state.sync_token is None
+    try:
+        events, next_sync_token = await fetch_calendar_changes(
+            access_token, state.calendar_id, state.sync_token, limiter
+        )
+    except SyncTokenExpired:
+        full = True
+        events, next_sync_token = await fetch_calendar_changes(
+            access_token, state.calendar_id, None, limiter
+        )
+
+    changed = await apply_calendar_changes(db, state.user_id, state.calendar_id, events, full)
+
+    now = datetime.utcnow()
+    state.sync_token = next_sync_token
+    state.last_synced_at = now
+    if full:
+        state.last_full_sync_at = now
+    await db.commit()
+
+    return {"calendar_id": state.calendar_id, "events_fetched": len(events), "changed": changed, "full": full}
+
+
+async def sync_user_calendars(
+    db: AsyncSession,
+    user_id: int,
+    limiter: Optional[AsyncRateLimiter] = None
+) -> Dict[str, Any]:
+    """
+    Синхронизировать календари пользователя, в которых есть события заметок.
+    Пользователи без таких событий не делают ни одного запроса к Google.
+    """
+    result = await db.execute(
+        select(NoteCalendarEvent.calendar_id)
+        .join(Note, Note.id == NoteCalendarEvent.note_id)
+        .where(Note.user_id == user_id)
+        .distinct()
+    )
+    calendar_ids = [calendar_id for calendar_id in result.scalars().all() if calendar_id]
+    if not calendar_ids:
+        return {"success": True, "events_synced": 0, "calendars": []}
+
+    access_token = await google_calendar_service.get_access_token(user_id, db)
+    if not access_token:
+        return {"success": False, "message": "Google calendar not connected", "events_synced": 0}
+
+    result = await db.execute(select(CalendarSyncState).where(CalendarSyncState.user_id == user_id))
+    states = {state.calendar_id: state for state in result.scalars().all()}
+
+    calendars = []
+    for calendar_id in calendar_ids:
+        state = states.get(calendar_id)
+        if state is None:
+            state = CalendarSyncState(user_id=user_id, calendar_id=calendar_id)
+            db.add(state)
+        calendars.append(await sync_calendar(db, access_token, state, limiter))
+
+    return {
+        "success": True,
+        "events_synced": sum(calendar["changed"] for calendar in calendars),
+        "calendars": calendars,
+    }
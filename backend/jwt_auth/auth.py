@@ -9,11 +9,14 @@ from passlib.hash import bcrypt
 import jwt
 from jwt import InvalidTokenError
 from datetime import datetime, timedelta, timezone
+import hashlib
 import os
 import secrets
-from typing import Annotated, Optional
+from typing import Annotated, Any, Dict, Optional
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from dotenv import load_dotenv
+from config import settings
+from redis_config import async_cache
 
 load_dotenv()
 
@@ -25,6 +28,19 @@ REFRESH_TOKEN_EXPIRE_DAYS = 7  # 7 дней для refresh токена
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Поля пользователя в кеше принципала (без хеша пароля)
+USER_CACHE_FIELDS = (
+    "id",
+    "username",
+    "email",
+    "is_pro",
+    "created_at",
+    "google_id",
+    "google_email",
+    "google_name",
+    "google_picture",
+)
+
 
 async def create_user(db: AsyncSession, user: UserCreate):
     hashed_password = get_password_hash(user.password)
@@ -48,6 +64,52 @@ async def get_user(db: AsyncSession, email: str):
     return result.scalar_one_or_none()
 
 
+def get_user_cache_key(sub: str) -> str:
+    """Ключ кеша пользователя по sub токена (email хешируется)"""
+    return f"auth:user:{hashlib.sha256(sub.encode()).hexdigest()}"
+
+
+def _user_to_cache(user: User) -> Dict[str, Any]:
+    data = {field: getattr(user, field) for field in USER_CACHE_FIELDS}
+    if data["created_at"] is not None:
+        data["created_at"] = data["created_at"].isoformat()
+    return data
+
+
+def _user_from_cache(data: Dict[str, Any]) -> User:
+    data = dict(data)
+    if data.get("created_at"):
+        data["created_at"] = datetime.fromisoformat(data["created_at"])
+    # Объект не привязан к сессии: для изменений пользователя загружайте его из БД
+    return User(**data)
+
+
+async def get_cached_user(db: AsyncSession, email: str) -> Optional[User]:
+    """
+    Пользователь по sub токена: из кеша Redis (короткий TTL), при промахе из БД.
+    Снимает запрос к users с каждого авторизованного запроса.
+    """
+    key = get_user_cache_key(email)
+    data = await async_cache.get(key)
+    if data is not None:
+        return _user_from_cache(data)
+
+    user = await get_user(db, email)
+    if user is not None:
+        await async_cache.set(
+            key,
+            _user_to_cache(user),
+            ttl=timedelta(seconds=settings.AUTH_USER_CACHE_TTL),
+            user_id=user.id
+        )
+    return user
+
+
+async def invalidate_cached_user(email: str) -> None:
+    """Сбросить кеш пользователя после изменения профиля или привязки Google"""
+    await async_cache.delete(get_user_cache_key(email))
+
+
 async def authenticate_user(db: AsyncSession, email: str, password: str):
     user = await get_user(db, email)
     if not user:
@@ -148,7 +210,7 @@ async def get_current_user(request: Request, db: AsyncSession = Depends(get_asyn
         if email is None:
             raise credentials_exception
             
-        user = await get_user(db, email=email)
+        user = await get_cached_user(db, email=email)
         if user is None:
             raise credentials_exception
         return user
@@ -5,7 +5,9 @@ from notes.router import router as notes_router
 from ai_agent.router import router as ai_agent_router
 from auth.oauth_router import router as oauth_router, protected_router as oauth_protected_router
 from google_calendar.router import router as calendar_router
-from database import async_engine
+from database import async_engine, get_pool_stats
+from redis_config import async_cache_pool, ai_result_cache
+from google_calendar.client import calendar_client
 from models import Base
 from fastapi.middleware.cors import CORSMiddleware
 import os
@@ -37,7 +39,8 @@ app.add_middleware(
     allow_origins=frontend_urls,
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["ETag"]
 )
 
 @app.on_event("startup")
@@ -45,6 +48,13 @@ async def startup():
     # Создаем таблицы при запуске (для разработки)
     pass
 
+@app.on_event("shutdown")
+async def shutdown():
+    # Закрываем соединения пулов
+    await async_engine.dispose()
+    await async_cache_pool.disconnect()
+    await calendar_client.aclose()
+
 @app.get("/")
 def read_root():
     return {
@@ -58,6 +68,16 @@ def read_root():
         }
     }
 
+@app.get("/health/db-pool")
+def db_pool_stats():
+    """Состояние пулов соединений с БД в этом процессе"""
+    return get_pool_stats()
+
+@app.get("/health/cache")
+def ai_cache_stats():
+    """Счетчики кеша результатов AI анализа в этом процессе"""
+    return ai_result_cache.stats()
+
 app.include_router(auth_router, prefix="/auth", tags=["authentication"])
 app.include_router(oauth_router)  # OAuth роутер уже имеет prefix="/auth"
 app.include_router(oauth_protected_router)  # Защищенные OAuth эндпоинты
@@ -0,0 +1,40 @@
+"""add note connections indexes
+
+Revision ID: a7d3e9b15c28
+Revises: f3a9c2d71b45
+Create Date: 2026-10-17 17:12:48.906215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e9b15c28'
+down_revision: Union[str, None] = 'f3a9c2d71b45'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Индексы по обоим концам связи для обхода графа (рекурсивный CTE в notes/graph.py);
+    # INCLUDE позволяет читать соседа и тип связи без обращения к таблице
+    op.create_index(
+        'idx_note_connections_note_a_id',
+        'note_connections',
+        ['note_a_id'],
+        postgresql_include=['note_b_id', 'relation']
+    )
+    op.create_index(
+        'idx_note_connections_note_b_id',
+        'note_connections',
+        ['note_b_id'],
+        postgresql_include=['note_a_id', 'relation']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_note_connections_note_b_id', table_name='note_connections')
+    op.drop_index('idx_note_connections_note_a_id', table_name='note_connections')
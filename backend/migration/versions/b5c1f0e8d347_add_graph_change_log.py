@@ -0,0 +1,125 @@
+"""add graph change log
+
+Revision ID: b5c1f0e8d347
+Revises: a7d3e9b15c28
+Create Date: 2026-10-17 18:05:23.417730
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5c1f0e8d347'
+down_revision: Union[str, None] = 'a7d3e9b15c28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('graph_versions',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'),
+    sa.Column('pruned_version', sa.BigInteger(), nullable=False, server_default='0'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('graph_changes',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('entity', sa.String(length=10), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('op', sa.String(length=10), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text("(now() at time zone 'utc')")),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'version')
+    )
+    # Очистка журнала по возрасту (tasks.maintenance.prune_graph_changes)
+    op.create_index('idx_graph_changes_created_at', 'graph_changes', ['created_at'])
+
+    # Номер изменения выдается из строки graph_versions пользователя: блокировка строки
+    # до конца транзакции упорядочивает версии по коммиту, поэтому клиент, прочитавший
+    # версию V, не пропустит изменение с меньшей версией, закоммиченное позже
+    op.execute("""
+        CREATE FUNCTION log_graph_change(p_user_id integer, p_entity text, p_entity_id integer, p_op text)
+        RETURNS void AS $$
+        DECLARE
+            next_version bigint;
+        BEGIN
+            IF p_user_id IS NULL THEN
+                RETURN;
+            END IF;
+            INSERT INTO graph_versions AS gv (user_id, version) VALUES (p_user_id, 1)
+            ON CONFLICT (user_id) DO UPDATE SET version = gv.version + 1
+            RETURNING gv.version INTO next_version;
+            INSERT INTO graph_changes (user_id, version, entity, entity_id, op)
+            VALUES (p_user_id, next_version, p_entity, p_entity_id, p_op);
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE FUNCTION notes_graph_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                PERFORM log_graph_change(OLD.user_id, 'node', OLD.id, 'delete');
+            ELSE
+                PERFORM log_graph_change(NEW.user_id, 'node', NEW.id, 'upsert');
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE FUNCTION note_connections_graph_change() RETURNS trigger AS $$
+        DECLARE
+            edge note_connections%ROWTYPE;
+            owner_id integer;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                edge := OLD;
+            ELSE
+                edge := NEW;
+            END IF;
+            SELECT user_id INTO owner_id FROM notes WHERE id = edge.note_a_id;
+            PERFORM log_graph_change(
+                owner_id, 'edge', edge.id,
+                CASE WHEN TG_OP = 'DELETE' THEN 'delete' ELSE 'upsert' END
+            );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER notes_graph_change_insert_delete
+        AFTER INSERT OR DELETE ON notes
+        FOR EACH ROW EXECUTE FUNCTION notes_graph_change()
+    """)
+    # Вершина графа содержит только заголовок, категорию и важность: изменения текста не логируются
+    op.execute("""
+        CREATE TRIGGER notes_graph_change_update
+        AFTER UPDATE OF title, category, importance ON notes
+        FOR EACH ROW
+        WHEN (OLD.title IS DISTINCT FROM NEW.title
+              OR OLD.category IS DISTINCT FROM NEW.category
+              OR OLD.importance IS DISTINCT FROM NEW.importance)
+        EXECUTE FUNCTION notes_graph_change()
+    """)
+    op.execute("""
+        CREATE TRIGGER note_connections_graph_change
+        AFTER INSERT OR UPDATE OR DELETE ON note_connections
+        FOR EACH ROW EXECUTE FUNCTION note_connections_graph_change()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS note_connections_graph_change ON note_connections")
+    op.execute("DROP TRIGGER IF EXISTS notes_graph_change_update ON notes")
+    op.execute("DROP TRIGGER IF EXISTS notes_graph_change_insert_delete ON notes")
+    op.execute("DROP FUNCTION IF EXISTS note_connections_graph_change()")
+    op.execute("DROP FUNCTION IF EXISTS notes_graph_change()")
+    op.execute("DROP FUNCTION IF EXISTS log_graph_change(integer, text, integer, text)")
+    op.drop_index('idx_graph_changes_created_at', table_name='graph_changes')
+    op.drop_table('graph_changes')
+    op.drop_table('graph_versions')
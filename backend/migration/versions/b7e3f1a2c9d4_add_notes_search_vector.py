@@ -0,0 +1,42 @@
+"""add notes search vector
+
+Revision ID: b7e3f1a2c9d4
+Revises: 932112b19d54
+Create Date: 2026-10-17 10:12:31.418203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3f1a2c9d4'
+down_revision: Union[str, None] = '932112b19d54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(content, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    # Генерируемая колонка с полнотекстовым вектором заголовка и текста
+    op.add_column(
+        'notes',
+        sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR_SQL, persisted=True), nullable=True)
+    )
+
+    # GIN индекс для поиска по @@
+    op.create_index('idx_notes_search_vector', 'notes', ['search_vector'], postgresql_using='gin')
+
+
+def downgrade() -> None:
+    op.drop_index('idx_notes_search_vector', table_name='notes')
+    op.drop_column('notes', 'search_vector')
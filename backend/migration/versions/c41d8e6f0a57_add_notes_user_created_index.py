@@ -0,0 +1,27 @@
+"""add notes user created index
+
+Revision ID: c41d8e6f0a57
+Revises: b7e3f1a2c9d4
+Create Date: 2026-10-17 11:03:52.667410
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41d8e6f0a57'
+down_revision: Union[str, None] = 'b7e3f1a2c9d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Составной индекс для keyset-пагинации заметок пользователя по (created_at, id)
+    op.create_index('idx_notes_user_created_id', 'notes', ['user_id', 'created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_notes_user_created_id', table_name='notes')
@@ -0,0 +1,58 @@
+"""add note connections unique edge
+
+Revision ID: c9e4a6d2f718
+Revises: b5c1f0e8d347
+Create Date: 2026-10-17 19:02:41.582306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9e4a6d2f718'
+down_revision: Union[str, None] = 'b5c1f0e8d347'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # NULL в уникальном индексе не конфликтует с другими NULL, поэтому тип связи обязателен
+    op.execute("UPDATE note_connections SET relation = 'RELATED' WHERE relation IS NULL")
+    op.alter_column(
+        'note_connections', 'relation',
+        existing_type=sa.String(length=255),
+        nullable=False,
+        server_default='RELATED'
+    )
+    # Дубликаты (в том числе встречные A->B и B->A одного типа): остается самая ранняя связь
+    op.execute("""
+        DELETE FROM note_connections duplicate
+        USING note_connections original
+        WHERE LEAST(duplicate.note_a_id, duplicate.note_b_id) = LEAST(original.note_a_id, original.note_b_id)
+          AND GREATEST(duplicate.note_a_id, duplicate.note_b_id) = GREATEST(original.note_a_id, original.note_b_id)
+          AND duplicate.relation = original.relation
+          AND duplicate.id > original.id
+    """)
+    op.create_index(
+        'uq_note_connections_edge',
+        'note_connections',
+        [
+            sa.text('LEAST(note_a_id, note_b_id)'),
+            sa.text('GREATEST(note_a_id, note_b_id)'),
+            'relation',
+        ],
+        unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_note_connections_edge', table_name='note_connections')
+    op.alter_column(
+        'note_connections', 'relation',
+        existing_type=sa.String(length=255),
+        nullable=True,
+        server_default=None
+    )
@@ -0,0 +1,55 @@
+"""add graph analytics
+
+Revision ID: d6f2b8a41e93
+Revises: c9e4a6d2f718
+Create Date: 2026-10-17 20:14:06.739152
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6f2b8a41e93'
+down_revision: Union[str, None] = 'c9e4a6d2f718'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('graph_analytics',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('graph_version', sa.BigInteger(), nullable=False),
+    sa.Column('nodes', sa.Integer(), nullable=False),
+    sa.Column('edges', sa.Integer(), nullable=False),
+    sa.Column('components', sa.Integer(), nullable=False),
+    sa.Column('communities', sa.Integer(), nullable=False),
+    sa.Column('modularity', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('note_graph_metrics',
+    sa.Column('note_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('centrality', sa.Float(), nullable=False),
+    sa.Column('degree', sa.Integer(), nullable=False),
+    sa.Column('component', sa.Integer(), nullable=False),
+    sa.Column('community', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['note_id'], ['notes.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('note_id')
+    )
+    op.create_index(
+        'idx_note_graph_metrics_user_community',
+        'note_graph_metrics',
+        ['user_id', 'community', 'centrality']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_note_graph_metrics_user_community', table_name='note_graph_metrics')
+    op.drop_table('note_graph_metrics')
+    op.drop_table('graph_analytics')
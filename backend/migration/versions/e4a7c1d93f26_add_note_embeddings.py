@@ -0,0 +1,40 @@
+"""add note embeddings
+
+Revision ID: e4a7c1d93f26
+Revises: d6f2b8a41e93
+Create Date: 2026-10-17 21:36:52.104583
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7c1d93f26'
+down_revision: Union[str, None] = 'd6f2b8a41e93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Семантический индекс переезжает из файлов .npz в БД: запись построчная,
+    # API и воркеры Celery больше не перезаписывают индекс друг друга.
+    # Индекс заполняется заново при первом поиске пользователя (rebuild_semantic_index)
+    op.create_table('note_embeddings',
+    sa.Column('note_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('embedder', sa.String(length=100), nullable=False),
+    sa.Column('vector', sa.LargeBinary(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['note_id'], ['notes.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('note_id')
+    )
+    op.create_index('idx_note_embeddings_user_embedder', 'note_embeddings', ['user_id', 'embedder'])
+
+
+def downgrade() -> None:
+    op.drop_index('idx_note_embeddings_user_embedder', table_name='note_embeddings')
+    op.drop_table('note_embeddings')
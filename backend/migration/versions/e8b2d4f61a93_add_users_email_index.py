@@ -0,0 +1,31 @@
+"""add users email index
+
+Revision ID: e8b2d4f61a93
+Revises: c41d8e6f0a57
+Create Date: 2026-10-17 14:21:37.184905
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8b2d4f61a93'
+down_revision: Union[str, None] = 'c41d8e6f0a57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Уникальный индекс по email для поиска пользователя по sub токена.
+    # Он же обеспечивает уникальность, поэтому ограничение users_email_key
+    # (и его неявный индекс) удаляется, чтобы не поддерживать два индекса
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)")
+    op.execute("ALTER TABLE users DROP CONSTRAINT IF EXISTS users_email_key")
+
+
+def downgrade() -> None:
+    op.create_unique_constraint('users_email_key', 'users', ['email'])
+    op.drop_index('ix_users_email', table_name='users')
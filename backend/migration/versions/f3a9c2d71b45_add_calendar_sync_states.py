@@ -0,0 +1,46 @@
+"""add calendar sync states
+
+Revision ID: f3a9c2d71b45
+Revises: e8b2d4f61a93
+Create Date: 2026-10-17 16:02:11.530417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9c2d71b45'
+down_revision: Union[str, None] = 'e8b2d4f61a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # nextSyncToken каждого календаря пользователя для инкрементальной синхронизации
+    op.create_table('calendar_sync_states',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('calendar_id', sa.String(length=255), nullable=False),
+    sa.Column('sync_token', sa.Text(), nullable=True),
+    sa.Column('last_synced_at', sa.DateTime(), nullable=True),
+    sa.Column('last_full_sync_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['google_tokens.user_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'calendar_id', name='uq_calendar_sync_states_user_calendar')
+    )
+    # Поиск связанных с заметками событий по ID события из дельты Google
+    op.create_index(
+        'idx_note_calendar_events_google_event_id',
+        'note_calendar_events',
+        ['google_event_id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('idx_note_calendar_events_google_event_id', table_name='note_calendar_events')
+    op.drop_table('calendar_sync_states')
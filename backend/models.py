@@ -2,19 +2,30 @@ from datetime import datetime
 from typing import List
 
 from sqlalchemy import (
-    Column, Integer, Text, ForeignKey, DateTime, String, Boolean
+    Column, Integer, BigInteger, Float, Text, ForeignKey, DateTime, String, Boolean, Computed, Index, LargeBinary,
+    UniqueConstraint, func, text
 )
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, declarative_base, deferred
 
 Base = declarative_base()
 
+# Выражение полнотекстового вектора заметки: заголовок (вес A) и текст (вес B)
+# индексируются и русской, и английской конфигурацией
+NOTE_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(content, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+)
+
 
 class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     username = Column(String, unique=True, index=True)
-    email = Column(String(255), unique=True, nullable=False)
+    email = Column(String(255), unique=True, index=True, nullable=False)
     hashed_password = Column(String(255), nullable=True)  # Nullable для Google OAuth
     is_pro = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -41,13 +52,29 @@ class Note(Base):
     importance = Column(Integer, default=1)  # Важность 1-5 (AI анализ)
     tags = Column(Text, nullable=True)  # JSON массив тегов
     summary = Column(Text, nullable=True)  # Краткое резюме (AI генерация)
+    # Заметка прошла AI анализ (миграция 932112b19d54); необработанные
+    # выбирает периодическая задача analyze_unprocessed_notes
+    ai_processed = Column(Boolean, nullable=True, default=False)
+    ai_processed_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Полнотекстовый индекс (генерируется БД, не загружается по умолчанию)
+    search_vector = deferred(Column(TSVECTOR, Computed(NOTE_SEARCH_VECTOR_SQL, persisted=True)))
 
     user = relationship("User", back_populates='notes')
     connections_as_a = relationship("NoteConnection", back_populates='note_a', foreign_keys='NoteConnection.note_a_id', cascade='all, delete-orphan')
     connections_as_b = relationship("NoteConnection", back_populates='note_b', foreign_keys='NoteConnection.note_b_id', cascade='all, delete-orphan')
     calendar_events = relationship("NoteCalendarEvent", back_populates='note', cascade='all, delete-orphan')
+
+    __table_args__ = (
+        Index('idx_notes_search_vector', 'search_vector', postgresql_using='gin'),
+        # Keyset-пагинация списков заметок пользователя
+        Index('idx_notes_user_created_id', 'user_id', 'created_at', 'id'),
+        Index(
+            'idx_notes_ai_unprocessed', 'ai_processed',
+            postgresql_where=text('ai_processed IS FALSE OR ai_processed IS NULL')
+        ),
+    )
     
 
 class NoteConnection(Base):
@@ -57,11 +84,112 @@ class NoteConnection(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     note_a_id = Column(ForeignKey("notes.id"), nullable=False)
     note_b_id = Column(ForeignKey("notes.id"), nullable=False)
-    relation = Column(String(255), default='RELATED')
+    relation = Column(String(255), nullable=False, default='RELATED', server_default='RELATED')
 
     note_a = relationship("Note", back_populates='connections_as_a', foreign_keys=[note_a_id])
     note_b = relationship("Note", back_populates='connections_as_b', foreign_keys=[note_b_id])
-    
+
+    __table_args__ = (
+        # Обход графа в обе стороны: поиск ребер по любому концу
+        Index('idx_note_connections_note_a_id', 'note_a_id', postgresql_include=['note_b_id', 'relation']),
+        Index('idx_note_connections_note_b_id', 'note_b_id', postgresql_include=['note_a_id', 'relation']),
+        # Одна связь каждого типа на пару заметок независимо от направления;
+        # цель ON CONFLICT в notes.crud.create_connections
+        Index(
+            'uq_note_connections_edge',
+            func.least(note_a_id, note_b_id),
+            func.greatest(note_a_id, note_b_id),
+            relation,
+            unique=True
+        ),
+    )
+
+
+class GraphVersion(Base):
+    """
+    Версия графа заметок пользователя (номер последнего изменения в graph_changes).
+    Ведется триггерами БД на notes и note_connections (миграция b5c1f0e8d347)
+    """
+    __tablename__ = "graph_versions"
+
+    user_id = Column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0, server_default='0')
+    # Изменения с версией <= pruned_version удалены из журнала
+    pruned_version = Column(BigInteger, nullable=False, default=0, server_default='0')
+
+
+class GraphChange(Base):
+    """Журнал изменений графа заметок: вершина/ребро и операция (upsert/delete)"""
+    __tablename__ = "graph_changes"
+
+    user_id = Column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    version = Column(BigInteger, primary_key=True)
+    entity = Column(String(10), nullable=False)  # node | edge
+    entity_id = Column(Integer, nullable=False)
+    op = Column(String(10), nullable=False)  # upsert | delete
+    created_at = Column(
+        DateTime, nullable=False, default=datetime.utcnow,
+        server_default=text("(now() at time zone 'utc')")
+    )
+
+    __table_args__ = (
+        Index('idx_graph_changes_created_at', 'created_at'),
+    )
+
+
+class NoteEmbedding(Base):
+    """
+    Вектор заметки для семантического поиска кандидатов связей (ai_agent/semantic_index.py).
+    Хранится как массив float32; embedder - эмбеддер и размерность, которыми он получен.
+    """
+    __tablename__ = "note_embeddings"
+
+    note_id = Column(ForeignKey("notes.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    embedder = Column(String(100), nullable=False)
+    vector = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_note_embeddings_user_embedder', 'user_id', 'embedder'),
+    )
+
+
+class GraphAnalytics(Base):
+    """
+    Последний расчет аналитики графа заметок пользователя (notes/analytics.py):
+    версия графа, по которой он сделан, и сводка
+    """
+    __tablename__ = "graph_analytics"
+
+    user_id = Column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    # GraphVersion.version на момент чтения графа; меньше текущей - метрики устарели
+    graph_version = Column(BigInteger, nullable=False, default=0)
+    nodes = Column(Integer, nullable=False, default=0)
+    edges = Column(Integer, nullable=False, default=0)
+    components = Column(Integer, nullable=False, default=0)
+    communities = Column(Integer, nullable=False, default=0)
+    modularity = Column(Float, nullable=False, default=0.0)
+    computed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class NoteGraphMetrics(Base):
+    """Метрики заметки в графе связей: центральность, компонента связности и сообщество"""
+    __tablename__ = "note_graph_metrics"
+
+    note_id = Column(ForeignKey("notes.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    centrality = Column(Float, nullable=False)  # PageRank, сумма по заметкам пользователя = 1
+    degree = Column(Integer, nullable=False)
+    # Номера компонент и сообществ в порядке убывания размера (0 - самое большое)
+    component = Column(Integer, nullable=False)
+    community = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # Группы заметок пользователя по сообществам, внутри - по центральности
+        Index('idx_note_graph_metrics_user_community', 'user_id', 'community', 'centrality'),
+    )
+
 
 class RelatedLink(Base):
     """ Рекомендации """
@@ -132,3 +260,27 @@ class NoteCalendarEvent(Base):
 
     note = relationship("Note", back_populates='calendar_events')
 
+    __table_args__ = (
+        # Применение изменений из Google Calendar по ID события
+        Index('idx_note_calendar_events_google_event_id', 'google_event_id'),
+    )
+
+
+class CalendarSyncState(Base):
+    """Состояние инкрементальной синхронизации календаря Google (nextSyncToken)"""
+    __tablename__ = "calendar_sync_states"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # Удаляется вместе с токеном Google: после переподключения нужна полная синхронизация
+    user_id = Column(ForeignKey("google_tokens.user_id", ondelete="CASCADE"), nullable=False)
+    calendar_id = Column(String(255), nullable=False)
+    sync_token = Column(Text, nullable=True)
+    last_synced_at = Column(DateTime, nullable=True)
+    last_full_sync_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'calendar_id', name='uq_calendar_sync_states_user_calendar'),
+    )
+
@@ -0,0 +1,385 @@
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from sqlalchemy import Float, Integer, and_, column, delete, func, literal, select, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from models import GraphAnalytics, GraphVersion, Note, NoteConnection, NoteGraphMetrics
+from redis_config import redis_cache_async
+
+# PageRank: коэффициент затухания и критерий сходимости (L1 норма изменения на вершину)
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-10
+PAGERANK_MAX_ITERATIONS = 100
+
+# Louvain: уровней агрегации и проходов локального перемещения на уровне
+LOUVAIN_MAX_LEVELS = 10
+LOUVAIN_MAX_SWEEPS = 20
+
+# Строк метрик в одном INSERT (5 параметров на строку, лимит asyncpg - 32767)
+STORE_CHUNK_SIZE = 5000
+
+# Пока пересчет стоит в очереди, повторные запросы его не дублируют
+SCHEDULE_TTL = timedelta(minutes=10)
+
+DEFAULT_CATEGORY = "General"
+
+
+# ---------- Расчет (CPU, без БД) ----------
+
+def build_adjacency(note_ids: np.ndarray, sources: np.ndarray, targets: np.ndarray) -> sparse.csr_matrix:
+    """
+    Симметричная матрица смежности CSR по отсортированным note_ids. Связи считаются
+    неориентированными, несколько связей между парой заметок складываются в вес.
+    Петли и концы вне note_ids отбрасываются.
+    """
+    n = len(note_ids)
+    rows = np.searchsorted(note_ids, sources)
+    cols = np.searchsorted(note_ids, targets)
+    valid = (rows < n) & (cols < n)
+    valid[valid] = (note_ids[rows[valid]] == sources[valid]) & (note_ids[cols[valid]] == targets[valid])
+    valid &= rows != cols
+    rows, cols = rows[valid], cols[valid]
+
+    weights = np.ones(2 * len(rows), dtype=np.float64)
+    # tocsr складывает повторяющиеся элементы
+    return sparse.coo_matrix(
+        (weights, (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+        shape=(n, n)
+    ).tocsr()
+
+
+def pagerank(
+    adjacency: sparse.csr_matrix,
+    damping: float = PAGERANK_DAMPING,
+    tolerance: float = PAGERANK_TOLERANCE,
+    max_iterations: int = PAGERANK_MAX_ITERATIONS
+) -> np.ndarray:
+    """PageRank степенным методом; вес висячих вершин распределяется равномерно. Сумма = 1"""
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.zeros(0)
+
+    out_weight = np.asarray(adjacency.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    inverse_weight = np.divide(1.0, out_weight, out=np.zeros(n), where=~dangling)
+    transition = adjacency.T.tocsr()
+
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iterations):
+        spread = transition @ (rank * inverse_weight)
+        updated = damping * (spread + rank[dangling].sum() / n) + (1.0 - damping) / n
+        converged = np.abs(updated - rank).sum() < tolerance * n
+        rank = updated
+        if converged:
+            break
+    return rank / rank.sum()
+
+
+def _louvain_level(adjacency: sparse.csr_matrix, resolution: float, max_sweeps: int) -> Tuple[np.ndarray, bool]:
+    """
+    Фаза локального перемещения Louvain: вершины по очереди переходят в соседнее
+    сообщество с наибольшим приростом модулярности. Возвращает (сообщества, были ли переходы).
+    """
+    n = adjacency.shape[0]
+    # Списки Python быстрее поэлементного доступа к массивам numpy в цикле
+    indptr = adjacency.indptr.tolist()
+    indices = adjacency.indices.tolist()
+    weights = adjacency.data.tolist()
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel().tolist()
+    two_m = sum(degrees)
+
+    community = list(range(n))
+    totals = list(degrees)
+    moved_any = False
+    for _ in range(max_sweeps):
+        moved = False
+        for node in range(n):
+            degree = degrees[node]
+            if degree == 0:
+                continue
+            current = community[node]
+            links: Dict[int, float] = {}
+            for position in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[position]
+                if neighbour != node:
+                    target = community[neighbour]
+                    links[target] = links.get(target, 0.0) + weights[position]
+
+            # Прирост модулярности при переходе изолированной вершины в сообщество
+            # (с точностью до общего множителя): k_i,in - resolution * tot * k_i / 2m
+            totals[current] -= degree
+            scale = resolution * degree / two_m
+            best = current
+            best_gain = links.get(current, 0.0) - totals[current] * scale
+            for target, weight in links.items():
+                gain = weight - totals[target] * scale
+                if gain > best_gain + 1e-12:
+                    best, best_gain = target, gain
+            totals[best] += degree
+
+            if best != current:
+                community[node] = best
+                moved = True
+        if not moved:
+            break
+        moved_any = True
+    return np.asarray(community), moved_any
+
+
+def louvain_communities(
+    adjacency: sparse.csr_matrix,
+    resolution: float = 1.0,
+    max_levels: int = LOUVAIN_MAX_LEVELS,
+    max_sweeps: int = LOUVAIN_MAX_SWEEPS
+) -> np.ndarray:
+    """
+    Сообщества методом Louvain: локальное перемещение, затем сообщества сжимаются
+    в вершины (C^T A C) и шаг повторяется, пока переходы есть
+    """
+    membership = np.arange(adjacency.shape[0])
+    graph = adjacency
+    for _ in range(max_levels):
+        if graph.nnz == 0:
+            break
+        community, moved = _louvain_level(graph, resolution, max_sweeps)
+        if not moved:
+            break
+        _, labels = np.unique(community, return_inverse=True)
+        membership = labels[membership]
+        size = len(labels)
+        assignment = sparse.csr_matrix(
+            (np.ones(size), (np.arange(size), labels)),
+            shape=(size, labels.max() + 1)
+        )
+        graph = (assignment.T @ graph @ assignment).tocsr()
+    return membership
+
+
+def modularity(adjacency: sparse.csr_matrix, membership: np.ndarray, resolution: float = 1.0) -> float:
+    """Модулярность разбиения вершин на сообщества"""
+    two_m = adjacency.sum()
+    if two_m == 0:
+        return 0.0
+    edges = adjacency.tocoo()
+    internal = edges.data[membership[edges.row] == membership[edges.col]].sum()
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel()
+    totals = np.bincount(membership, weights=degrees)
+    return float(internal / two_m - resolution * np.sum((totals / two_m) ** 2))
+
+
+def _rank_by_size(labels: np.ndarray) -> np.ndarray:
+    """Перенумеровать группы по убыванию размера: 0 - самая большая"""
+    if len(labels) == 0:
+        return labels
+    _, labels = np.unique(labels, return_inverse=True)
+    counts = np.bincount(labels)
+    order = np.lexsort((np.arange(len(counts)), -counts))
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rank[labels]
+
+
+def analyze_graph(note_ids: np.ndarray, sources: np.ndarray, targets: np.ndarray) -> Dict[str, Any]:
+    """Метрики графа заметок: PageRank, степень, компоненты связности и сообщества Louvain"""
+    adjacency = build_adjacency(note_ids, sources, targets)
+    _, components = connected_components(adjacency, directed=False)
+    communities = louvain_communities(adjacency)
+    return {
+        "note_ids": note_ids,
+        "centrality": pagerank(adjacency),
+        "degree": np.diff(adjacency.indptr),
+        "component": _rank_by_size(components),
+        "community": _rank_by_size(communities),
+        "edges": adjacency.nnz // 2,
+        "modularity": modularity(adjacency, communities),
+    }
+
+
+# ---------- Загрузка и сохранение ----------
+
+async def load_user_graph(db: AsyncSession, user_id: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """Заметки (отсортированные ID) и связи пользователя и версия графа: (note_ids, sources, targets, version)"""
+    # Версия читается первой: изменения между запросами дадут лишний пересчет, но не потеряются
+    version = await db.scalar(select(GraphVersion.version).where(GraphVersion.user_id == user_id))
+
+    result = await db.scalars(select(Note.id).where(Note.user_id == user_id).order_by(Note.id))
+    note_ids = np.fromiter(result.all(), dtype=np.int64)
+
+    source = aliased(Note)
+    target = aliased(Note)
+    result = await db.execute(
+        select(NoteConnection.note_a_id, NoteConnection.note_b_id)
+        .join(source, and_(source.id == NoteConnection.note_a_id, source.user_id == user_id))
+        .join(target, and_(target.id == NoteConnection.note_b_id, target.user_id == user_id))
+    )
+    edges = np.array(result.all(), dtype=np.int64).reshape(-1, 2)
+    return note_ids, edges[:, 0], edges[:, 1], version or 0
+
+
+async def store_graph_metrics(db: AsyncSession, user_id: int, version: int, metrics: Dict[str, Any]) -> GraphAnalytics:
+    """
+    Заменить метрики заметок пользователя одной транзакцией. Строки вставляются
+    пачками INSERT ... SELECT с проверкой, что заметка еще существует.
+    """
+    await db.execute(delete(NoteGraphMetrics).where(NoteGraphMetrics.user_id == user_id))
+
+    rows = list(zip(
+        metrics["note_ids"].tolist(),
+        metrics["centrality"].tolist(),
+        metrics["degree"].tolist(),
+        metrics["component"].tolist(),
+        metrics["community"].tolist(),
+    ))
+    for start in range(0, len(rows), STORE_CHUNK_SIZE):
+        chunk = (
+            values(
+                column("note_id", Integer),
+                column("centrality", Float),
+                column("degree", Integer),
+                column("component", Integer),
+                column("community", Integer),
+                name="metrics"
+            )
+            .data(rows[start:start + STORE_CHUNK_SIZE])
+        )
+        stmt = pg_insert(NoteGraphMetrics).from_select(
+            ["note_id", "user_id", "centrality", "degree", "component", "community"],
+            select(
+                chunk.c.note_id,
+                literal(user_id, Integer),
+                chunk.c.centrality,
+                chunk.c.degree,
+                chunk.c.component,
+                chunk.c.community
+            )
+            .select_from(chunk)
+            .join(Note, and_(Note.id == chunk.c.note_id, Note.user_id == user_id))
+        )
+        # Параллельный пересчет того же пользователя мог успеть вставить строки
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[NoteGraphMetrics.note_id],
+            set_={name: stmt.excluded[name] for name in ("centrality", "degree", "component", "community")}
+        )
+        await db.execute(stmt)
+
+    summary = {
+        "graph_version": version,
+        "nodes": len(rows),
+        "edges": int(metrics["edges"]),
+        "components": int(metrics["component"].max()) + 1 if rows else 0,
+        "communities": int(metrics["community"].max()) + 1 if rows else 0,
+        "modularity": metrics["modularity"],
+        "computed_at": datetime.utcnow(),
+    }
+    stmt = pg_insert(GraphAnalytics).values(user_id=user_id, **summary)
+    stmt = stmt.on_conflict_do_update(index_elements=[GraphAnalytics.user_id], set_=summary).returning(GraphAnalytics)
+    analytics = await db.scalar(stmt, execution_options={"populate_existing": True})
+    await db.commit()
+    return analytics
+
+
+async def refresh_graph_analytics(db: AsyncSession, user_id: int) -> GraphAnalytics:
+    """Пересчитать аналитику графа пользователя; расчет выполняется в отдельном потоке"""
+    note_ids, sources, targets, version = await load_user_graph(db, user_id)
+    # Не держим транзакцию открытой на время расчета
+    await db.commit()
+    metrics = await asyncio.to_thread(analyze_graph, note_ids, sources, targets)
+    return await store_graph_metrics(db, user_id, version, metrics)
+
+
+# ---------- Чтение ----------
+
+def get_schedule_key(user_id: int) -> str:
+    """Ключ отметки о поставленном в очередь пересчете"""
+    return f"graph_analytics:scheduled:{user_id}"
+
+
+async def schedule_graph_analytics(user_id: int) -> None:
+    """Поставить пересчет в очередь Celery, если он еще не стоит"""
+    from tasks.graph_tasks import compute_graph_analytics
+
+    try:
+        if not await redis_cache_async.set(get_schedule_key(user_id), 1, nx=True, ex=SCHEDULE_TTL):
+            return
+        compute_graph_analytics.delay(user_id)
+    except Exception as e:
+        print(f"Ошибка постановки пересчета аналитики графа: {e}")
+
+
+async def get_graph_analytics(db: AsyncSession, user_id: int) -> Tuple[GraphAnalytics, bool]:
+    """
+    Аналитика графа пользователя и признак устаревания. Первый расчет выполняется
+    сразу; устаревшая аналитика возвращается как есть, пересчет ставится в очередь.
+    """
+    current_version = (
+        select(GraphVersion.version)
+        .where(GraphVersion.user_id == user_id)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(GraphAnalytics, func.coalesce(current_version, 0))
+        .where(GraphAnalytics.user_id == user_id)
+    )
+    row = result.first()
+    if row is None:
+        return await refresh_graph_analytics(db, user_id), False
+
+    analytics, version = row
+    stale = version > analytics.graph_version
+    if stale:
+        await schedule_graph_analytics(user_id)
+    return analytics, stale
+
+
+async def get_note_communities(db: AsyncSession, user_id: int, min_size: int = 2) -> List[Dict[str, Any]]:
+    """
+    Сообщества заметок из сохраненных метрик (не меньше min_size заметок), от больших
+    к меньшим. Заметки внутри - по убыванию центральности; название группы - самая
+    центральная заметка, тема - самая частая категория.
+    """
+    communities = (
+        select(NoteGraphMetrics.community)
+        .where(NoteGraphMetrics.user_id == user_id)
+        .group_by(NoteGraphMetrics.community)
+        .having(func.count() >= min_size)
+    )
+    result = await db.execute(
+        select(
+            NoteGraphMetrics.community,
+            NoteGraphMetrics.centrality,
+            Note.id,
+            Note.title,
+            Note.category
+        )
+        .join(Note, Note.id == NoteGraphMetrics.note_id)
+        .where(NoteGraphMetrics.user_id == user_id, NoteGraphMetrics.community.in_(communities))
+        .order_by(NoteGraphMetrics.community, NoteGraphMetrics.centrality.desc(), Note.id)
+    )
+
+    groups: List[Dict[str, Any]] = []
+    for row in result.all():
+        if not groups or groups[-1]["community"] != row.community:
+            groups.append({"community": row.community, "notes": [], "titles": [], "categories": Counter()})
+        group = groups[-1]
+        group["notes"].append(row.id)
+        group["titles"].append(row.title or f"#{row.id}")
+        group["categories"][(row.category or "").strip() or DEFAULT_CATEGORY] += 1
+
+    return [
+        {
+            "community": group["community"],
+            "group_name": group["titles"][0],
+            "theme": group["categories"].most_common(1)[0][0],
+            "notes": group["notes"],
+            "summary": f"{len(group['notes'])} связанных заметок, ключевые: {', '.join(group['titles'][:3])}",
+        }
+        for group in groups
+    ]
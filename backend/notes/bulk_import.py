@@ -0,0 +1,263 @@
+import codecs
+import json
+from datetime import datetime
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Note
+from .http_cache import notes_changed
+from .schemas import NoteImport
+
+# Заметок в одном многострочном INSERT (6 параметров на строку, лимит asyncpg - 32767)
+IMPORT_CHUNK_SIZE = 1000
+
+# Сколько ошибок отдельных записей возвращается в ответе
+MAX_REPORTED_ERRORS = 100
+
+DUPLICATE_TITLE_ERROR = "Заметка с таким заголовком уже существует"
+CHUNK_ERROR = "Ошибка сохранения пачки заметок в базе данных"
+
+
+class ImportFormatError(ValueError):
+    """Тело импорта не является NDJSON или JSON массивом объектов"""
+
+
+async def iter_json_records(chunks: AsyncIterable[bytes]) -> AsyncIterator[Any]:
+    """
+    Потоковый разбор тела импорта: NDJSON (объект на строку) или JSON массив
+    объектов. Формат определяется по первому символу. Записи отдаются по мере
+    чтения, тело целиком в памяти не держится. Строка NDJSON с ошибкой отдается
+    как исключение ImportFormatError (разбор продолжается), ошибка в массиве
+    прерывает разбор.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    array: Optional[bool] = None
+    finished = False
+    position = 0
+
+    async def more() -> bool:
+        nonlocal buffer, position
+        chunk = await anext(chunk_iter, None)
+        buffer = buffer[position:] + utf8.decode(chunk or b"", final=chunk is None)
+        position = 0
+        return chunk is not None
+
+    chunk_iter = chunks.__aiter__()
+    has_more = True
+    while has_more or position < len(buffer):
+        if array is None:
+            stripped = buffer.lstrip()
+            if not stripped:
+                if not has_more:
+                    return
+                has_more = await more()
+                continue
+            array = stripped[0] == "["
+            position = len(buffer) - len(stripped) + (1 if array else 0)
+
+        if not array:
+            newline = buffer.find("\n", position)
+            if newline == -1 and has_more:
+                has_more = await more()
+                continue
+            end = len(buffer) if newline == -1 else newline
+            line = buffer[position:end].strip()
+            position = end + 1
+            if line:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield ImportFormatError(f"Некорректная строка JSON: {e.msg}")
+            continue
+
+        # JSON массив: пропускаем разделители, затем декодируем следующий элемент
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position >= len(buffer):
+            if not has_more:
+                break
+            has_more = await more()
+            continue
+        if buffer[position] == "]":
+            finished = True
+            break
+        try:
+            record, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            if has_more:
+                # Элемент еще не дочитан
+                has_more = await more()
+                continue
+            raise ImportFormatError(f"Некорректный JSON массив: {e.msg}")
+        yield record
+
+    if array and not finished:
+        raise ImportFormatError("JSON массив не закрыт")
+
+
+def _validation_message(error: ValidationError) -> str:
+    """Ошибки проверки записи одной строкой: "поле: сообщение; ..." """
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'record'}: {item['msg']}"
+        for item in error.errors(include_url=False)
+    )
+
+
+async def iter_records(records: Iterable[Any]) -> AsyncIterator[Any]:
+    """Готовый список записей как асинхронный источник для import_notes"""
+    for record in records:
+        yield record
+
+
+async def insert_notes(db: AsyncSession, notes: Sequence[NoteImport], user_id: int) -> List[Any]:
+    """
+    Вставить заметки одним многострочным INSERT ... ON CONFLICT DO NOTHING RETURNING.
+    Заметки с уже занятым заголовком пропускаются. Возвращает строки
+    (id, title, content, created_at, updated_at) вставленных заметок.
+    """
+    if not notes:
+        return []
+    now = datetime.utcnow()
+    rows = [
+        {
+            "user_id": user_id,
+            "title": note.title,
+            "content": note.content,
+            "created_at": note.created_at or now,
+            "updated_at": note.created_at or now,
+        }
+        for note in notes
+    ]
+    stmt = (
+        pg_insert(Note)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=[Note.title])
+        .returning(Note.id, Note.title, Note.content, Note.created_at, Note.updated_at)
+    )
+    result = await db.execute(stmt)
+    return list(result.all())
+
+
+async def import_notes(
+    db: AsyncSession,
+    records: AsyncIterable[Any],
+    user_id: int,
+    max_notes: Optional[int] = None,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    collect_created: bool = False,
+    max_errors: Optional[int] = MAX_REPORTED_ERRORS
+) -> Dict[str, Any]:
+    """
+    Импорт заметок из потока записей: записи проверяются пачками по chunk_size,
+    каждая пачка вставляется одним INSERT и коммитится, кеши заметок
+    сбрасываются один раз в конце. Ошибка БД при вставке пачки откатывает только
+    эту пачку: ее записи попадают в failed, импорт продолжается.
+    Анализ ставится отдельно (schedule_imported_notes).
+    Строки вставленных заметок возвращаются в created_notes, если collect_created;
+    ошибки записей - в errors (не больше max_errors, None - все).
+    """
+    summary: Dict[str, Any] = {
+        "received": 0,
+        "imported": 0,
+        "skipped": 0,
+        "failed": 0,
+        "truncated": False,
+        "errors": [],
+        "first_note_id": None,
+        "last_note_id": None,
+        "created_notes": [],
+    }
+
+    def report(index: int, error: str) -> None:
+        if max_errors is None or len(summary["errors"]) < max_errors:
+            summary["errors"].append({"index": index, "error": error})
+
+    def fail(index: int, error: str) -> None:
+        summary["failed"] += 1
+        report(index, error)
+
+    async def flush(chunk: List[Tuple[int, NoteImport]]) -> None:
+        try:
+            inserted = await insert_notes(db, [note for _, note in chunk], user_id)
+            await db.commit()
+        except SQLAlchemyError as e:
+            await db.rollback()
+            print(f"Ошибка вставки пачки импорта заметок: {e}")
+            for index, _ in chunk:
+                fail(index, CHUNK_ERROR)
+            return
+        summary["imported"] += len(inserted)
+        # Конфликтовать может только непустой заголовок
+        titles = {row.title for row in inserted}
+        for index, note in chunk:
+            if note.title is not None and note.title not in titles:
+                summary["skipped"] += 1
+                report(index, DUPLICATE_TITLE_ERROR)
+            titles.discard(note.title)
+        for row in inserted:
+            if collect_created:
+                summary["created_notes"].append(row)
+            if summary["first_note_id"] is None or row.id < summary["first_note_id"]:
+                summary["first_note_id"] = row.id
+            if summary["last_note_id"] is None or row.id > summary["last_note_id"]:
+                summary["last_note_id"] = row.id
+
+    chunk: List[Tuple[int, NoteImport]] = []
+    try:
+        try:
+            async for record in records:
+                index = summary["received"]
+                if max_notes is not None and index >= max_notes:
+                    summary["truncated"] = True
+                    break
+                summary["received"] += 1
+
+                if isinstance(record, ImportFormatError):
+                    fail(index, str(record))
+                    continue
+                try:
+                    chunk.append((index, NoteImport.model_validate(record)))
+                except ValidationError as e:
+                    fail(index, _validation_message(e))
+                    continue
+
+                if len(chunk) >= chunk_size:
+                    await flush(chunk)
+                    chunk = []
+        except ImportFormatError as e:
+            fail(summary["received"], str(e))
+        if chunk:
+            await flush(chunk)
+    finally:
+        # Вставленные пачки уже закоммичены, даже если импорт прервался
+        if summary["imported"]:
+            await notes_changed(user_id)
+
+    return summary
+
+
+def schedule_imported_notes(user_id: int, first_note_id: int, last_note_id: int) -> Optional[str]:
+    """
+    Одна задача анализа (пакетами BatchNoteAnalyzer) и одна задача индексации
+    для диапазона ID импортированных заметок вместо задачи на каждую заметку.
+    Возвращает ID задачи анализа.
+    """
+    from tasks.ai_tasks import analyze_all_notes_job, rebuild_semantic_index
+
+    try:
+        rebuild_semantic_index.delay(user_id=user_id, after_note_id=first_note_id - 1)
+        task = analyze_all_notes_job.delay(
+            user_id=user_id,
+            after_note_id=first_note_id - 1,
+            up_to_note_id=last_note_id
+        )
+        return task.id
+    except Exception as e:
+        print(f"Ошибка постановки анализа импортированных заметок: {e}")
+        return None
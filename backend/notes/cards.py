@@ -0,0 +1,32 @@
+from sqlalchemy import Select, select, func
+
+from models import Note
+
+# Длина превью текста заметки в списках
+NOTE_PREVIEW_CHARS = 200
+
+
+def select_note_cards() -> Select:
+    """
+    Запрос "карточек" заметок для списков: только нужные колонки,
+    вместо полного content - превью, обрезанное на стороне БД.
+    Строки результата совместимы с NoteResponse (from_attributes).
+    """
+    return select(
+        Note.id,
+        Note.user_id,
+        Note.title,
+        func.left(Note.content, NOTE_PREVIEW_CHARS).label("content"),
+        (func.length(Note.content) > NOTE_PREVIEW_CHARS).label("content_truncated"),
+        Note.category,
+        Note.importance,
+        Note.tags,
+        Note.summary,
+        Note.created_at,
+        Note.updated_at,
+    )
+
+
+def card_preview(card) -> str:
+    """Превью карточки с многоточием, если текст обрезан"""
+    return card.content + "..." if card.content_truncated else card.content
@@ -1,11 +1,30 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
-from sqlalchemy.orm import selectinload
-from typing import List, Optional
+from sqlalchemy import select, update, delete, func, case, or_, and_, column, values, Integer, String, Row
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import selectinload, aliased
+from typing import List, Optional, Sequence, Tuple
 from datetime import datetime
 
 from models import Note, NoteConnection, User
 from .schemas import NoteCreate, NoteUpdate, NoteConnectionCreate
+from .search import build_tsquery
+from .pagination import paginate_notes
+from .cards import select_note_cards
+from .http_cache import notes_changed
+
+
+def schedule_note_indexing(note_id: int, user_id: int) -> None:
+    """
+    Поставить обновление вектора заметки в семантическом индексе. Единственное
+    место постановки индексации заметок; удаленные заметки уходят из индекса
+    каскадно (note_embeddings.note_id ON DELETE CASCADE).
+    """
+    from tasks.ai_tasks import index_note_async
+
+    try:
+        index_note_async.delay(note_id=note_id, user_id=user_id)
+    except Exception as e:
+        print(f"Ошибка постановки индексации заметки: {e}")
 
 
 # CRUD операции для Note
@@ -19,6 +38,8 @@ async def create_note(db: AsyncSession, note: NoteCreate, user_id: int) -> Note:
     db.add(db_note)
     await db.commit()
     await db.refresh(db_note)
+    await notes_changed(user_id)
+    schedule_note_indexing(db_note.id, user_id)
     return db_note
 
 
@@ -55,6 +76,30 @@ async def get_user_notes(db: AsyncSession, user_id: int, skip: int = 0, limit: i
     return result.scalars().all()
 
 
+async def get_user_note_cards(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100) -> List[Row]:
+    """Получить карточки заметок пользователя (превью вместо полного текста) с пагинацией"""
+    result = await db.execute(
+        select_note_cards()
+        .filter(Note.user_id == user_id)
+        .offset(skip)
+        .limit(limit)
+        .order_by(Note.created_at.desc())
+    )
+    return result.all()
+
+
+async def get_user_notes_page(
+    db: AsyncSession,
+    user_id: int,
+    limit: int = 50,
+    cursor: Optional[str] = None
+) -> Tuple[List[Row], Optional[str]]:
+    """Получить страницу карточек заметок пользователя (keyset-пагинация) и курсор следующей"""
+    return await paginate_notes(
+        db, select_note_cards().filter(Note.user_id == user_id), limit, cursor
+    )
+
+
 async def update_note(db: AsyncSession, note_id: int, user_id: int, note_update: NoteUpdate) -> Optional[Note]:
     """Обновить заметку"""
     # Сначала проверяем, что заметка принадлежит пользователю
@@ -72,6 +117,9 @@ async def update_note(db: AsyncSession, note_id: int, user_id: int, note_update:
         )
         await db.commit()
         await db.refresh(db_note)
+        await notes_changed(user_id)
+        if "content" in update_data:
+            schedule_note_indexing(note_id, user_id)
     
     return db_note
 
@@ -92,53 +140,95 @@ async def delete_note(db: AsyncSession, note_id: int, user_id: int) -> bool:
     # Удаляем заметку
     await db.delete(db_note)
     await db.commit()
+    await notes_changed(user_id)
     return True
 
 
-async def search_notes(db: AsyncSession, user_id: int, search_term: str, skip: int = 0, limit: int = 100) -> List[Note]:
-    """Поиск заметок по содержимому"""
+async def search_notes(
+    db: AsyncSession,
+    user_id: int,
+    search_term: str,
+    skip: int = 0,
+    limit: int = 100,
+    cards: bool = False
+) -> List[Note]:
+    """
+    Полнотекстовый поиск заметок по заголовку и содержимому, по убыванию релевантности.
+    С cards=True возвращает карточки (превью вместо полного текста).
+    """
+    tsquery = build_tsquery(search_term)
+    if tsquery is None:
+        return []
+
     result = await db.execute(
-        select(Note)
+        (select_note_cards() if cards else select(Note))
         .filter(
             Note.user_id == user_id,
-            Note.content.ilike(f"%{search_term}%")
+            Note.search_vector.op("@@")(tsquery)
         )
+        .order_by(func.ts_rank_cd(Note.search_vector, tsquery).desc(), Note.id.desc())
         .offset(skip)
         .limit(limit)
-        .order_by(Note.created_at.desc())
     )
-    return result.scalars().all()
+    return result.all() if cards else result.scalars().all()
 
 
 # CRUD операции для NoteConnection
-async def create_connection(db: AsyncSession, note_a_id: int, connection: NoteConnectionCreate, user_id: int) -> Optional[NoteConnection]:
-    """Создать связь между заметками"""
-    # Проверяем, что обе заметки принадлежат пользователю
-    note_a = await get_note(db, note_a_id, user_id)
-    note_b = await get_note(db, connection.note_b_id, user_id)
-    
-    if not note_a or not note_b:
-        return None
-    
-    # Проверяем, что связь не существует
-    existing_connection = await db.execute(
-        select(NoteConnection).filter(
-            NoteConnection.note_a_id == note_a_id,
-            NoteConnection.note_b_id == connection.note_b_id
+async def create_connections(
+    db: AsyncSession,
+    note_a_id: int,
+    connections: Sequence[NoteConnectionCreate],
+    user_id: int
+) -> List[NoteConnection]:
+    """
+    Создать связи заметки note_a_id одним запросом INSERT ... SELECT ... ON CONFLICT
+    DO NOTHING RETURNING. Владелец обеих заметок проверяется в том же запросе,
+    существующие связи (в любом направлении) пропускаются по индексу
+    uq_note_connections_edge. Возвращает только созданные связи.
+    """
+    rows = {}
+    for connection in connections:
+        if connection.note_b_id != note_a_id:
+            rows.setdefault((connection.note_b_id, connection.relation), None)
+    if not rows:
+        return []
+
+    new_connections = (
+        values(
+            column("note_b_id", Integer),
+            column("relation", String),
+            name="new_connections"
         )
+        .data(list(rows))
     )
-    if existing_connection.scalar_one_or_none():
-        return None
-    
-    db_connection = NoteConnection(
-        note_a_id=note_a_id,
-        note_b_id=connection.note_b_id,
-        relation=connection.relation
+    note_a = aliased(Note)
+    note_b = aliased(Note)
+    source = (
+        select(note_a.id, new_connections.c.note_b_id, new_connections.c.relation)
+        .select_from(new_connections)
+        .join(note_a, and_(note_a.id == note_a_id, note_a.user_id == user_id))
+        .join(note_b, and_(note_b.id == new_connections.c.note_b_id, note_b.user_id == user_id))
+    )
+    stmt = (
+        pg_insert(NoteConnection)
+        .from_select(["note_a_id", "note_b_id", "relation"], source)
+        .on_conflict_do_nothing(index_elements=[
+            func.least(NoteConnection.note_a_id, NoteConnection.note_b_id),
+            func.greatest(NoteConnection.note_a_id, NoteConnection.note_b_id),
+            NoteConnection.relation,
+        ])
+        .returning(NoteConnection)
     )
-    db.add(db_connection)
+    result = await db.scalars(stmt)
+    created = list(result.all())
     await db.commit()
-    await db.refresh(db_connection)
-    return db_connection
+    return created
+
+
+async def create_connection(db: AsyncSession, note_a_id: int, connection: NoteConnectionCreate, user_id: int) -> Optional[NoteConnection]:
+    """Создать связь между заметками (None, если заметки не найдены или связь уже есть)"""
+    created = await create_connections(db, note_a_id, [connection], user_id)
+    return created[0] if created else None
 
 
 async def get_note_connections(db: AsyncSession, note_id: int, user_id: int) -> List[NoteConnection]:
@@ -175,35 +265,17 @@ async def delete_connection(db: AsyncSession, connection_id: int, user_id: int)
 
 
 async def get_connected_notes(db: AsyncSession, note_id: int, user_id: int) -> List[Note]:
-    """Получить все связанные заметки"""
-    # Проверяем, что заметка принадлежит пользователю
-    note = await get_note(db, note_id, user_id)
-    if not note:
-        return []
-    
-    # Получаем ID связанных заметок
-    connections_result = await db.execute(
-        select(NoteConnection).filter(
-            (NoteConnection.note_a_id == note_id) | (NoteConnection.note_b_id == note_id)
-        )
+    """Получить все связанные заметки (один запрос, владелец проверяется в нем же)"""
+    owned = select(Note.id).filter(Note.id == note_id, Note.user_id == user_id).scalar_subquery()
+    neighbour_ids = select(
+        case((NoteConnection.note_a_id == note_id, NoteConnection.note_b_id), else_=NoteConnection.note_a_id)
+    ).filter(
+        or_(NoteConnection.note_a_id == owned, NoteConnection.note_b_id == owned)
     )
-    connections = connections_result.scalars().all()
-    
-    # Собираем ID связанных заметок
-    connected_note_ids = []
-    for conn in connections:
-        if conn.note_a_id == note_id:
-            connected_note_ids.append(conn.note_b_id)
-        else:
-            connected_note_ids.append(conn.note_a_id)
     
-    if not connected_note_ids:
-        return []
-    
-    # Получаем связанные заметки
     result = await db.execute(
         select(Note).filter(
-            Note.id.in_(connected_note_ids),
+            Note.id.in_(neighbour_ids),
             Note.user_id == user_id
         )
     )
@@ -213,19 +285,18 @@ async def get_connected_notes(db: AsyncSession, note_id: int, user_id: int) -> L
 # Дополнительные операции
 async def get_notes_count(db: AsyncSession, user_id: int) -> int:
     """Получить количество заметок пользователя"""
-    result = await db.execute(
-        select(Note).filter(Note.user_id == user_id)
+    return await db.scalar(
+        select(func.count()).select_from(Note).filter(Note.user_id == user_id)
     )
-    return len(result.scalars().all())
 
 
-async def get_recent_notes(db: AsyncSession, user_id: int, limit: int = 10) -> List[Note]:
-    """Получить последние заметки пользователя"""
+async def get_recent_notes(db: AsyncSession, user_id: int, limit: int = 10) -> List[Row]:
+    """Получить карточки последних заметок пользователя"""
     result = await db.execute(
-        select(Note)
+        select_note_cards()
         .filter(Note.user_id == user_id)
         .order_by(Note.created_at.desc())
         .limit(limit)
     )
-    return result.scalars().all()
+    return result.all()
     
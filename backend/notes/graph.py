@@ -0,0 +1,284 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import JSON, and_, case, func, literal, literal_column, or_, select, true
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from models import GraphChange, GraphVersion, Note, NoteConnection
+
+# Максимальная глубина обхода графа от заметки
+MAX_GRAPH_DEPTH = 5
+
+
+def _neighbour(connection_a, connection_b, note_id):
+    """Соседняя вершина ребра (связи неориентированные)"""
+    return case((connection_a == note_id, connection_b), else_=connection_a)
+
+
+def _relation_filter(relations: Optional[Sequence[str]]):
+    return NoteConnection.relation.in_(relations) if relations else true()
+
+
+def neighbourhood_cte(
+    user_id: int,
+    note_id: int,
+    depth: int,
+    relations: Optional[Sequence[str]] = None
+):
+    """
+    Рекурсивный CTE вершин в пределах depth связей от заметки: (note_id, depth).
+    Стартовая строка проверяет владельца заметки, шаг использует индексы
+    note_connections по note_a_id и note_b_id (BitmapOr).
+    """
+    walk = (
+        select(Note.id.label("note_id"), literal(0).label("depth"))
+        .where(Note.id == note_id, Note.user_id == user_id)
+        .cte("graph_walk", recursive=True)
+    )
+    step = (
+        select(
+            _neighbour(NoteConnection.note_a_id, NoteConnection.note_b_id, walk.c.note_id),
+            walk.c.depth + 1
+        )
+        .join(
+            NoteConnection,
+            or_(NoteConnection.note_a_id == walk.c.note_id, NoteConnection.note_b_id == walk.c.note_id)
+        )
+        .where(walk.c.depth < depth, _relation_filter(relations))
+    )
+    # UNION (а не UNION ALL) отбрасывает повторы (вершина, глубина): не больше одной строки
+    # на вершину на каждом уровне, циклы не разрастаются
+    walk = walk.union(step)
+    return (
+        select(walk.c.note_id, func.min(walk.c.depth).label("depth"))
+        .group_by(walk.c.note_id)
+        .cte("graph_nodes")
+    )
+
+
+async def fetch_graph(
+    db: AsyncSession,
+    user_id: int,
+    nodes,
+    relations: Optional[Sequence[str]] = None
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Вершины из CTE nodes и ребра между ними одним запросом:
+    обе части собираются в JSON на стороне БД
+    """
+    node_json = func.json_build_object(
+        "id", Note.id,
+        "title", Note.title,
+        "category", Note.category,
+        "importance", Note.importance,
+        "depth", nodes.c.depth,
+    )
+    node_rows = (
+        select(func.coalesce(
+            func.json_agg(aggregate_order_by(node_json, nodes.c.depth.asc().nulls_first(), Note.id)),
+            literal_column("'[]'::json"),
+            type_=JSON
+        ))
+        .select_from(nodes.join(Note, and_(Note.id == nodes.c.note_id, Note.user_id == user_id)))
+        .scalar_subquery()
+    )
+
+    source = nodes.alias("graph_source")
+    target = nodes.alias("graph_target")
+    edge_json = func.json_build_object(
+        "id", NoteConnection.id,
+        "source", NoteConnection.note_a_id,
+        "target", NoteConnection.note_b_id,
+        "relation", NoteConnection.relation,
+    )
+    edge_rows = (
+        select(func.coalesce(
+            func.json_agg(aggregate_order_by(edge_json, NoteConnection.id)),
+            literal_column("'[]'::json"),
+            type_=JSON
+        ))
+        .select_from(
+            NoteConnection.__table__
+            .join(source, source.c.note_id == NoteConnection.note_a_id)
+            .join(target, target.c.note_id == NoteConnection.note_b_id)
+        )
+        .where(_relation_filter(relations))
+        .scalar_subquery()
+    )
+
+    result = await db.execute(select(node_rows.label("nodes"), edge_rows.label("edges")))
+    node_list, edge_list = result.one()
+    # Ребра с концом в чужой заметке не возвращаются
+    node_ids = {node["id"] for node in node_list}
+    return {
+        "nodes": node_list,
+        "edges": [edge for edge in edge_list if edge["source"] in node_ids and edge["target"] in node_ids],
+    }
+
+
+async def get_note_neighbourhood(
+    db: AsyncSession,
+    user_id: int,
+    note_id: int,
+    depth: int = 1,
+    relations: Optional[Sequence[str]] = None
+) -> Optional[Dict[str, Any]]:
+    """Окрестность заметки радиуса depth (None, если заметка не найдена)"""
+    graph = await fetch_graph(db, user_id, neighbourhood_cte(user_id, note_id, depth, relations), relations)
+    if not graph["nodes"]:
+        return None
+    return {"root_id": note_id, "depth": depth, **graph}
+
+
+# ---------- Снимок графа и изменения по журналу ----------
+
+NODE_COLUMNS = ("id", "title", "category", "importance")
+EDGE_COLUMNS = ("id", "source", "target", "relation")
+
+
+def _graph_payload(version: int, full: bool) -> Dict[str, Any]:
+    """Пустой ответ /notes/graph в колоночном формате"""
+    return {
+        "version": version,
+        "full": full,
+        "nodes": {column: [] for column in NODE_COLUMNS},
+        "edges": {column: [] for column in EDGE_COLUMNS},
+        "deleted": {"nodes": [], "edges": []},
+    }
+
+
+def _array_columns(columns, order_by):
+    return [
+        func.array_agg(aggregate_order_by(column, order_by)).label(name)
+        for name, column in columns
+    ]
+
+
+async def get_graph_snapshot(db: AsyncSession, user_id: int) -> Dict[str, Any]:
+    """
+    Весь граф пользователя одним запросом: вершины (без текста заметок) и ребра
+    колонками (массивы array_agg) и версия журнала из того же снимка БД
+    """
+    version = (
+        select(GraphVersion.version)
+        .where(GraphVersion.user_id == user_id)
+        .scalar_subquery()
+    )
+    nodes = (
+        select(*_array_columns(
+            zip(NODE_COLUMNS, (Note.id, Note.title, Note.category, Note.importance)),
+            Note.id
+        ))
+        .where(Note.user_id == user_id)
+        .subquery("graph_nodes")
+    )
+    source = aliased(Note)
+    target = aliased(Note)
+    edges = (
+        select(*_array_columns(
+            zip(
+                [f"edge_{column}" for column in EDGE_COLUMNS],
+                (NoteConnection.id, NoteConnection.note_a_id, NoteConnection.note_b_id, NoteConnection.relation)
+            ),
+            NoteConnection.id
+        ))
+        .join(source, and_(source.id == NoteConnection.note_a_id, source.user_id == user_id))
+        .join(target, and_(target.id == NoteConnection.note_b_id, target.user_id == user_id))
+        .subquery("graph_edges")
+    )
+
+    result = await db.execute(select(version.label("version"), nodes, edges))
+    row = result.one()._mapping
+    payload = _graph_payload(row["version"] or 0, full=True)
+    for column in NODE_COLUMNS:
+        payload["nodes"][column] = row[column] or []
+    for column in EDGE_COLUMNS:
+        payload["edges"][column] = row[f"edge_{column}"] or []
+    return payload
+
+
+async def get_graph_delta(db: AsyncSession, user_id: int, since: int) -> Optional[Dict[str, Any]]:
+    """
+    Изменения графа после версии since по журналу graph_changes: текущее состояние
+    измененных вершин и ребер и ID удаленных. None, если журнал уже не покрывает
+    since (очищен или версия неизвестна) - тогда нужен полный снимок.
+    """
+    result = await db.execute(
+        select(GraphVersion.version, GraphVersion.pruned_version)
+        .where(GraphVersion.user_id == user_id)
+    )
+    version, pruned_version = result.first() or (0, 0)
+    if since < pruned_version or since > version:
+        return None
+
+    payload = _graph_payload(version, full=False)
+    if since == version:
+        return payload
+
+    # Последняя операция по каждой вершине/ребру в (since, version]; изменения,
+    # закоммиченные после чтения версии, попадут в следующий запрос
+    latest = (
+        select(GraphChange.entity, GraphChange.entity_id, GraphChange.op)
+        .where(
+            GraphChange.user_id == user_id,
+            GraphChange.version > since,
+            GraphChange.version <= version
+        )
+        .distinct(GraphChange.entity, GraphChange.entity_id)
+        .order_by(GraphChange.entity, GraphChange.entity_id, GraphChange.version.desc())
+        .subquery("latest_changes")
+    )
+    result = await db.execute(
+        select(
+            latest.c.entity,
+            latest.c.entity_id,
+            Note.id.label("note_id"),
+            Note.title,
+            Note.category,
+            Note.importance,
+            NoteConnection.id.label("edge_id"),
+            NoteConnection.note_a_id,
+            NoteConnection.note_b_id,
+            NoteConnection.relation,
+        )
+        .select_from(latest)
+        .outerjoin(Note, and_(
+            latest.c.entity == "node",
+            latest.c.op == "upsert",
+            Note.id == latest.c.entity_id,
+            Note.user_id == user_id
+        ))
+        .outerjoin(NoteConnection, and_(
+            latest.c.entity == "edge",
+            latest.c.op == "upsert",
+            NoteConnection.id == latest.c.entity_id
+        ))
+        .order_by(latest.c.entity, latest.c.entity_id)
+    )
+
+    nodes, edges, deleted = payload["nodes"], payload["edges"], payload["deleted"]
+    for row in result.all():
+        if row.entity == "node":
+            if row.note_id is None:
+                # Удалена (в том числе после upsert в этом же интервале)
+                deleted["nodes"].append(row.entity_id)
+                continue
+            for column, value in zip(NODE_COLUMNS, (row.note_id, row.title, row.category, row.importance)):
+                nodes[column].append(value)
+        else:
+            if row.edge_id is None:
+                deleted["edges"].append(row.entity_id)
+                continue
+            for column, value in zip(EDGE_COLUMNS, (row.edge_id, row.note_a_id, row.note_b_id, row.relation)):
+                edges[column].append(value)
+    return payload
+
+
+async def get_graph_changes(db: AsyncSession, user_id: int, since: Optional[int] = None) -> Dict[str, Any]:
+    """Снимок графа (since не передан или журнал его не покрывает) или изменения после since"""
+    if since is not None:
+        delta = await get_graph_delta(db, user_id, since)
+        if delta is not None:
+            return delta
+    return await get_graph_snapshot(db, user_id)
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import time
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from config import settings
+from jwt_auth.auth import get_current_active_user
+from models import User
+from redis_config import async_cache, redis_cache_async
+from .stats import invalidate_category_stats
+
+# Версия заметок пользователя: увеличивается при любой записи заметок
+# (создание, изменение, удаление, AI анализ) и определяет ETag ответов чтения
+NOTES_VERSION_TTL = timedelta(days=30)
+
+
+def get_notes_version_key(user_id: int) -> str:
+    """Ключ счетчика версии заметок пользователя"""
+    return f"notes:version:{user_id}"
+
+
+def _initial_version() -> int:
+    # Начальное значение - время в мс: если счетчик пропал из Redis,
+    # новая версия больше всех выданных ранее и старые ETag не совпадут
+    return int(time.time() * 1000)
+
+
+async def get_notes_version(user_id: int) -> Optional[int]:
+    """Текущая версия заметок пользователя (None, если Redis недоступен)"""
+    key = get_notes_version_key(user_id)
+    try:
+        async with redis_cache_async.pipeline(transaction=False) as pipe:
+            pipe.set(key, _initial_version(), nx=True, ex=NOTES_VERSION_TTL)
+            pipe.get(key)
+            _, value = await pipe.execute()
+        return int(value)
+    except Exception as e:
+        print(f"Ошибка чтения версии заметок: {e}")
+        return None
+
+
+async def bump_notes_version(user_id: int) -> None:
+    """Увеличить версию заметок пользователя"""
+    key = get_notes_version_key(user_id)
+    try:
+        async with redis_cache_async.pipeline(transaction=False) as pipe:
+            pipe.set(key, _initial_version(), nx=True, ex=NOTES_VERSION_TTL)
+            pipe.incr(key)
+            pipe.expire(key, NOTES_VERSION_TTL)
+            await pipe.execute()
+    except Exception as e:
+        print(f"Ошибка обновления версии заметок: {e}")
+
+
+async def notes_changed(user_id: int) -> None:
+    """Сбросить кешированные представления заметок пользователя после записи"""
+    await bump_notes_version(user_id)
+    await invalidate_category_stats(user_id)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Слабое сравнение If-None-Match с ETag (RFC 9110)"""
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+class NotesResponseCache:
+    """
+    Условный ответ эндпоинта чтения заметок: слабый ETag из версии заметок
+    пользователя и параметров запроса, тело ответа кешируется в Redis
+    по (пользователь, эндпоинт, параметры, версия).
+    """
+
+    def __init__(self, request: Request, user_id: int, version: Optional[int]):
+        self.user_id = user_id
+        self.version = version
+        params = sorted(request.query_params.multi_items())
+        self.resource = hashlib.md5(
+            json.dumps([request.url.path, params]).encode()
+        ).hexdigest()[:16]
+
+    @property
+    def etag(self) -> Optional[str]:
+        if self.version is None:
+            return None
+        return f'W/"{self.version}-{self.resource}"'
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        if self.etag is None:
+            return {}
+        # Клиент может хранить ответ, но обязан перепроверять его по ETag
+        return {"ETag": self.etag, "Cache-Control": "private, no-cache"}
+
+    @property
+    def body_key(self) -> str:
+        return f"notes:response:{self.user_id}:{self.resource}:{self.version}"
+
+    async def respond(
+        self,
+        compute: Callable[[], Awaitable[Any]],
+        response_model: Any = None
+    ) -> Response:
+        """Вернуть тело из кеша или вычислить, сериализовать и сохранить"""
+        if self.version is None:
+            body = self._serialize(await compute(), response_model)
+            return Response(content=body, media_type="application/json")
+
+        body = await async_cache.get(self.body_key)
+        if body is None:
+            body = self._serialize(await compute(), response_model)
+            await async_cache.set(
+                self.body_key,
+                body,
+                ttl=timedelta(seconds=settings.NOTES_RESPONSE_CACHE_TTL),
+                user_id=self.user_id
+            )
+        return Response(content=body, media_type="application/json", headers=self.headers)
+
+    @staticmethod
+    def _serialize(value: Any, response_model: Any) -> str:
+        if response_model is not None:
+            adapter = TypeAdapter(response_model)
+            return adapter.dump_json(adapter.validate_python(value, from_attributes=True)).decode()
+        return json.dumps(jsonable_encoder(value), ensure_ascii=False)
+
+
+async def notes_response_cache(
+    request: Request,
+    current_user: User = Depends(get_current_active_user)
+) -> NotesResponseCache:
+    """
+    Зависимость эндпоинтов чтения заметок: при совпадении If-None-Match
+    отвечает 304 до любых запросов к БД за заметками
+    """
+    version = await get_notes_version(current_user.id)
+    cache = NotesResponseCache(request, current_user.id, version)
+    if cache.etag and _etag_matches(request.headers.get("if-none-match"), cache.etag):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache.headers)
+    return cache
@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Row, Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Note
+
+
+class InvalidCursorError(ValueError):
+    """Курсор пагинации поврежден или не относится к этому запросу"""
+
+
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    """Упаковать позицию в непрозрачный курсор (base64 от JSON)"""
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Распаковать курсор; None для пустого курсора"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f"Некорректный курсор: {e}")
+    if not isinstance(payload, dict):
+        raise InvalidCursorError("Некорректный курсор")
+    return payload
+
+
+def encode_note_cursor(note) -> str:
+    """Курсор после заметки для сортировки (created_at DESC, id DESC)"""
+    return encode_cursor({"c": note.created_at.isoformat(), "id": note.id})
+
+
+def decode_note_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """Позиция (created_at, id) из курсора списка заметок"""
+    payload = decode_cursor(cursor)
+    if payload is None:
+        return None
+    try:
+        return datetime.fromisoformat(payload["c"]), int(payload["id"])
+    except (KeyError, TypeError, ValueError):
+        raise InvalidCursorError("Некорректный курсор списка заметок")
+
+
+async def paginate_notes(
+    db: AsyncSession,
+    stmt: Select,
+    limit: Optional[int],
+    cursor: Optional[str] = None
+) -> Tuple[List[Row], Optional[str]]:
+    """
+    Keyset-пагинация запроса карточек заметок (select_note_cards) по (created_at, id),
+    от новых к старым.
+    Следующая страница начинается строго после последней заметки текущей,
+    поэтому глубина страницы не влияет на стоимость запроса.
+    limit=None - все заметки после курсора одной страницей (next_cursor = None).
+    """
+    position = decode_note_cursor(cursor)
+    if position is not None:
+        stmt = stmt.filter(tuple_(Note.created_at, Note.id) < tuple_(*position))
+
+    stmt = stmt.order_by(Note.created_at.desc(), Note.id.desc())
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    result = await db.execute(stmt)
+    notes = list(result.all())
+
+    next_cursor = None
+    if limit is not None and len(notes) > limit:
+        notes = notes[:limit]
+        next_cursor = encode_note_cursor(notes[-1])
+    return notes, next_cursor
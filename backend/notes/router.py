@@ -1,30 +1,47 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Security
+from fastapi import APIRouter, Body, Depends, HTTPException, Request, status, Query, Security
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import Session
 from sqlalchemy import select, func
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing import List, Optional, Dict, Any, Union
+from datetime import datetime, timedelta
+import asyncio
 import json
 import openai
-from database import get_async_db, get_db
+from database import get_async_db
 from jwt_auth.auth import get_current_active_user, oauth2_scheme
-from models import User, NoteCalendarEvent, Note
+from models import User, NoteCalendarEvent, Note, GoogleToken
 from config import settings
+from redis_config import redis_cache_async
 
 from . import crud
+from . import search as notes_search
+from . import graph as notes_graph
+from . import analytics as notes_analytics
+from . import bulk_import
+from .pagination import InvalidCursorError, paginate_notes
+from .cards import select_note_cards, card_preview
+from .stats import get_category_stats
+from .http_cache import NotesResponseCache, notes_response_cache, notes_changed
 from .schemas import (
     NoteCreate, 
     NoteUpdate, 
     NoteResponse, 
+    NoteCardResponse,
+    NotePage,
     NoteWithConnections,
     NoteConnectionCreate,
     NoteConnectionResponse,
+    NoteGraph,
+    GraphSnapshot,
+    GraphCommunities,
+    NoteImportResult,
 )
 
 # Импорты для календаря
 from ai_agent.calendar_agent import calendar_agent
 from ai_agent.note_analyzer import NoteAnalyzer
 from auth.google_oauth import google_oauth_service
+from google_calendar.client import calendar_client
 from google_calendar.schemas import (
     CreateEventRequest,
     CalendarListResponse,
@@ -34,7 +51,7 @@ from google_calendar.schemas import (
 
 # Импорт Celery задач
 from tasks.note_tasks import create_note_async, update_note_async
-from tasks.ai_tasks import analyze_note_async
+from tasks.ai_tasks import analyze_note_async, analyze_all_notes_job
 
 # Инициализация AI анализатора
 openai_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
@@ -48,7 +65,6 @@ router = APIRouter()
 async def create_note(
     note: NoteCreate,
     db: AsyncSession = Depends(get_async_db),
-    sync_db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
     background: bool = Query(True, description="Создать заметку в фоне")
 ):
@@ -60,6 +76,7 @@ async def create_note(
             note_data=note.dict(),
             user_id=current_user.id
         )
+        await remember_task_owner(task.id, current_user.id)
         
         # Возвращаем временный ответ с task_id
         return NoteResponse(
@@ -84,38 +101,104 @@ async def create_note(
     
     # Анализ календаря в фоне
     try:
-        calendar_agent.analyze_note_for_events(sync_db, db_note, current_user.id)
+        await calendar_agent.analyze_note_for_events(db, db_note, current_user.id)
     except Exception as e:
         print(f"Ошибка анализа календаря: {e}")
     
     return db_note
 
 
-@router.get("/", response_model=List[NoteResponse])
+@router.post("/import", response_model=NoteImportResult, status_code=status.HTTP_201_CREATED)
+async def import_notes(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Массовый импорт заметок: тело - NDJSON (объект на строку) или JSON массив
+    объектов {"title", "content", "created_at"}. Тело читается потоком, записи
+    проверяются и вставляются пачками многострочным INSERT. Анализ и индексация
+    импортированных заметок ставятся одной задачей (task_id).
+    """
+    summary = await bulk_import.import_notes(
+        db,
+        bulk_import.iter_json_records(request.stream()),
+        current_user.id,
+        max_notes=settings.NOTES_IMPORT_MAX_NOTES
+    )
+    if summary["imported"]:
+        summary["task_id"] = bulk_import.schedule_imported_notes(
+            current_user.id, summary["first_note_id"], summary["last_note_id"]
+        )
+        await remember_task_owner(summary["task_id"], current_user.id)
+    return summary
+
+
+@router.get("/", response_model=Union[List[NoteResponse], List[NoteCardResponse], NotePage])
 async def get_notes(
     skip: int = Query(0, ge=0, description="Количество записей для пропуска"),
     limit: int = Query(100, ge=1, le=1000, description="Максимальное количество записей"),
     search: Optional[str] = Query(None, description="Поиск по содержимому"),
+    cursor: Optional[str] = Query(
+        None,
+        description="Курсор страницы (пустая строка - первая страница). "
+                    "Если передан, ответ возвращается в виде {items, next_cursor} с карточками заметок"
+    ),
+    view: str = Query(
+        "full",
+        pattern="^(full|card)$",
+        description="Формат списка без cursor: full - полный текст заметок, "
+                    "card - карточки с превью текста (content_truncated)"
+    ),
     db: AsyncSession = Depends(get_async_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    response_cache: NotesResponseCache = Depends(notes_response_cache)
 ):
-    """Получить все заметки пользователя"""
+    """Получить все заметки пользователя (ETag по версии заметок, 304 при совпадении)"""
+    cards = view == "card"
     if search:
-        notes = await crud.search_notes(db, current_user.id, search, skip, limit)
-    else:
-        notes = await crud.get_user_notes(db, current_user.id, skip, limit)
-    return notes
+        return await response_cache.respond(
+            lambda: crud.search_notes(db, current_user.id, search, skip, limit, cards=cards),
+            List[NoteCardResponse] if cards else List[NoteResponse]
+        )
 
+    if cursor is None:
+        # Старый формат ответа (список с OFFSET-пагинацией), карточки - только по view=card
+        if cards:
+            return await response_cache.respond(
+                lambda: crud.get_user_note_cards(db, current_user.id, skip, limit),
+                List[NoteCardResponse]
+            )
+        return await response_cache.respond(
+            lambda: crud.get_user_notes(db, current_user.id, skip, limit),
+            List[NoteResponse]
+        )
 
-@router.get("/recent", response_model=List[NoteResponse])
+    async def _page():
+        try:
+            notes, next_cursor = await crud.get_user_notes_page(db, current_user.id, limit, cursor)
+        except InvalidCursorError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        return {"items": notes, "next_cursor": next_cursor}
+
+    return await response_cache.respond(_page, NotePage)
+
+
+@router.get("/recent", response_model=List[NoteCardResponse])
 async def get_recent_notes(
     limit: int = Query(10, ge=1, le=50, description="Количество последних заметок"),
     db: AsyncSession = Depends(get_async_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    response_cache: NotesResponseCache = Depends(notes_response_cache)
 ):
     """Получить последние заметки пользователя"""
-    notes = await crud.get_recent_notes(db, current_user.id, limit)
-    return notes
+    return await response_cache.respond(
+        lambda: crud.get_recent_notes(db, current_user.id, limit),
+        List[NoteCardResponse]
+    )
 
 
 @router.get("/count")
@@ -124,11 +207,30 @@ async def get_notes_count(
     current_user: User = Depends(get_current_active_user)
 ):
     """Получить количество заметок пользователя"""
-    count = await crud.get_notes_count(db, current_user.id)
-    return {"count": count}
+    stats = await get_category_stats(db, current_user.id)
+    return {"count": stats["total"]}
+
+
+@router.get("/search", response_model=NotePage)
+async def search_notes(
+    q: str = Query(..., min_length=1, max_length=500, description="Поисковый запрос"),
+    limit: int = Query(20, ge=1, le=100, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Полнотекстовый поиск по заголовкам и содержимому заметок (русский и английский, поиск по префиксу)"""
+    try:
+        notes, next_cursor = await notes_search.search_notes(db, current_user.id, q, limit, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return {"items": notes, "next_cursor": next_cursor}
 
 
-@router.get("/{note_id}", response_model=NoteResponse)
+@router.get("/{note_id:int}", response_model=NoteResponse)
 async def get_note(
     note_id: int,
     db: AsyncSession = Depends(get_async_db),
@@ -160,30 +262,77 @@ async def get_note_with_connections(
     return note
 
 
-@router.get("/task/{task_id}/status")
-async def get_task_status(
-    task_id: str,
-    current_user: User = Depends(get_current_active_user)
-):
-    """Получить статус задачи Celery"""
+# Владелец задачи Celery хранится дольше результата (result_expires),
+# чтобы статус задачи, ждущей в очереди, оставался доступен
+TASK_OWNER_TTL = timedelta(days=1)
+
+# Состояния, после которых статус задачи больше не меняется
+TERMINAL_TASK_STATES = ("SUCCESS", "FAILURE", "REVOKED")
+
+
+def _task_owner_key(task_id: str) -> str:
+    """Ключ владельца задачи Celery"""
+    return f"task_owner:{task_id}"
+
+
+async def remember_task_owner(task_id: Optional[str], user_id: int) -> None:
+    """Запомнить пользователя, поставившего задачу (для /task/{id}/status и /stream)"""
+    if not task_id:
+        return
+    try:
+        await redis_cache_async.set(_task_owner_key(task_id), user_id, ex=TASK_OWNER_TTL)
+    except Exception as e:
+        print(f"Ошибка сохранения владельца задачи: {e}")
+
+
+async def _check_task_owner(task_id: str, user_id: int) -> None:
+    """404, если задачу ставил другой пользователь (или задача неизвестна)"""
+    try:
+        owner = await redis_cache_async.get(_task_owner_key(task_id))
+    except Exception as e:
+        print(f"Ошибка чтения владельца задачи: {e}")
+        owner = None
+    if owner is None or str(owner) != str(user_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Задача не найдена"
+        )
+
+
+def _task_status_payload(task_id: str) -> Dict[str, Any]:
+    """
+    Текущее состояние задачи Celery в формате ответа API.
+    Обращается к result backend синхронно - вызывать через asyncio.to_thread.
+    """
     from celery.result import AsyncResult
     from celery_app import celery_app
     
     result = AsyncResult(task_id, app=celery_app)
+    state = result.state
     
-    if result.ready():
-        if result.successful():
-            return {
-                "status": "SUCCESS",
-                "result": result.result,
-                "task_id": task_id
-            }
-        else:
-            return {
-                "status": "FAILURE",
-                "error": str(result.info),
-                "task_id": task_id
-            }
+    if state == "SUCCESS":
+        return {
+            "status": "SUCCESS",
+            "result": result.result,
+            "task_id": task_id
+        }
+    elif state == "FAILURE":
+        return {
+            "status": "FAILURE",
+            "error": str(result.info),
+            "task_id": task_id
+        }
+    elif state == "REVOKED":
+        return {
+            "status": "REVOKED",
+            "task_id": task_id
+        }
+    elif state == "PROGRESS":
+        return {
+            "status": "PROGRESS",
+            "progress": result.info,
+            "task_id": task_id
+        }
     else:
         return {
             "status": "PENDING",
@@ -191,12 +340,57 @@ async def get_task_status(
         }
 
 
+@router.get("/task/{task_id}/status")
+async def get_task_status(
+    task_id: str,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Получить статус задачи Celery"""
+    await _check_task_owner(task_id, current_user.id)
+    return await asyncio.to_thread(_task_status_payload, task_id)
+
+
+@router.get("/task/{task_id}/stream")
+async def stream_task_status(
+    task_id: str,
+    interval: float = Query(1.0, ge=0.2, le=10, description="Интервал опроса в секундах"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Поток статуса задачи Celery (Server-Sent Events) до её завершения.
+    Поток закрывается событием timeout через TASK_STREAM_MAX_DURATION секунд -
+    клиент может переподключиться или опросить /status.
+    """
+    await _check_task_owner(task_id, current_user.id)
+    
+    async def event_stream():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.TASK_STREAM_MAX_DURATION
+        last_payload = None
+        while True:
+            payload = await asyncio.to_thread(_task_status_payload, task_id)
+            if payload != last_payload:
+                yield f"data: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+                last_payload = payload
+            if payload["status"] in TERMINAL_TASK_STATES:
+                break
+            if loop.time() + interval > deadline:
+                yield f"event: timeout\ndata: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+                break
+            await asyncio.sleep(interval)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.put("/{note_id}", response_model=NoteResponse)
 async def update_note(
     note_id: int,
     note_update: NoteUpdate,
     db: AsyncSession = Depends(get_async_db),
-    sync_db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
     background: bool = Query(True, description="Обновить заметку в фоне")
 ):
@@ -209,6 +403,7 @@ async def update_note(
             note_data=note_update.dict(exclude_unset=True),
             user_id=current_user.id
         )
+        await remember_task_owner(task.id, current_user.id)
         
         # Возвращаем текущую заметку с информацией о задаче
         current_note = await crud.get_note(db, note_id, current_user.id)
@@ -241,8 +436,8 @@ async def update_note(
     
     # Удалить старые события календаря и создать новые в фоне
     try:
-        calendar_agent.delete_note_events(sync_db, note_id, current_user.id)
-        calendar_agent.analyze_note_for_events(sync_db, updated_note, current_user.id)
+        await calendar_agent.delete_note_events(db, note_id, current_user.id)
+        await calendar_agent.analyze_note_for_events(db, updated_note, current_user.id)
     except Exception as e:
         print(f"Ошибка обновления календаря: {e}")
     
@@ -253,14 +448,13 @@ async def update_note(
 async def delete_note(
     note_id: int,
     db: AsyncSession = Depends(get_async_db),
-    sync_db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Удалить заметку принудительно, игнорируя связи и события календаря"""
     try:
         # Удалить события календаря
         try:
-            calendar_agent.delete_note_events(sync_db, note_id, current_user.id)
+            await calendar_agent.delete_note_events(db, note_id, current_user.id)
             print(f"Удалены события календаря для заметки {note_id}")
         except Exception as e:
             print(f"Ошибка удаления событий календаря: {e}")
@@ -303,6 +497,20 @@ async def create_connection(
     return db_connection
 
 
+@router.post("/{note_id}/connections/bulk", response_model=List[NoteConnectionResponse], status_code=status.HTTP_201_CREATED)
+async def create_connections(
+    note_id: int,
+    connections: List[NoteConnectionCreate] = Body(..., max_length=500),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Создать несколько связей заметки одним запросом к БД. Возвращает только
+    созданные связи: уже существующие и связи с чужими заметками пропускаются.
+    """
+    return await crud.create_connections(db, note_id, connections, current_user.id)
+
+
 @router.get("/{note_id}/connections", response_model=List[NoteConnectionResponse])
 async def get_note_connections(
     note_id: int,
@@ -325,6 +533,65 @@ async def get_connected_notes(
     return notes
 
 
+@router.get("/graph", response_model=GraphSnapshot)
+async def get_notes_graph(
+    since: Optional[int] = Query(
+        None, ge=0,
+        description="Версия из предыдущего ответа: вернуть только изменения после нее"
+    ),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Граф заметок пользователя в колоночном формате: все вершины (без текста)
+    и связи одним запросом. С since - только измененные и удаленные вершины
+    и связи по журналу изменений; если журнал since уже не покрывает,
+    возвращается полный снимок (full=true).
+    """
+    return await notes_graph.get_graph_changes(db, current_user.id, since)
+
+
+@router.get("/graph/communities", response_model=GraphCommunities)
+async def get_graph_communities(
+    min_size: int = Query(2, ge=1, description="Минимальный размер сообщества"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Заметки, сгруппированные по сообществам графа связей (Louvain), с центральностью
+    (PageRank) внутри групп. Читаются сохраненные метрики; если граф изменился после
+    расчета, возвращаются они же (stale=true), а пересчет ставится в очередь.
+    """
+    analytics, stale = await notes_analytics.get_graph_analytics(db, current_user.id)
+    groups = await notes_analytics.get_note_communities(db, current_user.id, min_size)
+    return {
+        "graph_version": analytics.graph_version,
+        "stale": stale,
+        "computed_at": analytics.computed_at,
+        "total_notes": analytics.nodes,
+        "modularity": analytics.modularity,
+        "groups": groups,
+    }
+
+
+@router.get("/{note_id}/graph", response_model=NoteGraph)
+async def get_note_graph(
+    note_id: int,
+    depth: int = Query(1, ge=1, le=notes_graph.MAX_GRAPH_DEPTH, description="Глубина обхода (число связей)"),
+    relation: Optional[List[str]] = Query(None, description="Типы связей (по умолчанию все)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Окрестность заметки: заметки в пределах depth связей и связи между ними"""
+    graph = await notes_graph.get_note_neighbourhood(db, current_user.id, note_id, depth, relation)
+    if graph is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Заметка не найдена"
+        )
+    return graph
+
+
 @router.delete("/connections/{connection_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_connection(
     connection_id: int,
@@ -344,21 +611,21 @@ async def delete_connection(
 
 # Google OAuth эндпоинты
 @router.get("/auth/google-url")
-def get_google_auth_url():
+async def get_google_auth_url():
     """Получить URL для авторизации через Google"""
     auth_url = google_oauth_service.get_authorization_url()
     return {"auth_url": auth_url}
 
 
 @router.post("/auth/google-callback")
-def google_auth_callback(
+async def google_auth_callback(
     code: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Обработать callback от Google OAuth"""
     try:
-        token_data = google_oauth_service.exchange_code_for_tokens(code)
-        user = google_oauth_service.create_or_update_user(db, token_data)
+        token_data = await google_oauth_service.exchange_code_for_tokens(code)
+        user = await google_oauth_service.create_or_update_user(db, token_data)
         
         # Здесь можно создать JWT токен для фронтенда
         # Пока возвращаем информацию о пользователе
@@ -379,15 +646,15 @@ def google_auth_callback(
 
 
 @router.get("/auth/google-status")
-def get_google_auth_status(
-    db: Session = Depends(get_db),
+async def get_google_auth_status(
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Проверить статус Google авторизации"""
-    from models import GoogleToken
-    google_token = db.query(GoogleToken).filter(
-        GoogleToken.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(GoogleToken).filter(GoogleToken.user_id == current_user.id)
+    )
+    google_token = result.scalar_one_or_none()
     
     return {
         "is_connected": google_token is not None,
@@ -396,33 +663,57 @@ def get_google_auth_status(
 
 
 @router.delete("/auth/google-disconnect")
-def disconnect_google_auth(
-    db: Session = Depends(get_db),
+async def disconnect_google_auth(
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Отключить Google авторизацию"""
-    from models import GoogleToken
-    google_token = db.query(GoogleToken).filter(
-        GoogleToken.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(GoogleToken).filter(GoogleToken.user_id == current_user.id)
+    )
+    google_token = result.scalar_one_or_none()
     
     if google_token:
-        db.delete(google_token)
-        db.commit()
+        await db.delete(google_token)
+        await db.commit()
+    google_oauth_service.invalidate_calendar_service(current_user.id)
     
     return {"message": "Google аккаунт отключен"}
 
 
+def _calendar_event_response(event: Dict[str, Any], default_summary: str = "") -> Dict[str, Any]:
+    """Событие Google Calendar в формате CalendarEventResponse"""
+    return {
+        "id": event["id"],
+        "summary": event.get("summary", default_summary),
+        "description": event.get("description", ""),
+        "start": {
+            "dateTime": event["start"].get("dateTime"),
+            "date": event["start"].get("date"),
+            "timeZone": event["start"].get("timeZone"),
+        },
+        "end": {
+            "dateTime": event["end"].get("dateTime"),
+            "date": event["end"].get("date"),
+            "timeZone": event["end"].get("timeZone"),
+        },
+        "location": event.get("location", ""),
+        "html_link": event.get("htmlLink", ""),
+        "created": event.get("created", ""),
+        "updated": event.get("updated", ""),
+    }
+
+
 # Календарные эндпоинты
 @router.get("/calendar/user-info", response_model=UserInfoResponse)
-def get_user_info(
-    db: Session = Depends(get_db),
+async def get_user_info(
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Получить информацию о пользователе Google"""
     try:
-        # если сервис недоступен (нет токенов) - считаем, что не подключён
-        google_oauth_service.get_calendar_service(db, current_user.id)
+        # если токен недоступен - считаем, что не подключён
+        await google_oauth_service.get_access_token(db, current_user.id)
         connected = True
     except Exception:
         connected = False
@@ -437,15 +728,15 @@ def get_user_info(
 
 
 @router.get("/calendar/calendars", response_model=List[CalendarListResponse])
-def get_calendars(
-    db: Session = Depends(get_db),
+async def get_calendars(
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Получить список календарей пользователя"""
     try:
-        service = google_oauth_service.get_calendar_service(db, current_user.id)
+        access_token = await google_oauth_service.get_access_token(db, current_user.id)
         
-        calendars_result = service.calendarList().list().execute()
+        calendars_result = await calendar_client.list_calendars(access_token)
         calendars = calendars_result.get('items', [])
         
         return [
@@ -467,56 +758,30 @@ def get_calendars(
 
 
 @router.get("/calendar/events", response_model=List[CalendarEventResponse])
-def get_calendar_events(
+async def get_calendar_events(
     calendar_id: str = Query("primary", description="ID календаря"),
     time_min: Optional[datetime] = Query(None, description="Начальное время"),
     time_max: Optional[datetime] = Query(None, description="Конечное время"),
     max_results: int = Query(50, ge=1, le=100, description="Максимальное количество событий"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Получить события календаря"""
     try:
-        service = google_oauth_service.get_calendar_service(db, current_user.id)
-        
-        # Подготовить параметры запроса
-        kwargs = {
-            'calendarId': calendar_id,
-            'maxResults': max_results,
-            'singleEvents': True,
-            'orderBy': 'startTime'
-        }
-        
-        if time_min:
-            kwargs['timeMin'] = time_min.isoformat()
-        if time_max:
-            kwargs['timeMax'] = time_max.isoformat()
+        access_token = await google_oauth_service.get_access_token(db, current_user.id)
         
-        events_result = service.events().list(**kwargs).execute()
+        events_result = await calendar_client.list_events(
+            access_token,
+            calendar_id,
+            maxResults=max_results,
+            singleEvents=True,
+            orderBy='startTime',
+            timeMin=time_min.isoformat() if time_min else None,
+            timeMax=time_max.isoformat() if time_max else None
+        )
         events = events_result.get('items', [])
         
-        return [
-            {
-                "id": event["id"],
-                "summary": event.get("summary", "Без названия"),
-                "description": event.get("description", ""),
-                "start": {
-                    "dateTime": event["start"].get("dateTime"),
-                    "date": event["start"].get("date"),
-                    "timeZone": event["start"].get("timeZone"),
-                },
-                "end": {
-                    "dateTime": event["end"].get("dateTime"),
-                    "date": event["end"].get("date"),
-                    "timeZone": event["end"].get("timeZone"),
-                },
-                "location": event.get("location", ""),
-                "html_link": event.get("htmlLink", ""),
-                "created": event.get("created", ""),
-                "updated": event.get("updated", ""),
-            }
-            for event in events
-        ]
+        return [_calendar_event_response(event, "Без названия") for event in events]
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -525,15 +790,15 @@ def get_calendar_events(
 
 
 @router.post("/calendar/events", response_model=CalendarEventResponse)
-def create_calendar_event(
+async def create_calendar_event(
     event_data: CreateEventRequest,
     calendar_id: str = Query("primary", description="ID календаря"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Создать событие в календаре"""
     try:
-        service = google_oauth_service.get_calendar_service(db, current_user.id)
+        access_token = await google_oauth_service.get_access_token(db, current_user.id)
         
         # Подготовить данные события
         event_body = {
@@ -550,30 +815,9 @@ def create_calendar_event(
             event_body['attendees'] = [{'email': email} for email in event_data.attendees]
         
         # Создать событие
-        event = service.events().insert(
-            calendarId=calendar_id,
-            body=event_body
-        ).execute()
+        event = await calendar_client.insert_event(access_token, calendar_id, event_body)
         
-        return {
-            "id": event["id"],
-            "summary": event.get("summary", ""),
-            "description": event.get("description", ""),
-            "start": {
-                "dateTime": event["start"].get("dateTime"),
-                "date": event["start"].get("date"),
-                "timeZone": event["start"].get("timeZone"),
-            },
-            "end": {
-                "dateTime": event["end"].get("dateTime"),
-                "date": event["end"].get("date"),
-                "timeZone": event["end"].get("timeZone"),
-            },
-            "location": event.get("location", ""),
-            "html_link": event.get("htmlLink", ""),
-            "created": event.get("created", ""),
-            "updated": event.get("updated", ""),
-        }
+        return _calendar_event_response(event)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -583,13 +827,13 @@ def create_calendar_event(
 
 # Эндпоинты для событий календаря связанных с заметками
 @router.get("/{note_id}/calendar-events")
-def get_note_calendar_events(
+async def get_note_calendar_events(
     note_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Получить события календаря для заметки"""
-    events = calendar_agent.get_note_events(db, note_id)
+    events = await calendar_agent.get_note_events(db, note_id)
     return {
         "note_id": note_id,
         "events": [
@@ -610,18 +854,17 @@ def get_note_calendar_events(
 
 
 @router.post("/{note_id}/analyze-calendar")
-def analyze_note_for_calendar(
+async def analyze_note_for_calendar(
     note_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Принудительно проанализировать заметку на события календаря"""
     # Получить заметку
-    from models import Note
-    note = db.query(Note).filter(
-        Note.id == note_id,
-        Note.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Note).filter(Note.id == note_id, Note.user_id == current_user.id)
+    )
+    note = result.scalar_one_or_none()
     
     if not note:
         raise HTTPException(
@@ -630,8 +873,8 @@ def analyze_note_for_calendar(
         )
     
     # Удалить старые события и создать новые
-    calendar_agent.delete_note_events(db, note_id, current_user.id)
-    created_events = calendar_agent.analyze_note_for_events(db, note, current_user.id)
+    await calendar_agent.delete_note_events(db, note_id, current_user.id)
+    created_events = await calendar_agent.analyze_note_for_events(db, note, current_user.id)
     
     return {
         "message": f"Анализ завершен. Создано событий: {len(created_events)}",
@@ -664,14 +907,24 @@ async def analyze_single_note(
         print(f"Запускаем AI анализ для заметки {note_id}: {note.title[:50]}...")
         
         # Используем AI agent для анализа
-        category = await note_analyzer.categorize_note(note.content)
-        importance = await note_analyzer.assess_importance(note.content)
-        tags = await note_analyzer.suggest_tags(note.content)
-        summary = await note_analyzer.generate_summary(note.content)
-        
-        # Дополнительный анализ
-        topics = await note_analyzer.detect_topics(note.content)
-        keywords = await note_analyzer.extract_keywords(note.content)
+        if settings.AI_BATCHED_ANALYSIS:
+            # Все поля одним запросом к модели
+            analysis = await note_analyzer.analyze_all(note.content)
+            category = analysis["category"]
+            importance = analysis["importance"]
+            tags = analysis["tags"]
+            summary = analysis["summary"]
+            topics = analysis["topics"]
+            keywords = analysis["keywords"]
+        else:
+            category = await note_analyzer.categorize_note(note.content)
+            importance = await note_analyzer.assess_importance(note.content)
+            tags = await note_analyzer.suggest_tags(note.content)
+            summary = await note_analyzer.generate_summary(note.content)
+            
+            # Дополнительный анализ
+            topics = await note_analyzer.detect_topics(note.content)
+            keywords = await note_analyzer.extract_keywords(note.content)
         
         print(f"AI анализ завершен: категория={category}, важность={importance}")
         
@@ -682,6 +935,7 @@ async def analyze_single_note(
         note.summary = summary
         
         await db.commit()
+        await notes_changed(current_user.id)
         
         return {
             "success": True,
@@ -709,142 +963,35 @@ async def analyze_single_note(
         )
 
 
-@router.post("/analyze-all")
+@router.post("/analyze-all", status_code=status.HTTP_202_ACCEPTED)
 async def analyze_all_notes(
-    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Анализировать все заметки пользователя с помощью AI agent"""
-    try:
-        import json
-        
-        # Получаем все заметки пользователя
-        result = await db.execute(
-            select(Note).filter(Note.user_id == current_user.id)
-        )
-        notes = result.scalars().all()
-        
-        analyzed_notes = []
-        
-        print(f"Начинаем AI анализ {len(notes)} заметок...")
-        
-        for note in notes:
-            try:
-                print(f"Анализируем заметку {note.id}: {note.title[:50]}...")
-                
-                # Используем AI agent для анализа
-                category = await note_analyzer.categorize_note(note.content)
-                importance = await note_analyzer.assess_importance(note.content)
-                tags = await note_analyzer.suggest_tags(note.content)
-                summary = await note_analyzer.generate_summary(note.content)
-                
-                print(f"AI анализ заметки {note.id}: категория={category}, важность={importance}")
-                
-                # Обновляем заметку
-                note.category = category
-                note.importance = importance
-                note.tags = json.dumps(tags, ensure_ascii=False) if tags else None
-                note.summary = summary
-                
-                analyzed_notes.append({
-                    "id": note.id,
-                    "title": note.title,
-                    "category": category,
-                    "importance": importance,
-                    "tags": tags,
-                    "summary": summary
-                })
-                
-            except Exception as e:
-                print(f"Ошибка AI анализа заметки {note.id}: {str(e)}")
-                # Fallback на простой анализ
-                try:
-                    category = "General"
-                    importance = 3
-                    tags = []
-                    summary = note.content[:200] + "..." if len(note.content) > 200 else note.content
-                    
-                    note.category = category
-                    note.importance = importance
-                    note.tags = json.dumps(tags, ensure_ascii=False) if tags else None
-                    note.summary = summary
-                    
-                    analyzed_notes.append({
-                        "id": note.id,
-                        "title": note.title,
-                        "category": category,
-                        "importance": importance,
-                        "tags": tags,
-                        "summary": summary
-                    })
-                except Exception as fallback_error:
-                    print(f"Ошибка fallback анализа заметки {note.id}: {str(fallback_error)}")
-                    continue
-        
-        await db.commit()
-        
-        print(f"AI анализ завершен. Обработано {len(analyzed_notes)} заметок")
-        
-        return {
-            "success": True,
-            "analyzed_count": len(analyzed_notes),
-            "notes": analyzed_notes
-        }
-        
-    except Exception as e:
-        print(f"ERROR in analyze_all_notes: {str(e)}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
-        await db.rollback()
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Ошибка AI анализа заметок: {str(e)}"
-        )
+    """Запустить AI анализ всех заметок пользователя в фоне (Celery)"""
+    task = analyze_all_notes_job.delay(user_id=current_user.id)
+    await remember_task_owner(task.id, current_user.id)
+    
+    return {
+        "success": True,
+        "task_id": task.id,
+        "status_url": f"/notes/task/{task.id}/status",
+        "stream_url": f"/notes/task/{task.id}/stream"
+    }
 
 
 @router.get("/categories")
 async def get_note_categories(
     db: AsyncSession = Depends(get_async_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    response_cache: NotesResponseCache = Depends(notes_response_cache)
 ):
     """Получить все категории заметок пользователя"""
+    async def _categories():
+        stats = await get_category_stats(db, current_user.id)
+        return {"categories": stats["categories"]}
+
     try:
-        print(f"Получаем категории для пользователя {current_user.id}")
-        
-        # Получаем все заметки пользователя
-        result = await db.execute(
-            select(Note)
-            .filter(Note.user_id == current_user.id)
-        )
-        notes = result.scalars().all()
-        
-        print(f"Найдено {len(notes)} заметок")
-        
-        # Подсчитываем категории
-        category_counts = {}
-        for note in notes:
-            category = note.category
-            if category and category.strip():
-                category_counts[category] = category_counts.get(category, 0) + 1
-            else:
-                # Считаем заметки без категории как "General"
-                category_counts["General"] = category_counts.get("General", 0) + 1
-        
-        print(f"Категории: {category_counts}")
-        
-        # Сортируем по количеству
-        sorted_categories = sorted(
-            category_counts.items(), 
-            key=lambda x: x[1], 
-            reverse=True
-        )
-        
-        return {
-            "categories": [
-                {"name": name, "count": count} 
-                for name, count in sorted_categories
-            ]
-        }
+        return await response_cache.respond(_categories)
         
     except Exception as e:
         print(f"ERROR in get_note_categories: {str(e)}")
@@ -856,31 +1003,38 @@ async def get_note_categories(
         )
 
 
+# Размер страницы по умолчанию, когда клиент передал cursor без limit
+CATEGORY_PAGE_SIZE = 100
+GROUPED_PAGE_SIZE = 200
+
+
 @router.get("/by-category/{category}")
 async def get_notes_by_category(
     category: str,
+    limit: Optional[int] = Query(
+        None, ge=1, le=500,
+        description="Размер страницы (по умолчанию 100 при переданном cursor)"
+    ),
+    cursor: Optional[str] = Query(
+        None,
+        description="Курсор страницы (пустая строка - первая страница). "
+                    "Без cursor и limit возвращаются все заметки категории"
+    ),
     db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Получить заметки по категории"""
+    """Получить заметки по категории от новых к старым (постранично - по cursor или limit)"""
+    if limit is None and cursor is not None:
+        limit = CATEGORY_PAGE_SIZE
     try:
+        query = select_note_cards().filter(Note.user_id == current_user.id)
         if category == "General":
             # Для категории "General" ищем заметки с пустой или null категорией
-            result = await db.execute(
-                select(Note)
-                .filter(Note.user_id == current_user.id)
-                .filter((Note.category.is_(None)) | (Note.category == '') | (Note.category == 'General'))
-                .order_by(Note.created_at.desc())
-            )
+            query = query.filter((Note.category.is_(None)) | (Note.category == '') | (Note.category == 'General'))
         else:
-            result = await db.execute(
-                select(Note)
-                .filter(Note.user_id == current_user.id)
-                .filter(Note.category == category)
-                .order_by(Note.created_at.desc())
-            )
-        
-        notes = result.scalars().all()
+            query = query.filter(Note.category == category)
+
+        notes, next_cursor = await paginate_notes(db, query, limit, cursor)
         
         return {
             "category": category,
@@ -888,18 +1042,24 @@ async def get_notes_by_category(
                 {
                     "id": note.id,
                     "title": note.title,
-                    "content": note.content[:200] + "..." if len(note.content) > 200 else note.content,
+                    "content": card_preview(note),
                     "category": note.category or "General",
                     "importance": note.importance or 1,
                     "tags": json.loads(note.tags) if note.tags else [],
-                    "summary": note.summary or (note.content[:200] + "..." if len(note.content) > 200 else note.content),
+                    "summary": note.summary or card_preview(note),
                     "created_at": note.created_at,
                     "updated_at": getattr(note, 'updated_at', note.created_at)
                 }
                 for note in notes
-            ]
+            ],
+            "next_cursor": next_cursor
         }
         
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         print(f"ERROR in get_notes_by_category: {str(e)}")
         import traceback
@@ -914,36 +1074,35 @@ async def get_notes_by_category(
 
 @router.get("/categories/grouped")
 async def get_notes_grouped(
+    limit: Optional[int] = Query(
+        None, ge=1, le=1000,
+        description="Количество заметок на странице (по умолчанию 200 при переданном cursor)"
+    ),
+    cursor: Optional[str] = Query(
+        None,
+        description="Курсор страницы (пустая строка - первая страница). "
+                    "Без cursor и limit возвращаются все заметки"
+    ),
     db: AsyncSession = Depends(get_async_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    response_cache: NotesResponseCache = Depends(notes_response_cache)
 ):
-    """Вернуть все заметки пользователя, сгруппированные по категориям."""
+    """
+    Вернуть заметки пользователя, сгруппированные по категориям.
+    Без cursor и limit - все заметки (как раньше). С cursor или limit пагинация
+    идет по заметкам (от новых к старым): каждая страница содержит до limit
+    заметок, сгруппированных по категориям; группы страниц клиент объединяет.
+    """
+    if limit is None and cursor is not None:
+        limit = GROUPED_PAGE_SIZE
     try:
-        result = await db.execute(
-            select(Note).filter(Note.user_id == current_user.id)
-        )
-        notes = result.scalars().all()
-
-        grouped: Dict[str, list] = {}
-        for note in notes:
-            category = note.category.strip() if note.category else "General"
-            grouped.setdefault(category, []).append({
-                "id": note.id,
-                "title": note.title,
-                "content": note.content,
-                "category": category,
-                "importance": note.importance or 1,
-                "tags": json.loads(note.tags) if note.tags else [],
-                "summary": note.summary or note.content[:200],
-                "created_at": note.created_at,
-                "updated_at": getattr(note, "updated_at", note.created_at)
-            })
-
-        # Сортируем категории по количеству заметок
-        sorted_grouped = dict(sorted(grouped.items(), key=lambda x: len(x[1]), reverse=True))
-
-        return {"groups": sorted_grouped}
+        return await response_cache.respond(lambda: _group_notes(db, current_user.id, limit, cursor))
 
+    except InvalidCursorError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         import traceback
         print("ERROR in get_notes_grouped:", traceback.format_exc())
@@ -951,3 +1110,31 @@ async def get_notes_grouped(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка получения сгруппированных заметок: {str(e)}"
         )
+
+
+async def _group_notes(db: AsyncSession, user_id: int, limit: Optional[int], cursor: Optional[str]) -> Dict[str, Any]:
+    """Страница заметок пользователя, сгруппированная по категориям"""
+    notes, next_cursor = await paginate_notes(
+        db, select_note_cards().filter(Note.user_id == user_id), limit, cursor
+    )
+
+    grouped: Dict[str, list] = {}
+    for note in notes:
+        category = note.category.strip() if note.category else "General"
+        grouped.setdefault(category, []).append({
+            "id": note.id,
+            "title": note.title,
+            "content": card_preview(note),
+            "content_truncated": note.content_truncated,
+            "category": category,
+            "importance": note.importance or 1,
+            "tags": json.loads(note.tags) if note.tags else [],
+            "summary": note.summary or note.content,
+            "created_at": note.created_at,
+            "updated_at": getattr(note, "updated_at", note.created_at)
+        })
+
+    # Сортируем категории по количеству заметок
+    sorted_grouped = dict(sorted(grouped.items(), key=lambda x: len(x[1]), reverse=True))
+
+    return {"groups": sorted_grouped, "next_cursor": next_cursor}
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List, Any
-from datetime import datetime
+from datetime import datetime, timezone
 import json
 
 # Note схемы
@@ -11,6 +11,32 @@ class NoteBase(BaseModel):
 class NoteCreate(NoteBase):
     pass
 
+class NoteImport(NoteCreate):
+    created_at: Optional[datetime] = None  # Исходная дата заметки при переносе
+
+    @field_validator('created_at')
+    @classmethod
+    def to_naive_utc(cls, v):
+        # Колонки created_at/updated_at хранят UTC без часового пояса
+        if v is not None and v.tzinfo is not None:
+            return v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+
+class NoteImportError(BaseModel):
+    index: int  # Номер записи в теле импорта (с 0)
+    error: str
+
+class NoteImportResult(BaseModel):
+    received: int
+    imported: int
+    skipped: int  # Заголовок уже занят
+    failed: int  # Не прошли проверку или не сохранены (ошибка БД)
+    truncated: bool  # Записи сверх NOTES_IMPORT_MAX_NOTES не прочитаны
+    errors: List[NoteImportError] = []
+    first_note_id: Optional[int] = None
+    last_note_id: Optional[int] = None
+    task_id: Optional[str] = None  # Задача анализа импортированных заметок
+
 class NoteUpdate(BaseModel):
     content: Optional[str] = None
 
@@ -44,6 +70,15 @@ class NoteResponse(NoteBase):
     class Config:
         from_attributes = True
 
+class NoteCardResponse(NoteResponse):
+    """Карточка заметки для списков: content содержит только превью"""
+    content_truncated: bool = False
+
+class NotePage(BaseModel):
+    """Страница карточек заметок с курсором следующей страницы"""
+    items: List[NoteCardResponse]
+    next_cursor: Optional[str] = None
+
 # NoteConnection схемы
 class NoteConnectionBase(BaseModel):
     note_b_id: int
@@ -63,6 +98,66 @@ class NoteConnectionResponse(NoteConnectionBase):
     class Config:
         from_attributes = True
 
+# Граф заметок
+class GraphNode(BaseModel):
+    id: int
+    title: Optional[str] = None
+    category: Optional[str] = None
+    importance: Optional[int] = None
+    depth: Optional[int] = None  # Расстояние от корневой заметки (None для всего графа)
+
+class GraphEdge(BaseModel):
+    id: int
+    source: int  # note_a_id
+    target: int  # note_b_id
+    relation: Optional[str] = None
+
+class NoteGraph(BaseModel):
+    root_id: Optional[int] = None
+    depth: Optional[int] = None
+    nodes: List[GraphNode] = []
+    edges: List[GraphEdge] = []
+
+# Граф заметок в колоночном формате (/notes/graph): i-е элементы списков - одна вершина/ребро
+class GraphNodeColumns(BaseModel):
+    id: List[int] = []
+    title: List[Optional[str]] = []
+    category: List[Optional[str]] = []
+    importance: List[Optional[int]] = []
+
+class GraphEdgeColumns(BaseModel):
+    id: List[int] = []
+    source: List[int] = []
+    target: List[int] = []
+    relation: List[Optional[str]] = []
+
+class GraphDeleted(BaseModel):
+    nodes: List[int] = []
+    edges: List[int] = []
+
+class GraphSnapshot(BaseModel):
+    version: int  # Передать как since в следующем запросе
+    full: bool  # True - полный снимок, False - только изменения после since
+    nodes: GraphNodeColumns
+    edges: GraphEdgeColumns
+    deleted: GraphDeleted
+
+# Сообщества графа заметок (/notes/graph/communities), см. notes/analytics.py
+class GraphCommunity(BaseModel):
+    community: int  # 0 - самое большое сообщество
+    group_name: str  # Заголовок самой центральной заметки
+    theme: str  # Самая частая категория
+    notes: List[int]  # По убыванию центральности
+    summary: str
+
+class GraphCommunities(BaseModel):
+    graph_version: int  # Версия графа, по которой посчитаны сообщества
+    stale: bool  # Граф изменился после расчета, пересчет поставлен в очередь
+    computed_at: datetime
+    total_notes: int
+    modularity: float
+    groups: List[GraphCommunity] = []
+
 # RelatedLink схемы
 class RelatedLinkBase(BaseModel):
     url: str
@@ -0,0 +1,84 @@
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Row, func, and_, or_, literal
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Note
+from .cards import select_note_cards
+from .pagination import encode_cursor, decode_cursor, InvalidCursorError
+
+# Конфигурации, которыми построен notes.search_vector (см. NOTE_SEARCH_VECTOR_SQL)
+SEARCH_CONFIGS = ("russian", "english")
+# Максимум слов запроса, остальные игнорируются
+MAX_QUERY_TERMS = 16
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def extract_terms(search_term: str) -> List[str]:
+    """Слова поискового запроса без спецсимволов tsquery"""
+    return _TERM_RE.findall((search_term or "").lower())[:MAX_QUERY_TERMS]
+
+
+def build_tsquery(search_term: str):
+    """
+    Построить tsquery для префиксного поиска: каждое слово ищется
+    по префиксу в русской или английской форме, все слова обязательны.
+    Возвращает None, если в запросе нет слов.
+    """
+    query = None
+    for term in extract_terms(search_term):
+        term_query = None
+        for config in SEARCH_CONFIGS:
+            part = func.to_tsquery(literal(config).cast(REGCONFIG), f"'{term}':*")
+            term_query = part if term_query is None else term_query.op("||")(part)
+        query = term_query if query is None else query.op("&&")(term_query)
+    return query
+
+
+async def search_notes(
+    db: AsyncSession,
+    user_id: int,
+    search_term: str,
+    limit: int = 20,
+    cursor: Optional[str] = None
+) -> Tuple[List[Row], Optional[str]]:
+    """
+    Ранжированный полнотекстовый поиск заметок пользователя.
+    Сортировка по релевантности (ts_rank_cd), затем по ID.
+    Возвращает страницу карточек заметок и курсор следующей страницы.
+    """
+    tsquery = build_tsquery(search_term)
+    if tsquery is None:
+        return [], None
+
+    rank = func.ts_rank_cd(Note.search_vector, tsquery).label("rank")
+    stmt = (
+        select_note_cards()
+        .add_columns(rank)
+        .filter(Note.user_id == user_id, Note.search_vector.op("@@")(tsquery))
+        .order_by(rank.desc(), Note.id.desc())
+        .limit(limit + 1)
+    )
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        try:
+            last_rank, last_id = float(position["r"]), int(position["id"])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidCursorError("Некорректный курсор поиска")
+        stmt = stmt.filter(or_(
+            rank < last_rank,
+            and_(rank == last_rank, Note.id < last_id)
+        ))
+
+    rows = (await db.execute(stmt)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor({"r": float(rows[-1].rank), "id": rows[-1].id})
+
+    return rows, next_cursor
+
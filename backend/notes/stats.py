@@ -0,0 +1,60 @@
+from datetime import timedelta
+from typing import Any, Dict
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Note
+from redis_config import async_cache
+
+# Сводка живет до следующей записи заметок пользователя, TTL - страховка
+CATEGORY_STATS_TTL = timedelta(hours=6)
+
+# Заметки без категории считаются категорией "General"
+DEFAULT_CATEGORY = "General"
+
+
+def get_category_stats_key(user_id: int) -> str:
+    """Ключ кеша сводки категорий пользователя"""
+    return f"notes:category_stats:{user_id}"
+
+
+def category_column():
+    """Нормализованная категория заметки: пустые и NULL -> General"""
+    return func.coalesce(func.nullif(func.trim(Note.category), ''), DEFAULT_CATEGORY)
+
+
+async def compute_category_stats(db: AsyncSession, user_id: int) -> Dict[str, Any]:
+    """Посчитать количество заметок по категориям одним GROUP BY запросом"""
+    category = category_column().label("category")
+    result = await db.execute(
+        select(category, func.count().label("count"))
+        .where(Note.user_id == user_id)
+        .group_by(category)
+        .order_by(func.count().desc(), category)
+    )
+    categories = [{"name": name, "count": count} for name, count in result.all()]
+    return {
+        "total": sum(item["count"] for item in categories),
+        "categories": categories,
+    }
+
+
+async def get_category_stats(db: AsyncSession, user_id: int) -> Dict[str, Any]:
+    """
+    Сводка заметок пользователя: {"total": N, "categories": [{"name", "count"}]}.
+    Берется из Redis, при промахе считается в БД и кладется в кеш.
+    """
+    key = get_category_stats_key(user_id)
+    stats = await async_cache.get(key)
+    if stats is not None:
+        return stats
+
+    stats = await compute_category_stats(db, user_id)
+    await async_cache.set(key, stats, ttl=CATEGORY_STATS_TTL, user_id=user_id)
+    return stats
+
+
+async def invalidate_category_stats(user_id: int) -> None:
+    """Сбросить сводку пользователя после создания, изменения или удаления заметок"""
+    await async_cache.delete(get_category_stats_key(user_id))
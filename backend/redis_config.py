@@ -1,7 +1,13 @@
 import redis
-from typing import Optional, Any
+import redis.asyncio as aioredis
+from collections import OrderedDict
+from typing import Optional, Any, Awaitable, Callable, Dict, List, Sequence, Tuple, Union
+import asyncio
+import inspect
 import json
 import os
+import time
+import uuid
 from datetime import timedelta
 
 # Redis клиенты для разных целей
@@ -12,6 +18,16 @@ redis_cache = redis.Redis(
     decode_responses=True
 )
 
+# Общий пул соединений асинхронного клиента кеша (на процесс)
+async_cache_pool = aioredis.ConnectionPool(
+    host=os.getenv('REDIS_HOST', 'localhost'),
+    port=int(os.getenv('REDIS_PORT', 6379)),
+    db=1,  # DB 1 для кеша
+    max_connections=int(os.getenv('REDIS_MAX_CONNECTIONS', 50)),
+    decode_responses=True
+)
+redis_cache_async = aioredis.Redis(connection_pool=async_cache_pool)
+
 redis_celery = redis.Redis(
     host=os.getenv('REDIS_HOST', 'localhost'),
     port=int(os.getenv('REDIS_PORT', 6379)),
@@ -19,6 +35,23 @@ redis_celery = redis.Redis(
     decode_responses=True
 )
 
+# Размер пачки SCAN/SSCAN (COUNT) и UNLINK при удалении ключей
+SCAN_BATCH_SIZE = int(os.getenv('REDIS_SCAN_BATCH_SIZE', 500))
+
+# Индекс ключей кеша пользователя: множество, по которому ключи
+# удаляются без обхода всего keyspace. TTL продлевается при каждой записи
+USER_INDEX_TTL = timedelta(days=30)
+
+
+def get_user_index_key(user_id: int) -> str:
+    """Ключ множества-индекса кешированных ключей пользователя"""
+    return f"cache_index:user:{user_id}"
+
+
+def _claim_index_key(index_key: str) -> str:
+    """Временное имя индекса на время удаления (новые записи попадут в новый индекс)"""
+    return f"{index_key}:clearing:{uuid.uuid4().hex}"
+
 
 class RedisCache:
     """Утилиты для работы с Redis кешем"""
@@ -37,15 +70,27 @@ class RedisCache:
         except Exception:
             return None
     
-    def set(self, key: str, value: Any, ttl: Optional[timedelta] = None) -> bool:
-        """Сохранить значение в кеш"""
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[timedelta] = None,
+        user_id: Optional[int] = None
+    ) -> bool:
+        """Сохранить значение в кеш (с user_id - и в индекс ключей пользователя)"""
         try:
             ttl = ttl or self.default_ttl
-            self.client.setex(
-                key,
-                int(ttl.total_seconds()),
-                json.dumps(value, ensure_ascii=False)
-            )
+            with self.client.pipeline(transaction=False) as pipe:
+                pipe.setex(
+                    key,
+                    int(ttl.total_seconds()),
+                    json.dumps(value, ensure_ascii=False)
+                )
+                if user_id is not None:
+                    index_key = get_user_index_key(user_id)
+                    pipe.sadd(index_key, key)
+                    pipe.expire(index_key, int(USER_INDEX_TTL.total_seconds()))
+                pipe.execute()
             return True
         except Exception:
             return False
@@ -74,16 +119,402 @@ class RedisCache:
         self.set(key, value, ttl)
         return value
     
-    def clear_pattern(self, pattern: str) -> int:
-        """Удалить все ключи по паттерну"""
+    def clear_pattern(self, pattern: str, batch_size: int = SCAN_BATCH_SIZE) -> int:
+        """
+        Удалить все ключи по паттерну.
+        Инкрементальный SCAN и UNLINK пачками: Redis не блокируется
+        на время обхода keyspace, память освобождается в фоне.
+        """
+        deleted = 0
+        batch = []
+        try:
+            for key in self.client.scan_iter(match=pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    deleted += self.client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += self.client.unlink(*batch)
+        except Exception as e:
+            print(f"Ошибка очистки кеша по паттерну {pattern}: {e}")
+        return deleted
+
+    def clear_user(self, user_id: int, batch_size: int = SCAN_BATCH_SIZE) -> int:
+        """Удалить все ключи кеша пользователя по его индексу (без SCAN по keyspace)"""
+        index_key = get_user_index_key(user_id)
+        claimed = _claim_index_key(index_key)
         try:
-            keys = self.client.keys(pattern)
-            if keys:
-                return self.client.delete(*keys)
+            self.client.rename(index_key, claimed)
+        except redis.ResponseError:
+            # Индекса нет - у пользователя нет ключей в кеше
             return 0
-        except Exception:
+        except Exception as e:
+            print(f"Ошибка очистки кеша пользователя {user_id}: {e}")
             return 0
 
+        deleted = 0
+        batch = []
+        try:
+            for key in self.client.sscan_iter(claimed, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    deleted += self.client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += self.client.unlink(*batch)
+            self.client.unlink(claimed)
+        except Exception as e:
+            print(f"Ошибка очистки кеша пользователя {user_id}: {e}")
+        return deleted
+
+    def prune_user_indexes(self, batch_size: int = SCAN_BATCH_SIZE) -> int:
+        """Убрать из индексов пользователей ключи, которые уже истекли по TTL"""
+        removed = 0
+        try:
+            for index_key in self.client.scan_iter(match=get_user_index_key("*"), count=batch_size):
+                if ":clearing:" in index_key:
+                    continue
+                members = []
+                for key in self.client.sscan_iter(index_key, count=batch_size):
+                    members.append(key)
+                    if len(members) >= batch_size:
+                        removed += self._prune_index_batch(index_key, members)
+                        members = []
+                if members:
+                    removed += self._prune_index_batch(index_key, members)
+        except Exception as e:
+            print(f"Ошибка очистки индексов кеша: {e}")
+        return removed
+
+    def _prune_index_batch(self, index_key: str, members: List[str]) -> int:
+        with self.client.pipeline(transaction=False) as pipe:
+            for key in members:
+                pipe.exists(key)
+            exists = pipe.execute()
+        missing = [key for key, found in zip(members, exists) if not found]
+        if missing:
+            return self.client.srem(index_key, *missing)
+        return 0
+
 
 # Глобальный экземпляр кеша
-cache = RedisCache() 
\ No newline at end of file
+cache = RedisCache()
+
+
+class AsyncRedisCache:
+    """
+    Неблокирующий кеш для корутин (FastAPI, event loop Celery воркера).
+    API совпадает с RedisCache, плюс пакетные mget/mset через pipeline.
+    """
+
+    def __init__(self, client: aioredis.Redis = redis_cache_async):
+        self.client = client
+        self.default_ttl = timedelta(hours=24)
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Получить значение из кеша"""
+        try:
+            value = await self.client.get(key)
+            if value:
+                return json.loads(value)
+            return None
+        except Exception:
+            return None
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[timedelta] = None,
+        user_id: Optional[int] = None
+    ) -> bool:
+        """Сохранить значение в кеш (с user_id - и в индекс ключей пользователя)"""
+        try:
+            ttl = ttl or self.default_ttl
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.setex(
+                    key,
+                    int(ttl.total_seconds()),
+                    json.dumps(value, ensure_ascii=False)
+                )
+                if user_id is not None:
+                    index_key = get_user_index_key(user_id)
+                    pipe.sadd(index_key, key)
+                    pipe.expire(index_key, int(USER_INDEX_TTL.total_seconds()))
+                await pipe.execute()
+            return True
+        except Exception:
+            return False
+
+    async def delete(self, key: str) -> bool:
+        """Удалить значение из кеша"""
+        try:
+            return bool(await self.client.delete(key))
+        except Exception:
+            return False
+
+    async def exists(self, key: str) -> bool:
+        """Проверить существование ключа"""
+        try:
+            return bool(await self.client.exists(key))
+        except Exception:
+            return False
+
+    async def mget(self, keys: Sequence[str]) -> List[Optional[Any]]:
+        """Получить несколько значений за один запрос (None для отсутствующих)"""
+        if not keys:
+            return []
+        try:
+            values = await self.client.mget(list(keys))
+        except Exception:
+            return [None] * len(keys)
+
+        result = []
+        for value in values:
+            try:
+                result.append(json.loads(value) if value else None)
+            except (TypeError, ValueError):
+                result.append(None)
+        return result
+
+    async def mset(self, mapping: Dict[str, Any], ttl: Optional[timedelta] = None) -> bool:
+        """Сохранить несколько значений с TTL одним pipeline"""
+        if not mapping:
+            return True
+        try:
+            seconds = int((ttl or self.default_ttl).total_seconds())
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, value in mapping.items():
+                    pipe.setex(key, seconds, json.dumps(value, ensure_ascii=False))
+                await pipe.execute()
+            return True
+        except Exception:
+            return False
+
+    async def get_or_set(
+        self,
+        key: str,
+        func: Callable[[], Union[Any, Awaitable[Any]]],
+        ttl: Optional[timedelta] = None
+    ) -> Any:
+        """Получить из кеша или вычислить (func может быть корутиной) и сохранить"""
+        value = await self.get(key)
+        if value is not None:
+            return value
+
+        value = func()
+        if inspect.isawaitable(value):
+            value = await value
+        await self.set(key, value, ttl)
+        return value
+
+    async def clear_pattern(self, pattern: str, batch_size: int = SCAN_BATCH_SIZE) -> int:
+        """Удалить все ключи по паттерну (SCAN и UNLINK пачками, как RedisCache)"""
+        deleted = 0
+        batch = []
+        try:
+            async for key in self.client.scan_iter(match=pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    deleted += await self.client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += await self.client.unlink(*batch)
+        except Exception as e:
+            print(f"Ошибка очистки кеша по паттерну {pattern}: {e}")
+        return deleted
+
+    async def clear_user(self, user_id: int, batch_size: int = SCAN_BATCH_SIZE) -> int:
+        """Удалить все ключи кеша пользователя по его индексу (без SCAN по keyspace)"""
+        index_key = get_user_index_key(user_id)
+        claimed = _claim_index_key(index_key)
+        try:
+            await self.client.rename(index_key, claimed)
+        except redis.ResponseError:
+            # Индекса нет - у пользователя нет ключей в кеше
+            return 0
+        except Exception as e:
+            print(f"Ошибка очистки кеша пользователя {user_id}: {e}")
+            return 0
+
+        deleted = 0
+        batch = []
+        try:
+            async for key in self.client.sscan_iter(claimed, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    deleted += await self.client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += await self.client.unlink(*batch)
+            await self.client.unlink(claimed)
+        except Exception as e:
+            print(f"Ошибка очистки кеша пользователя {user_id}: {e}")
+        return deleted
+
+
+# Глобальный экземпляр асинхронного кеша
+async_cache = AsyncRedisCache()
+
+
+class TwoTierCache:
+    """
+    Двухуровневый кеш: ограниченный LRU в памяти процесса перед Redis.
+    get_or_compute объединяет одновременные промахи по одному ключу
+    (single-flight): значение вычисляется один раз, остальные ждут результат.
+    Предназначен для использования из одного event loop процесса.
+    """
+
+    def __init__(
+        self,
+        remote: AsyncRedisCache,
+        maxsize: int = 1024,
+        local_ttl: timedelta = timedelta(minutes=5)
+    ):
+        self.remote = remote
+        self.maxsize = maxsize
+        self.local_ttl = local_ttl.total_seconds()
+        # key -> (время истечения, значение)
+        self._local: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.counters = {
+            "local_hits": 0,
+            "remote_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "coalesced": 0,
+        }
+
+    def _get_local(self, key: str) -> Optional[Any]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: Any) -> None:
+        self._local[key] = (time.monotonic() + self.local_ttl, value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.maxsize:
+            self._local.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Получить значение: сначала из памяти, затем из Redis"""
+        value = self._get_local(key)
+        if value is not None:
+            self.counters["local_hits"] += 1
+            return value
+
+        value = await self.remote.get(key)
+        if value is not None:
+            self.counters["remote_hits"] += 1
+            self._set_local(key, value)
+            return value
+
+        self.counters["misses"] += 1
+        return None
+
+    async def set(self, key: str, value: Any, ttl: Optional[timedelta] = None) -> bool:
+        """Сохранить значение в оба уровня"""
+        self._set_local(key, value)
+        return await self.remote.set(key, value, ttl)
+
+    async def delete(self, key: str) -> bool:
+        """Удалить значение из обоих уровней"""
+        self._local.pop(key, None)
+        return await self.remote.delete(key)
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[Any]]:
+        """Получить несколько значений: недостающие в памяти читаются одним MGET"""
+        values: List[Optional[Any]] = [self._get_local(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        self.counters["local_hits"] += len(keys) - len(missing)
+
+        if missing:
+            remote_values = await self.remote.mget([keys[i] for i in missing])
+            for i, value in zip(missing, remote_values):
+                if value is None:
+                    self.counters["misses"] += 1
+                    continue
+                self.counters["remote_hits"] += 1
+                self._set_local(keys[i], value)
+                values[i] = value
+        return values
+
+    async def set_many(self, mapping: Dict[str, Any], ttl: Optional[timedelta] = None) -> bool:
+        """Сохранить несколько значений (в Redis одним pipeline)"""
+        for key, value in mapping.items():
+            self._set_local(key, value)
+        return await self.remote.mset(mapping, ttl)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: Optional[timedelta] = None
+    ) -> Any:
+        """
+        Получить из кеша или вычислить; одновременные промахи ждут одно вычисление.
+        Если вычисляющий вызов отменен (например, клиент отключился), ожидающие
+        не получают его отмену, а повторяют поиск и вычисление сами.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            value = await self.get(key)
+            if value is not None:
+                return value
+
+            future = self._inflight.get(key)
+            if future is None or future.get_loop() is not loop:
+                break
+            self.counters["coalesced"] += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Отменен сам ожидающий - пробрасываем; отменено чужое вычисление - повторяем
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+            if value is not None:
+                await self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение получают ожидающие; если их нет, не логируем "never retrieved"
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий, промахов и вытеснений"""
+        lookups = self.counters["local_hits"] + self.counters["remote_hits"] + self.counters["misses"]
+        hits = self.counters["local_hits"] + self.counters["remote_hits"]
+        return {
+            **self.counters,
+            "size": len(self._local),
+            "maxsize": self.maxsize,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Кеш результатов AI анализа (память процесса + Redis)
+ai_result_cache = TwoTierCache(
+    async_cache,
+    maxsize=int(os.getenv('AI_CACHE_LOCAL_SIZE', 2048)),
+    local_ttl=timedelta(seconds=int(os.getenv('AI_CACHE_LOCAL_TTL', 300)))
+)
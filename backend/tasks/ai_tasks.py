@@ -1,38 +1,61 @@
-from celery import shared_task, group
+from celery import shared_task
 from celery.utils.log import get_task_logger
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
 from typing import Dict, Any, List, Optional
 import asyncio
 import json
-import hashlib
 from datetime import datetime, timedelta
-import redis
 import openai
 from functools import lru_cache
 
-from database import ASYNC_DATABASE_URL
+from database import AsyncSessionLocal
+from tasks.runtime import run_async, get_openai_client
 from models import Note, User
 from ai_agent.note_analyzer import NoteAnalyzer
+from ai_agent.batch_analyzer import BatchNoteAnalyzer
+from ai_agent.semantic_index import semantic_index
 from ai_agent.agent import AIAgent
+from ai_agent.ai_cache import (
+    ANALYSIS_CACHE_TTL,
+    ANALYSIS_MODEL,
+    agent_prompt_version,
+    ai_cache_key,
+    prompt_version,
+)
+from notes.http_cache import notes_changed
+from notes.crud import schedule_note_indexing
+from redis_config import cache, async_cache, ai_result_cache
+from config import settings
 
 logger = get_task_logger(__name__)
 
-# Redis для кеширования
-redis_client = redis.Redis(host='redis', port=6379, db=1, decode_responses=True)
+# Промпты поэлементного анализа (AI_BATCHED_ANALYSIS выключен)
+FIELD_ANALYSIS_PROMPTS = (
+    "categorization",
+    "importance_assessment",
+    "summary_generation",
+    "tags_generation",
+)
 
-# Создаем асинхронный движок
-engine = create_async_engine(ASYNC_DATABASE_URL, echo=False)
-AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+# Промпт быстрой генерации резюме
+SUMMARY_PROMPT = """Summarize this text in {max_length} characters or less. Be concise and capture key points:
 
-# Время жизни кеша в секундах
-CACHE_TTL = 3600 * 24  # 24 часа
+{content}...
 
+Summary:"""
+SUMMARY_MODEL = "gpt-3.5-turbo"
 
-def get_cache_key(prefix: str, content: str) -> str:
-    """Генерация ключа кеша на основе контента"""
-    content_hash = hashlib.md5(content.encode()).hexdigest()
-    return f"{prefix}:{content_hash}"
+# Категоризация по ключевым словам без модели
+KEYWORD_CATEGORIZATION = "keywords"
+KEYWORD_CATEGORIES = {
+    'Work': ['работа', 'проект', 'задача', 'встреча', 'дедлайн', 'коллега'],
+    'Learning': ['учеба', 'курс', 'книга', 'изучить', 'обучение', 'урок'],
+    'Personal': ['личное', 'семья', 'друзья', 'дом', 'хобби', 'отдых'],
+    'Finance': ['деньги', 'бюджет', 'расход', 'доход', 'инвестиции', 'счет'],
+    'Health': ['здоровье', 'врач', 'лекарство', 'спорт', 'диета', 'сон'],
+    'Idea': ['идея', 'мысль', 'концепция', 'план', 'стартап', 'бизнес'],
+    'Travel': ['путешествие', 'поездка', 'отпуск', 'билет', 'отель'],
+    'Shopping': ['купить', 'покупка', 'магазин', 'заказ', 'товар'],
+}
 
 
 @shared_task(bind=True, name='tasks.ai_tasks.analyze_note_async')
@@ -43,7 +66,7 @@ def analyze_note_async(self, note_id: int, user_id: int, force: bool = False) ->
     try:
         logger.info(f"Analyzing note {note_id} for user {user_id}")
         
-        result = asyncio.run(_analyze_note_async(note_id, user_id, force))
+        result = run_async(_analyze_note_async(note_id, user_id, force))
         
         logger.info(f"Note analyzed successfully: {note_id}")
         return result
@@ -65,31 +88,47 @@ async def _analyze_note_async(note_id: int, user_id: int, force: bool = False) -
         if not note:
             raise ValueError(f"Note {note_id} not found")
         
-        # Проверяем кеш
-        cache_key = get_cache_key("note_analysis", note.content)
-        if not force:
-            cached_result = redis_client.get(cache_key)
-            if cached_result:
-                logger.info(f"Using cached analysis for note {note_id}")
-                return json.loads(cached_result)
-        
         # Создаем анализатор
-        analyzer = NoteAnalyzer()
-        
-        # Определяем язык заметки
-        language = await analyzer.detect_language(note.content)
-        
-        # Параллельный анализ всех аспектов
-        tasks = [
-            analyzer.categorize_note(note.content),
-            analyzer.assess_importance(note.content),
-            analyzer.extract_keywords(note.content),
-            analyzer.generate_summary(note.content),
-            analyzer.suggest_tags(note.content),
-            analyzer.analyze_sentiment(note.content),
-        ]
-        
-        results = await asyncio.gather(*tasks)
+        analyzer = NoteAnalyzer(get_openai_client())
+        
+        if settings.AI_BATCHED_ANALYSIS:
+            # Все поля одним запросом к модели; результат в общем кеше AI
+            # (тот же ключ, что у API и пакетного анализа)
+            analysis = await analyzer.analyze_all(note.content, refresh=force)
+            results = [
+                analysis['category'],
+                analysis['importance'],
+                analysis['keywords'],
+                analysis['summary'],
+                analysis['tags'],
+                analysis['sentiment'],
+            ]
+        else:
+            cache_key = ai_cache_key(
+                "field_analysis",
+                note.content,
+                agent_prompt_version(*FIELD_ANALYSIS_PROMPTS),
+                ANALYSIS_MODEL
+            )
+            results = None if force else await ai_result_cache.get(cache_key)
+            if results:
+                logger.info(f"Using cached analysis for note {note_id}")
+            else:
+                # Определяем язык заметки
+                language = await analyzer.detect_language(note.content)
+                
+                # Параллельный анализ всех аспектов
+                tasks = [
+                    analyzer.categorize_note(note.content),
+                    analyzer.assess_importance(note.content),
+                    analyzer.extract_keywords(note.content),
+                    analyzer.generate_summary(note.content),
+                    analyzer.suggest_tags(note.content),
+                    analyzer.analyze_sentiment(note.content),
+                ]
+                
+                results = await asyncio.gather(*tasks)
+                await ai_result_cache.set(cache_key, list(results), ttl=ANALYSIS_CACHE_TTL)
         
         analysis_result = {
             'note_id': note_id,
@@ -102,18 +141,16 @@ async def _analyze_note_async(note_id: int, user_id: int, force: bool = False) -
             'analyzed_at': datetime.utcnow().isoformat(),
         }
         
-        # Сохраняем в кеш
-        redis_client.setex(cache_key, CACHE_TTL, json.dumps(analysis_result))
-        
         # Обновляем заметку в БД
         note.category = results[0]
         note.importance = results[1]
-        note.tags = results[4]
+        note.tags = json.dumps(results[4], ensure_ascii=False) if results[4] else None
         note.summary = results[3]
         note.ai_processed = True
         note.ai_processed_at = datetime.utcnow()
         
         await db.commit()
+        await notes_changed(user_id)
         
         return analysis_result
 
@@ -121,49 +158,268 @@ async def _analyze_note_async(note_id: int, user_id: int, force: bool = False) -
 @shared_task(name='tasks.ai_tasks.batch_analyze_notes')
 def batch_analyze_notes(note_ids: List[int], user_id: int) -> Dict[str, Any]:
     """
-    Пакетный анализ заметок с параллельной обработкой
+    Пакетный анализ заметок: несколько заметок в одном запросе к модели,
+    пакеты выполняются параллельно
     """
     logger.info(f"Batch analyzing {len(note_ids)} notes for user {user_id}")
     
-    # Создаем группу задач для параллельного выполнения
-    job = group(analyze_note_async.s(note_id, user_id) for note_id in note_ids)
-    result = job.apply_async()
+    return run_async(_batch_analyze_notes(note_ids, user_id))
+
+
+async def _batch_analyze_notes(note_ids: List[int], user_id: int) -> Dict[str, Any]:
+    """Внутренняя функция пакетного анализа"""
+    async with AsyncSessionLocal() as db:
+        from sqlalchemy import select
+        query = select(Note).where(Note.id.in_(note_ids), Note.user_id == user_id)
+        result = await db.execute(query)
+        notes = result.scalars().all()
+        
+        analyzer = BatchNoteAnalyzer(NoteAnalyzer(get_openai_client()))
+        analyses = await analyzer.analyze([(note.id, note.content) for note in notes])
+        
+        # Результаты кешируются в BatchNoteAnalyzer
+        successful = []
+        for note in notes:
+            analysis = analyses.get(note.id)
+            if not analysis:
+                continue
+            
+            analysis_result = {
+                'note_id': note.id,
+                'category': analysis['category'],
+                'importance': analysis['importance'],
+                'keywords': analysis['keywords'],
+                'summary': analysis['summary'],
+                'tags': analysis['tags'],
+                'sentiment': analysis['sentiment'],
+                'analyzed_at': datetime.utcnow().isoformat(),
+            }
+            
+            _apply_analysis(note, analysis)
+            successful.append(analysis_result)
+        
+        await db.commit()
+        await notes_changed(user_id)
+        
+        return {
+            'total': len(note_ids),
+            'successful': len(successful),
+            'failed': len(note_ids) - len(successful),
+            'results': successful,
+        }
+
+
+def _apply_analysis(note: Note, analysis: Dict[str, Any]) -> None:
+    """Записать результат анализа в поля заметки"""
+    note.category = analysis['category']
+    note.importance = analysis['importance']
+    note.tags = json.dumps(analysis['tags'], ensure_ascii=False) if analysis['tags'] else None
+    note.summary = analysis['summary']
+    # Иначе analyze_unprocessed_notes будет снова выбирать эту заметку
+    note.ai_processed = True
+    note.ai_processed_at = datetime.utcnow()
+
+
+# Чекпоинт задачи анализа всех заметок (для продолжения после retry)
+ANALYZE_ALL_CHECKPOINT_TTL = 3600 * 24
+
+
+def get_analyze_all_checkpoint_key(task_id: str) -> str:
+    """Ключ чекпоинта задачи анализа всех заметок"""
+    return f"analyze_all:checkpoint:{task_id}"
+
+
+@shared_task(bind=True, name='tasks.ai_tasks.analyze_all_notes_job')
+def analyze_all_notes_job(
+    self,
+    user_id: int,
+    chunk_size: int = 50,
+    after_note_id: int = 0,
+    up_to_note_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Анализ всех заметок пользователя частями (или только заметок с ID
+    в (after_note_id, up_to_note_id] - например, после импорта).
+    Каждая часть коммитится отдельно, а ID последней обработанной заметки
+    сохраняется в Redis, поэтому повторная попытка продолжает с места остановки.
+    """
+    try:
+        logger.info(f"Analyzing all notes for user {user_id}")
+        
+        result = run_async(_analyze_all_notes_job(
+            self, self.request.id, user_id, chunk_size, after_note_id, up_to_note_id
+        ))
+        
+        logger.info(f"Analyzed {result['analyzed_count']} notes for user {user_id}")
+        return result
+        
+    except Exception as e:
+        logger.error(f"Error analyzing all notes: {str(e)}")
+        raise self.retry(exc=e, countdown=60, max_retries=3)
+
+
+async def _analyze_all_notes_job(
+    task,
+    task_id: str,
+    user_id: int,
+    chunk_size: int,
+    after_note_id: int = 0,
+    up_to_note_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Внутренняя функция анализа всех заметок с чекпоинтами.
+    task_id передается явно: task.request локален для потока задачи,
+    а корутина выполняется в потоке event loop воркера.
+    """
+    from sqlalchemy import select, func
+    
+    checkpoint_key = get_analyze_all_checkpoint_key(task_id)
+    checkpoint = await async_cache.get(checkpoint_key) or {}
+    last_note_id = checkpoint.get('last_note_id', after_note_id)
+    analyzed_count = checkpoint.get('analyzed_count', 0)
+    
+    if last_note_id:
+        logger.info(f"Resuming analysis for user {user_id} after note {last_note_id}")
     
-    # Ждем завершения всех задач
-    results = result.get(timeout=300)  # 5 минут таймаут
+    analyzer = BatchNoteAnalyzer(NoteAnalyzer(get_openai_client()))
     
-    successful = [r for r in results if r.get('note_id')]
-    failed = len(results) - len(successful)
+    in_range = [Note.user_id == user_id]
+    if up_to_note_id is not None:
+        in_range.append(Note.id <= up_to_note_id)
+    
+    async with AsyncSessionLocal() as db:
+        total = await db.scalar(
+            select(func.count(Note.id)).where(*in_range, Note.id > after_note_id)
+        )
+        
+        while True:
+            result = await db.execute(
+                select(Note)
+                .where(*in_range, Note.id > last_note_id)
+                .order_by(Note.id)
+                .limit(chunk_size)
+            )
+            notes = result.scalars().all()
+            if not notes:
+                break
+            
+            analyses = await analyzer.analyze([(note.id, note.content) for note in notes])
+            for note in notes:
+                _apply_analysis(note, analyses[note.id])
+            
+            await db.commit()
+            await notes_changed(user_id)
+            
+            last_note_id = notes[-1].id
+            analyzed_count += len(notes)
+            
+            await async_cache.set(
+                checkpoint_key,
+                {'last_note_id': last_note_id, 'analyzed_count': analyzed_count},
+                ttl=timedelta(seconds=ANALYZE_ALL_CHECKPOINT_TTL)
+            )
+            task.update_state(task_id=task_id, state='PROGRESS', meta={
+                'user_id': user_id,
+                'analyzed_count': analyzed_count,
+                'total': total,
+                'last_note_id': last_note_id,
+            })
+    
+    await async_cache.delete(checkpoint_key)
     
     return {
-        'total': len(note_ids),
-        'successful': len(successful),
-        'failed': failed,
-        'results': successful,
+        'success': True,
+        'user_id': user_id,
+        'analyzed_count': analyzed_count,
+        'total': total,
     }
 
 
+@shared_task(bind=True, name='tasks.ai_tasks.index_note_async')
+def index_note_async(self, note_id: int, user_id: int) -> Dict[str, Any]:
+    """
+    Обновление вектора заметки в семантическом индексе пользователя
+    """
+    try:
+        return run_async(_index_note_async(note_id, user_id))
+    except Exception as e:
+        logger.error(f"Error indexing note {note_id}: {str(e)}")
+        raise self.retry(exc=e, countdown=60, max_retries=2)
+
+
+async def _index_note_async(note_id: int, user_id: int) -> Dict[str, Any]:
+    """Внутренняя функция индексации заметки"""
+    async with AsyncSessionLocal() as db:
+        from sqlalchemy import select
+        result = await db.execute(
+            select(Note.content).where(Note.id == note_id, Note.user_id == user_id)
+        )
+        content = result.scalar_one_or_none()
+    
+    if content is None:
+        await semantic_index.remove(user_id, note_id)
+        return {'note_id': note_id, 'indexed': False}
+    
+    await semantic_index.upsert(user_id, note_id, content)
+    return {'note_id': note_id, 'indexed': True}
+
+
+@shared_task(name='tasks.ai_tasks.rebuild_semantic_index')
+def rebuild_semantic_index(user_id: int, chunk_size: int = 100, after_note_id: int = 0) -> Dict[str, Any]:
+    """
+    Полное построение семантического индекса пользователя
+    (для заметок, созданных до появления индекса) или индексация
+    заметок с ID больше after_note_id (после импорта)
+    """
+    logger.info(f"Rebuilding semantic index for user {user_id}")
+    
+    return run_async(_rebuild_semantic_index(user_id, chunk_size, after_note_id))
+
+
+async def _rebuild_semantic_index(user_id: int, chunk_size: int, after_note_id: int = 0) -> Dict[str, Any]:
+    """Внутренняя функция построения индекса"""
+    from sqlalchemy import select
+    
+    indexed = 0
+    last_note_id = after_note_id
+    async with AsyncSessionLocal() as db:
+        while True:
+            result = await db.execute(
+                select(Note.id, Note.content)
+                .where(Note.user_id == user_id, Note.id > last_note_id)
+                .order_by(Note.id)
+                .limit(chunk_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+            
+            await semantic_index.upsert_many(user_id, [(row.id, row.content) for row in rows])
+            indexed += len(rows)
+            last_note_id = rows[-1].id
+    
+    return {'user_id': user_id, 'indexed': indexed}
+
+
 @shared_task(name='tasks.ai_tasks.generate_summary_async')
 def generate_summary_async(content: str, max_length: int = 150) -> str:
     """
     Генерация резюме с кешированием
     """
     # Проверяем кеш
-    cache_key = get_cache_key(f"summary:{max_length}", content)
-    cached = redis_client.get(cache_key)
+    cache_key = ai_cache_key(
+        "summary", content, prompt_version(SUMMARY_PROMPT), SUMMARY_MODEL, max_length
+    )
+    cached = cache.get(cache_key)
     if cached:
         return cached
     
     try:
         # Оптимизированный промпт для быстрой генерации
-        prompt = f"""Summarize this text in {max_length} characters or less. Be concise and capture key points:
-
-{content[:1000]}...
-
-Summary:"""
+        prompt = SUMMARY_PROMPT.format(max_length=max_length, content=content[:1000])
         
         response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",  # Используем более быструю модель
+            model=SUMMARY_MODEL,  # Используем более быструю модель
             messages=[{"role": "user", "content": prompt}],
             max_tokens=100,
             temperature=0.3,
@@ -173,13 +429,13 @@ Summary:"""
         summary = response.choices[0].message.content.strip()
         
         # Сохраняем в кеш
-        redis_client.setex(cache_key, CACHE_TTL, summary)
+        cache.set(cache_key, summary, ttl=ANALYSIS_CACHE_TTL)
         
         return summary
         
     except Exception as e:
         logger.error(f"Error generating summary: {str(e)}")
-        # Возвращаем простое резюме при ошибке
+        # Возвращаем простое резюме при ошибке (не кешируется)
         return content[:max_length] + "..." if len(content) > max_length else content
 
 
@@ -189,27 +445,21 @@ def categorize_note_async(content: str) -> str:
     Быстрая категоризация заметки с использованием кеша
     """
     # Проверяем кеш
-    cache_key = get_cache_key("category", content)
-    cached = redis_client.get(cache_key)
+    cache_key = ai_cache_key(
+        "category",
+        content,
+        prompt_version(json.dumps(KEYWORD_CATEGORIES, ensure_ascii=False, sort_keys=True)),
+        KEYWORD_CATEGORIZATION
+    )
+    cached = cache.get(cache_key)
     if cached:
         return cached
     
     # Быстрая категоризация по ключевым словам
-    categories = {
-        'Work': ['работа', 'проект', 'задача', 'встреча', 'дедлайн', 'коллега'],
-        'Learning': ['учеба', 'курс', 'книга', 'изучить', 'обучение', 'урок'],
-        'Personal': ['личное', 'семья', 'друзья', 'дом', 'хобби', 'отдых'],
-        'Finance': ['деньги', 'бюджет', 'расход', 'доход', 'инвестиции', 'счет'],
-        'Health': ['здоровье', 'врач', 'лекарство', 'спорт', 'диета', 'сон'],
-        'Idea': ['идея', 'мысль', 'концепция', 'план', 'стартап', 'бизнес'],
-        'Travel': ['путешествие', 'поездка', 'отпуск', 'билет', 'отель'],
-        'Shopping': ['купить', 'покупка', 'магазин', 'заказ', 'товар'],
-    }
-    
     content_lower = content.lower()
     scores = {}
     
-    for category, keywords in categories.items():
+    for category, keywords in KEYWORD_CATEGORIES.items():
         score = sum(1 for keyword in keywords if keyword in content_lower)
         if score > 0:
             scores[category] = score
@@ -220,7 +470,7 @@ def categorize_note_async(content: str) -> str:
         category = 'General'
     
     # Сохраняем в кеш
-    redis_client.setex(cache_key, CACHE_TTL, category)
+    cache.set(cache_key, category, ttl=ANALYSIS_CACHE_TTL)
     
     return category
 
@@ -232,7 +482,7 @@ def analyze_unprocessed_notes() -> Dict[str, Any]:
     """
     logger.info("Starting analysis of unprocessed notes")
     
-    result = asyncio.run(_analyze_unprocessed_notes())
+    result = run_async(_analyze_unprocessed_notes())
     
     logger.info(f"Analyzed {result['processed']} unprocessed notes")
     return result
@@ -287,7 +537,7 @@ def optimize_note_content(note_id: int, user_id: int) -> Dict[str, Any]:
     try:
         logger.info(f"Optimizing note {note_id} content")
         
-        result = asyncio.run(_optimize_note_content(note_id, user_id))
+        result = run_async(_optimize_note_content(note_id, user_id))
         
         return result
         
@@ -329,6 +579,8 @@ async def _optimize_note_content(note_id: int, user_id: int) -> Dict[str, Any]:
             note.content = optimized_content
             note.updated_at = datetime.utcnow()
             await db.commit()
+            await notes_changed(user_id)
+            schedule_note_indexing(note_id, user_id)
             
             return {
                 'note_id': note_id,
@@ -1,20 +1,19 @@
+import asyncio
 from celery import shared_task
 from celery.utils.log import get_task_logger
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
-from typing import Dict, Any, List
-import asyncio
+from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
+from sqlalchemy import select
 
-from database import ASYNC_DATABASE_URL
-from models import Note, User, GoogleToken
+from config import settings
+from database import AsyncSessionLocal
+from tasks.runtime import run_async
+from models import Note, User, GoogleToken, NoteCalendarEvent
+from google_calendar.rate_limit import AsyncRateLimiter
+from google_calendar.sync import sync_user_calendars
 
 logger = get_task_logger(__name__)
 
-# Создаем асинхронный движок
-engine = create_async_engine(ASYNC_DATABASE_URL, echo=False)
-AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-
 
 @shared_task(name='tasks.calendar_tasks.sync_calendar_async')
 def sync_calendar_async(user_id: int) -> Dict[str, Any]:
@@ -24,7 +23,7 @@ def sync_calendar_async(user_id: int) -> Dict[str, Any]:
     try:
         logger.info(f"Syncing calendar for user {user_id}")
         
-        result = asyncio.run(_sync_calendar_async(user_id))
+        result = run_async(_sync_calendar_async(user_id))
         
         logger.info(f"Calendar synced: {result['events_synced']} events")
         return result
@@ -34,44 +33,10 @@ def sync_calendar_async(user_id: int) -> Dict[str, Any]:
         raise
 
 
-async def _sync_calendar_async(user_id: int) -> Dict[str, Any]:
+async def _sync_calendar_async(user_id: int, limiter: Optional[AsyncRateLimiter] = None) -> Dict[str, Any]:
     """Внутренняя функция синхронизации календаря"""
     async with AsyncSessionLocal() as db:
-        # Проверяем, есть ли у пользователя токен Google
-        from sqlalchemy import select
-        query = select(GoogleToken).where(GoogleToken.user_id == user_id)
-        result = await db.execute(query)
-        token = result.scalar_one_or_none()
-        
-        if not token:
-            return {
-                'success': False,
-                'message': 'Google calendar not connected',
-                'events_synced': 0,
-            }
-        
-        # Здесь будет логика синхронизации с Google Calendar API
-        # Пока заглушка
-        events_synced = 0
-        
-        # Получаем заметки с событиями
-        query = select(Note).where(
-            Note.user_id == user_id,
-            Note.tags.contains(['event'])
-        ).limit(20)
-        
-        result = await db.execute(query)
-        notes = result.scalars().all()
-        
-        for note in notes:
-            # Здесь будет создание события в календаре
-            events_synced += 1
-        
-        return {
-            'success': True,
-            'events_synced': events_synced,
-            'total_notes': len(notes),
-        }
+        return await sync_user_calendars(db, user_id, limiter)
 
 
 @shared_task(name='tasks.calendar_tasks.sync_all_calendars')
@@ -81,37 +46,52 @@ def sync_all_calendars() -> Dict[str, Any]:
     """
     logger.info("Starting sync for all calendars")
     
-    result = asyncio.run(_sync_all_calendars())
+    result = run_async(_sync_all_calendars())
     
-    logger.info(f"Synced {result['users_synced']} user calendars")
+    logger.info(
+        f"Synced {result['users_synced']} user calendars, "
+        f"{result['events_synced']} events changed"
+    )
     return result
 
 
 async def _sync_all_calendars() -> Dict[str, Any]:
-    """Внутренняя функция для синхронизации всех календарей"""
+    """
+    Внутренняя функция для синхронизации всех календарей: пользователи
+    обрабатываются параллельно (не больше GOOGLE_SYNC_CONCURRENCY),
+    запросы к Google идут через общий ограничитель частоты
+    """
     async with AsyncSessionLocal() as db:
-        # Получаем пользователей с подключенным Google
-        from sqlalchemy import select
-        query = select(GoogleToken.user_id).distinct()
+        # Пользователи с подключенным Google и событиями заметок
+        query = (
+            select(GoogleToken.user_id)
+            .join(Note, Note.user_id == GoogleToken.user_id)
+            .join(NoteCalendarEvent, NoteCalendarEvent.note_id == Note.id)
+            .distinct()
+        )
         result = await db.execute(query)
         user_ids = result.scalars().all()
-        
-        synced = 0
-        failed = 0
-        
-        for user_id in user_ids:
+    
+    limiter = AsyncRateLimiter(settings.GOOGLE_SYNC_RATE_LIMIT)
+    semaphore = asyncio.Semaphore(settings.GOOGLE_SYNC_CONCURRENCY)
+    
+    async def sync_user(user_id: int) -> Optional[Dict[str, Any]]:
+        async with semaphore:
             try:
-                sync_calendar_async.delay(user_id)
-                synced += 1
+                return await _sync_calendar_async(user_id, limiter)
             except Exception as e:
                 logger.error(f"Failed to sync calendar for user {user_id}: {str(e)}")
-                failed += 1
-        
-        return {
-            'users_synced': synced,
-            'users_failed': failed,
-            'total_users': len(user_ids),
-        }
+                return None
+    
+    results = await asyncio.gather(*(sync_user(user_id) for user_id in user_ids))
+    synced = [result for result in results if result and result['success']]
+    
+    return {
+        'users_synced': len(synced),
+        'users_failed': len(results) - len(synced),
+        'total_users': len(user_ids),
+        'events_synced': sum(result['events_synced'] for result in synced),
+    }
 
 
 @shared_task(name='tasks.calendar_tasks.create_calendar_event')
@@ -122,7 +102,7 @@ def create_calendar_event(note_id: int, user_id: int) -> Dict[str, Any]:
     try:
         logger.info(f"Creating calendar event from note {note_id}")
         
-        result = asyncio.run(_create_calendar_event(note_id, user_id))
+        result = run_async(_create_calendar_event(note_id, user_id))
         
         return result
         
@@ -179,7 +159,7 @@ def remind_upcoming_events() -> Dict[str, Any]:
     """
     logger.info("Checking for upcoming events")
     
-    result = asyncio.run(_remind_upcoming_events())
+    result = run_async(_remind_upcoming_events())
     
     logger.info(f"Sent {result['reminders_sent']} reminders")
     return result
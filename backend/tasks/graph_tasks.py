@@ -0,0 +1,84 @@
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from typing import Dict, Any
+from sqlalchemy import or_, select
+
+from database import AsyncSessionLocal
+from tasks.runtime import run_async
+from models import GraphAnalytics, GraphVersion
+from notes.analytics import get_schedule_key, refresh_graph_analytics
+from redis_config import redis_cache_async
+
+logger = get_task_logger(__name__)
+
+
+@shared_task(name='tasks.graph_tasks.compute_graph_analytics')
+def compute_graph_analytics(user_id: int) -> Dict[str, Any]:
+    """
+    Пересчет аналитики графа заметок пользователя: PageRank, компоненты
+    связности и сообщества по note_connections
+    """
+    try:
+        logger.info(f"Computing graph analytics for user {user_id}")
+
+        result = run_async(_compute_graph_analytics(user_id))
+
+        logger.info(
+            f"Graph analytics for user {user_id}: {result['nodes']} notes, "
+            f"{result['communities']} communities"
+        )
+        return result
+
+    except Exception as e:
+        logger.error(f"Error computing graph analytics: {str(e)}")
+        raise
+
+
+async def _compute_graph_analytics(user_id: int) -> Dict[str, Any]:
+    """Внутренняя функция пересчета аналитики графа"""
+    # Снимаем отметку до чтения графа: изменения во время расчета поставят новый пересчет
+    await redis_cache_async.delete(get_schedule_key(user_id))
+    async with AsyncSessionLocal() as db:
+        analytics = await refresh_graph_analytics(db, user_id)
+    return {
+        'success': True,
+        'user_id': user_id,
+        'graph_version': analytics.graph_version,
+        'nodes': analytics.nodes,
+        'edges': analytics.edges,
+        'components': analytics.components,
+        'communities': analytics.communities,
+        'modularity': analytics.modularity,
+    }
+
+
+@shared_task(name='tasks.graph_tasks.refresh_stale_graph_analytics')
+def refresh_stale_graph_analytics() -> Dict[str, Any]:
+    """
+    Периодическая задача: поставить в очередь пересчет для пользователей,
+    граф которых изменился после последнего расчета
+    """
+    user_ids = run_async(_stale_graph_users())
+
+    for user_id in user_ids:
+        compute_graph_analytics.delay(user_id)
+
+    logger.info(f"Scheduled graph analytics for {len(user_ids)} users")
+    return {
+        'success': True,
+        'users_scheduled': len(user_ids),
+    }
+
+
+async def _stale_graph_users() -> list:
+    """Пользователи, у которых версия графа больше версии последнего расчета"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(GraphVersion.user_id)
+            .outerjoin(GraphAnalytics, GraphAnalytics.user_id == GraphVersion.user_id)
+            .where(or_(
+                GraphAnalytics.user_id.is_(None),
+                GraphAnalytics.graph_version < GraphVersion.version
+            ))
+        )
+        return list(result.scalars().all())
@@ -2,12 +2,13 @@ from celery import shared_task
 from celery.utils.log import get_task_logger
 from datetime import datetime, timedelta
 from typing import Dict, Any
-import redis
+from sqlalchemy import text
 
-logger = get_task_logger(__name__)
+from config import settings
+from database import engine, get_pool_stats
+from redis_config import cache, redis_celery
 
-# Redis клиент
-redis_client = redis.Redis(host='redis', port=6379, db=0, decode_responses=True)
+logger = get_task_logger(__name__)
 
 
 @shared_task(name='tasks.maintenance.cleanup_old_results')
@@ -32,12 +33,15 @@ def cleanup_old_results() -> Dict[str, Any]:
 @shared_task(name='tasks.maintenance.cleanup_redis_cache')
 def cleanup_redis_cache() -> Dict[str, Any]:
     """
-    Очистка истекшего кеша Redis
+    Очистка кеша Redis (DB кеша, не брокера).
+    Ключи обходятся через SCAN и удаляются UNLINK пачками,
+    поэтому очистка не блокирует Redis для API и брокера Celery.
     """
     logger.info("Starting Redis cache cleanup")
     
     # Redis автоматически удаляет истекшие ключи
-    # Но мы можем принудительно очистить некоторые паттерны
+    # Но мы можем принудительно очистить некоторые паттерны:
+    # ключи AI кеша в старом формате (до aicache:*)
     
     deleted = 0
     patterns = [
@@ -47,15 +51,17 @@ def cleanup_redis_cache() -> Dict[str, Any]:
     ]
     
     for pattern in patterns:
-        keys = redis_client.keys(pattern)
-        if keys:
-            deleted += redis_client.delete(*keys)
+        deleted += cache.clear_pattern(pattern)
+    
+    # Истекшие ключи остаются в индексах пользователей до очистки
+    pruned = cache.prune_user_indexes()
     
-    logger.info(f"Deleted {deleted} cache keys")
+    logger.info(f"Deleted {deleted} cache keys, pruned {pruned} index entries")
     
     return {
         'success': True,
         'keys_deleted': deleted,
+        'index_entries_pruned': pruned,
     }
 
 
@@ -74,17 +80,13 @@ def health_check() -> Dict[str, Any]:
     
     # Проверка Redis
     try:
-        redis_client.ping()
+        redis_celery.ping()
         checks['redis'] = True
     except Exception as e:
         logger.error(f"Redis health check failed: {str(e)}")
     
     # Проверка базы данных
     try:
-        from database import DATABASE_URL
-        from sqlalchemy import create_engine, text
-        
-        engine = create_engine(DATABASE_URL)
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
         checks['database'] = True
@@ -96,6 +98,7 @@ def health_check() -> Dict[str, Any]:
     return {
         'healthy': all_healthy,
         'checks': checks,
+        'db_pool': get_pool_stats(),
         'timestamp': datetime.utcnow().isoformat(),
     }
 
@@ -108,12 +111,8 @@ def optimize_database() -> Dict[str, Any]:
     logger.info("Starting database optimization")
     
     try:
-        from database import DATABASE_URL
-        from sqlalchemy import create_engine, text
-        
-        engine = create_engine(DATABASE_URL)
-        
-        with engine.connect() as conn:
+        # VACUUM не выполняется внутри транзакции
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
             # Анализ таблиц для оптимизации запросов
             tables = ['notes', 'users', 'note_connections']
             
@@ -139,6 +138,45 @@ def optimize_database() -> Dict[str, Any]:
         }
 
 
+@shared_task(name='tasks.maintenance.prune_graph_changes')
+def prune_graph_changes() -> Dict[str, Any]:
+    """
+    Очистка журнала изменений графа заметок старше GRAPH_CHANGES_RETENTION_DAYS.
+    Для пользователей запоминается последняя удаленная версия: клиенты с более
+    старой версией получат полный снимок графа вместо изменений.
+    """
+    cutoff_time = datetime.utcnow() - timedelta(days=settings.GRAPH_CHANGES_RETENTION_DAYS)
+    logger.info(f"Pruning graph changes before {cutoff_time.isoformat()}")
+    
+    with engine.begin() as conn:
+        result = conn.execute(text("""
+            WITH pruned AS (
+                DELETE FROM graph_changes
+                WHERE created_at < :cutoff
+                RETURNING user_id, version
+            ), horizons AS (
+                SELECT user_id, max(version) AS version, count(*) AS changes
+                FROM pruned
+                GROUP BY user_id
+            ), updated AS (
+                UPDATE graph_versions gv
+                SET pruned_version = horizons.version
+                FROM horizons
+                WHERE gv.user_id = horizons.user_id AND gv.pruned_version < horizons.version
+            )
+            SELECT coalesce(sum(changes), 0), count(*) FROM horizons
+        """), {"cutoff": cutoff_time})
+        deleted, users = result.one()
+    
+    logger.info(f"Pruned {deleted} graph changes for {users} users")
+    return {
+        'success': True,
+        'changes_deleted': int(deleted),
+        'users': users,
+        'cleaned_before': cutoff_time.isoformat(),
+    }
+
+
 @shared_task(name='tasks.maintenance.generate_statistics')
 def generate_statistics() -> Dict[str, Any]:
     """
@@ -147,11 +185,6 @@ def generate_statistics() -> Dict[str, Any]:
     logger.info("Generating usage statistics")
     
     try:
-        from database import DATABASE_URL
-        from sqlalchemy import create_engine, text
-        
-        engine = create_engine(DATABASE_URL)
-        
         stats = {}
         
         with engine.connect() as conn:
@@ -1,22 +1,17 @@
 from celery import shared_task
 from celery.utils.log import get_task_logger
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
 from typing import Dict, Any, Optional
-import asyncio
 import os
 
-from database import ASYNC_DATABASE_URL
+from database import AsyncSessionLocal
+from tasks.runtime import run_async
 from models import Note, User
 from notes.schemas import NoteCreate, NoteUpdate
 from notes import crud as notes_crud
+from notes import bulk_import
 
 logger = get_task_logger(__name__)
 
-# Создаем асинхронный движок для Celery задач
-engine = create_async_engine(ASYNC_DATABASE_URL, echo=False)
-AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
-
 
 async def get_db():
     """Получение сессии БД для Celery задач"""
@@ -36,7 +31,7 @@ def create_note_async(self, note_data: Dict[str, Any], user_id: int) -> Dict[str
         logger.info(f"Creating note for user {user_id}")
         
         # Запускаем асинхронную функцию в синхронном контексте
-        result = asyncio.run(_create_note_async(note_data, user_id))
+        result = run_async(_create_note_async(note_data, user_id))
         
         logger.info(f"Note created successfully: {result['id']}")
         return result
@@ -74,7 +69,7 @@ def update_note_async(self, note_id: int, note_data: Dict[str, Any], user_id: in
     try:
         logger.info(f"Updating note {note_id} for user {user_id}")
         
-        result = asyncio.run(_update_note_async(note_id, note_data, user_id))
+        result = run_async(_update_note_async(note_id, note_data, user_id))
         
         logger.info(f"Note updated successfully: {note_id}")
         return result
@@ -114,7 +109,7 @@ def delete_note_async(self, note_id: int, user_id: int) -> Dict[str, Any]:
     try:
         logger.info(f"Deleting note {note_id} for user {user_id}")
         
-        result = asyncio.run(_delete_note_async(note_id, user_id))
+        result = run_async(_delete_note_async(note_id, user_id))
         
         logger.info(f"Note deleted successfully: {note_id}")
         return result
@@ -142,28 +137,47 @@ async def _delete_note_async(note_id: int, user_id: int) -> Dict[str, Any]:
 @shared_task(name='tasks.note_tasks.batch_create_notes')
 def batch_create_notes(notes_data: list[Dict[str, Any]], user_id: int) -> Dict[str, Any]:
     """
-    Пакетное создание заметок
+    Пакетное создание заметок: многострочные INSERT пачками в одной сессии,
+    анализ и индексация созданных заметок - одной задачей на весь пакет
     """
     logger.info(f"Batch creating {len(notes_data)} notes for user {user_id}")
     
-    created_notes = []
-    failed_notes = []
+    result = run_async(_batch_create_notes(notes_data, user_id))
     
-    for note_data in notes_data:
-        try:
-            result = create_note_async(note_data, user_id)
-            created_notes.append(result)
-        except Exception as e:
-            logger.error(f"Failed to create note: {str(e)}")
-            failed_notes.append({
-                'data': note_data,
-                'error': str(e)
-            })
+    logger.info(f"Batch created {result['created']} notes, {result['failed']} failed")
+    return result
+
+
+async def _batch_create_notes(notes_data: list[Dict[str, Any]], user_id: int) -> Dict[str, Any]:
+    """Внутренняя функция пакетного создания заметок"""
+    async with AsyncSessionLocal() as db:
+        summary = await bulk_import.import_notes(
+            db, bulk_import.iter_records(notes_data), user_id,
+            collect_created=True, max_errors=None
+        )
+    
+    if summary['imported']:
+        bulk_import.schedule_imported_notes(user_id, summary['first_note_id'], summary['last_note_id'])
+    
+    # Не прошедшие проверку и пропущенные из-за занятого заголовка
+    failed_notes = [
+        {'data': notes_data[error['index']], 'error': error['error']}
+        for error in summary['errors']
+    ]
     
     return {
-        'created': len(created_notes),
-        'failed': len(failed_notes),
-        'created_notes': created_notes,
+        'created': summary['imported'],
+        'failed': summary['failed'] + summary['skipped'],
+        'created_notes': [
+            {
+                'id': note.id,
+                'title': note.title,
+                'content': note.content,
+                'created_at': note.created_at.isoformat() if note.created_at else None,
+                'updated_at': note.updated_at.isoformat() if note.updated_at else None,
+            }
+            for note in summary['created_notes']
+        ],
         'failed_notes': failed_notes,
     }
 
@@ -176,7 +190,7 @@ def sync_notes_with_calendar(user_id: int) -> Dict[str, Any]:
     try:
         logger.info(f"Syncing notes with calendar for user {user_id}")
         
-        result = asyncio.run(_sync_notes_with_calendar(user_id))
+        result = run_async(_sync_notes_with_calendar(user_id))
         
         logger.info(f"Sync completed: {result['synced']} notes")
         return result
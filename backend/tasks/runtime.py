@@ -0,0 +1,96 @@
+import asyncio
+import os
+import threading
+from typing import Any, Coroutine, Optional
+
+import openai
+
+from config import settings
+from database import async_engine
+from redis_config import async_cache_pool
+from google_calendar.client import calendar_client
+
+# Один event loop на процесс воркера: асинхронные тела задач выполняются на нем,
+# поэтому соединения пула asyncpg и HTTP-клиент OpenAI переиспользуются между задачами
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_pid: Optional[int] = None
+_openai_client: Optional[openai.AsyncOpenAI] = None
+_lock = threading.Lock()
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """Event loop текущего процесса (создается при первом обращении и после fork)"""
+    global _loop, _thread, _pid, _openai_client
+    with _lock:
+        if _loop is None or _loop.is_closed() or _pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(
+                target=_loop.run_forever,
+                name="worker-event-loop",
+                daemon=True
+            )
+            _thread.start()
+            _pid = os.getpid()
+            # Клиент привязан к loop через пул соединений httpx
+            _openai_client = None
+        return _loop
+
+
+def run_async(coro: Coroutine[Any, Any, Any]) -> Any:
+    """
+    Выполнить корутину на event loop воркера и дождаться результата.
+    Замена asyncio.run в синхронных телах Celery задач.
+    """
+    loop = get_worker_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_async нельзя вызывать из event loop воркера, используйте await")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def get_openai_client() -> openai.AsyncOpenAI:
+    """Общий для задач процесса клиент OpenAI"""
+    global _openai_client
+    get_worker_loop()
+    with _lock:
+        if _openai_client is None:
+            _openai_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        return _openai_client
+
+
+def reset_worker_loop() -> None:
+    """Забыть loop родительского процесса (вызывается в дочернем процессе после fork)"""
+    global _loop, _thread, _pid, _openai_client
+    with _lock:
+        _loop = _thread = _pid = _openai_client = None
+
+
+def shutdown_worker_loop() -> None:
+    """Закрыть соединения и остановить loop при завершении процесса воркера"""
+    global _loop, _thread, _pid, _openai_client
+    with _lock:
+        loop, thread = _loop, _thread
+        if loop is None or loop.is_closed() or _pid != os.getpid():
+            return
+
+    async def _close():
+        if _openai_client is not None:
+            await _openai_client.close()
+        await async_engine.dispose()
+        await async_cache_pool.disconnect()
+        await calendar_client.aclose()
+
+    try:
+        asyncio.run_coroutine_threadsafe(_close(), loop).result(timeout=10)
+    except Exception as e:
+        print(f"Ошибка закрытия соединений воркера: {e}")
+
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=10)
+    loop.close()
+    reset_worker_loop()
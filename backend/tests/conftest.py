@@ -0,0 +1,43 @@
+import os
+import sys
+from pathlib import Path
+
+import fakeredis
+import pytest
+
+# Модули backend импортируются как пакеты верхнего уровня (как в main.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Настройки без .env: значения-заглушки, к внешним сервисам тесты не обращаются
+for name, value in {
+    "SECRET_KEY": "test",
+    "GOOGLE_CLIENT_ID": "test",
+    "GOOGLE_CLIENT_SECRET": "test",
+    "GOOGLE_REDIRECT_URI": "http://localhost/callback",
+    "OPENAI_API_KEY": "test",
+    "REDIS_URL": "redis://localhost:6379/0",
+    "POSTGRES_USER": "test",
+    "POSTGRES_PASSWORD": "test",
+    "POSTGRES_DB": "test",
+    "POSTGRES_HOST": "localhost",
+    "SEMANTIC_EMBEDDER": "hashing",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """
+    Асинхронный Redis кеша на fakeredis: подменяет redis_cache_async во всех
+    импортированных модулях и клиент async_cache (и кешей поверх него)
+    """
+    import redis_config
+
+    # Свой сервер на каждый тест: данные тестов не пересекаются
+    client = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    original = redis_config.redis_cache_async
+    for module in list(sys.modules.values()):
+        if vars(module).get("redis_cache_async", None) is original:
+            monkeypatch.setattr(module, "redis_cache_async", client)
+    monkeypatch.setattr(redis_config.async_cache, "client", client)
+    return client
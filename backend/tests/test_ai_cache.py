@@ -0,0 +1,41 @@
+from ai_agent import ai_cache
+from ai_agent.ai_cache import agent_prompt_version, ai_cache_key, analysis_cache_key, prompt_version
+from ai_agent.prompts import AGENT_PROMPTS
+
+
+def test_prompt_version_depends_on_template_text():
+    assert prompt_version("a", "b") == prompt_version("a", "b")
+    assert prompt_version("a", "b") != prompt_version("a", "b ")
+    # Разделитель не дает склеить шаблоны в одинаковую строку
+    assert prompt_version("ab", "c") != prompt_version("a", "bc")
+    assert len(prompt_version("a")) == 10
+
+
+def test_ai_cache_key_layout():
+    key = ai_cache_key("summary", "текст", "v123", "gpt-4o-mini", 150)
+    prefix, schema, kind, model, version, param, digest = key.split(":")
+
+    assert (prefix, schema, kind, model, version, param) == (
+        ai_cache.AI_CACHE_PREFIX, ai_cache.AI_CACHE_SCHEMA, "summary", "gpt-4o-mini", "v123", "150"
+    )
+    assert digest == ai_cache.content_hash("текст")
+
+
+def test_ai_cache_key_changes_with_each_component():
+    base = ai_cache_key("summary", "текст", "v1", "model", 150)
+
+    assert ai_cache_key("summary", "текст", "v1", "model", 150) == base
+    assert ai_cache_key("category", "текст", "v1", "model", 150) != base
+    assert ai_cache_key("summary", "другой", "v1", "model", 150) != base
+    assert ai_cache_key("summary", "текст", "v2", "model", 150) != base
+    assert ai_cache_key("summary", "текст", "v1", "other", 150) != base
+    assert ai_cache_key("summary", "текст", "v1", "model", 100) != base
+
+
+def test_full_and_batch_analysis_share_cache_entries():
+    version = agent_prompt_version(*ai_cache.ANALYSIS_PROMPTS)
+
+    assert version == prompt_version(*(AGENT_PROMPTS[name] for name in ai_cache.ANALYSIS_PROMPTS))
+    assert analysis_cache_key("заметка") == ai_cache_key(
+        "analysis", "заметка", version, ai_cache.ANALYSIS_MODEL
+    )
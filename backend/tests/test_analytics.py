@@ -0,0 +1,57 @@
+import numpy as np
+
+from notes.analytics import analyze_graph, build_adjacency
+
+
+def ids(*values):
+    return np.array(values, dtype=np.int64)
+
+
+def test_adjacency_is_symmetric_and_drops_loops_and_unknown_notes():
+    # 10-20 дважды (разные relation), петля 30-30 и связь с чужой заметкой 99
+    adjacency = build_adjacency(ids(10, 20, 30), ids(10, 20, 30, 10, 10), ids(20, 10, 30, 99, 30))
+
+    dense = adjacency.toarray()
+    assert (dense == dense.T).all()
+    # Несколько связей пары складываются в вес
+    assert dense[0, 1] == 2
+    assert dense[0, 2] == 1
+    assert dense[2, 2] == 0
+    assert adjacency.nnz == 4
+
+
+def test_two_cliques_form_two_communities():
+    # Две клики по 4 заметки, соединенные одним мостом 4 - 5
+    left, right = [1, 2, 3, 4], [5, 6, 7, 8]
+    edges = [(a, b) for group in (left, right) for i, a in enumerate(group) for b in group[i + 1:]]
+    edges.append((4, 5))
+    sources, targets = (ids(*column) for column in zip(*edges))
+
+    metrics = analyze_graph(ids(*left, *right, 9), sources, targets)
+
+    community = dict(zip(metrics["note_ids"].tolist(), metrics["community"].tolist()))
+    assert len({community[note] for note in left}) == 1
+    assert len({community[note] for note in right}) == 1
+    assert community[1] != community[5]
+    assert community[9] not in (community[1], community[5])
+
+    component = dict(zip(metrics["note_ids"].tolist(), metrics["component"].tolist()))
+    # Компоненты нумеруются по убыванию размера: связная часть - 0, одиночная заметка - 1
+    assert component[1] == component[8] == 0
+    assert component[9] == 1
+
+    assert metrics["edges"] == 13
+    assert metrics["modularity"] > 0.3
+    assert np.isclose(metrics["centrality"].sum(), 1.0)
+    # Концы моста - самые центральные заметки
+    top = set(metrics["note_ids"][np.argsort(-metrics["centrality"])[:2]].tolist())
+    assert top == {4, 5}
+    assert dict(zip(metrics["note_ids"].tolist(), metrics["degree"].tolist()))[4] == 4
+
+
+def test_empty_graph():
+    metrics = analyze_graph(ids(), ids(), ids())
+
+    assert metrics["edges"] == 0
+    assert len(metrics["centrality"]) == 0
+    assert len(metrics["community"]) == 0
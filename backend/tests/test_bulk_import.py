@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from notes import bulk_import
+from notes.bulk_import import CHUNK_ERROR, ImportFormatError, import_notes, iter_json_records, iter_records
+from notes.schemas import NoteImport
+
+
+async def byte_chunks(body, size):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def parse(body, size=3):
+    async def collect():
+        return [record async for record in iter_json_records(byte_chunks(body.encode(), size))]
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_ndjson_and_json_array_give_same_records(size):
+    records = [{"title": "Первая", "content": "текст"}, {"content": "b", "tags": [1, {"x": "]"}]}]
+    ndjson = '{"title": "Первая", "content": "текст"}\n\n{"content": "b", "tags": [1, {"x": "]"}]}'
+    array = ' [ {"title": "Первая", "content": "текст"},\n {"content": "b", "tags": [1, {"x": "]"}]} ] '
+
+    # Размер пачки режет многобайтные символы UTF-8 и элементы массива
+    assert parse(ndjson, size) == records
+    assert parse(array, size) == records
+
+
+def test_broken_ndjson_line_is_reported_and_parsing_continues():
+    records = parse('{"content": "a"}\n{broken\n{"content": "b"}\n')
+
+    assert records[0] == {"content": "a"}
+    assert isinstance(records[1], ImportFormatError)
+    assert records[2] == {"content": "b"}
+
+
+@pytest.mark.parametrize("body", ['[{"content": "a"}', '[{"content": "a"}, {broken}]'])
+def test_broken_json_array_stops_parsing(body):
+    with pytest.raises(ImportFormatError):
+        parse(body)
+
+
+def test_empty_body_has_no_records():
+    assert parse("") == []
+    assert parse("  \n ") == []
+    assert parse("[]") == []
+
+
+class FakeSession:
+    """Сессия, которая возвращает вставленные строки и падает на заданных пачках"""
+
+    def __init__(self, failing_chunks=()):
+        self.failing_chunks = set(failing_chunks)
+        self.chunks = 0
+        self.next_id = 1
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def execute(self, stmt):
+        self.chunks += 1
+        if self.chunks in self.failing_chunks:
+            raise OperationalError("INSERT", {}, Exception("connection lost"))
+        rows = []
+        for params in stmt._multi_values[0]:
+            values = {getattr(key, "key", key): value for key, value in params.items()}
+            rows.append(SimpleNamespace(id=self.next_id, **values))
+            self.next_id += 1
+        return SimpleNamespace(all=lambda: rows)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+
+async def notes_changed(user_id):
+    pass
+
+
+def run_import(monkeypatch, db, records, **kwargs):
+    # Сброс версии кеша заметок обращается к Redis
+    monkeypatch.setattr(bulk_import, "notes_changed", notes_changed)
+    return asyncio.run(import_notes(db, iter_records(records), user_id=1, **kwargs))
+
+
+def test_aware_created_at_is_normalized_to_naive_utc():
+    note = NoteImport.model_validate({"content": "x", "created_at": "2024-01-01T10:00:00+03:00"})
+    assert note.created_at == datetime(2024, 1, 1, 7, 0)
+    assert note.created_at.tzinfo is None
+
+    note = NoteImport.model_validate({"content": "x", "created_at": "2024-01-01T10:00:00Z"})
+    assert note.created_at == datetime(2024, 1, 1, 10, 0)
+
+
+def test_failed_chunk_is_reported_and_import_continues(monkeypatch):
+    db = FakeSession(failing_chunks={2})
+    records = [{"title": f"note {i}", "content": "text"} for i in range(5)]
+
+    summary = run_import(monkeypatch, db, records, chunk_size=2)
+
+    assert summary["received"] == 5
+    assert summary["imported"] == 3
+    assert summary["failed"] == 2
+    assert summary["errors"] == [
+        {"index": 2, "error": CHUNK_ERROR},
+        {"index": 3, "error": CHUNK_ERROR},
+    ]
+    assert db.rollbacks == 1
+    # Диапазон ID для постановки анализа охватывает сохраненные пачки
+    assert (summary["first_note_id"], summary["last_note_id"]) == (1, 3)
+
+
+def test_invalid_records_are_counted_as_failed(monkeypatch):
+    summary = run_import(monkeypatch, FakeSession(), [{"content": "ok"}, {"title": "no content"}, "not an object"])
+
+    assert summary["imported"] == 1
+    assert summary["failed"] == 2
+    assert [error["index"] for error in summary["errors"]] == [1, 2]
@@ -0,0 +1,87 @@
+import asyncio
+
+import httpx
+import pytest
+
+from google_calendar.client import AsyncCalendarClient, GoogleAPIError
+
+
+def make_client(handler):
+    return AsyncCalendarClient(
+        base_url="https://calendar.test/v3",
+        token_uri="https://oauth.test/token",
+        userinfo_url="https://oauth.test/userinfo",
+        transport=httpx.MockTransport(handler)
+    )
+
+
+def test_requests_go_through_transport_with_bearer_token():
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json={"items": [{"id": "primary"}], "nextPageToken": None})
+
+    client = make_client(handler)
+
+    async def run():
+        try:
+            return await client.list_calendars("token-1", max_results=10)
+        finally:
+            await client.aclose()
+
+    result = asyncio.run(run())
+
+    assert result["items"] == [{"id": "primary"}]
+    assert seen[0].url.path == "/v3/users/me/calendarList"
+    assert seen[0].url.params["maxResults"] == "10"
+    # Параметры со значением None не передаются
+    assert "pageToken" not in seen[0].url.params
+    assert seen[0].headers["Authorization"] == "Bearer token-1"
+
+
+def test_error_response_raises_google_api_error():
+    def handler(request):
+        return httpx.Response(404, json={
+            "error": {"message": "Not Found", "errors": [{"reason": "notFound"}]}
+        })
+
+    client = make_client(handler)
+
+    async def run():
+        try:
+            await client.list_calendars("token")
+        finally:
+            await client.aclose()
+
+    with pytest.raises(GoogleAPIError) as error:
+        asyncio.run(run())
+    assert error.value.status_code == 404
+    assert error.value.reason == "notFound"
+
+
+def test_one_http_client_per_event_loop():
+    client = make_client(lambda request: httpx.Response(204))
+
+    async def use():
+        await client.list_calendars("token")
+        first = client._get_client()
+        await client.list_calendars("token")
+        assert client._get_client() is first
+        return first
+
+    loop_a = asyncio.new_event_loop()
+    loop_b = asyncio.new_event_loop()
+    try:
+        http_a = loop_a.run_until_complete(use())
+        http_b = loop_b.run_until_complete(use())
+        # Клиент другого loop не подменяет и не теряет клиент первого
+        assert http_a is not http_b
+        assert loop_a.run_until_complete(use()) is http_a
+
+        loop_a.run_until_complete(client.aclose())
+        assert http_a.is_closed
+        loop_b.run_until_complete(http_b.aclose())
+    finally:
+        loop_a.close()
+        loop_b.close()
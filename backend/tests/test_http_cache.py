@@ -0,0 +1,92 @@
+import pytest
+from starlette.requests import Request
+
+from notes.http_cache import (
+    NotesResponseCache,
+    _etag_matches,
+    bump_notes_version,
+    get_notes_version,
+    get_notes_version_key,
+    notes_changed,
+)
+from redis_config import async_cache
+
+
+def make_request(path="/notes/", query=b""):
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": query, "headers": []})
+
+
+@pytest.mark.asyncio
+async def test_notes_version_grows_on_every_change(fake_redis):
+    first = await get_notes_version(1)
+    assert await get_notes_version(1) == first
+
+    await bump_notes_version(1)
+    second = await get_notes_version(1)
+    assert second == first + 1
+    # Версии пользователей независимы
+    await bump_notes_version(2)
+    assert await get_notes_version(1) == second
+    # Счетчик не живет вечно
+    assert await fake_redis.ttl(get_notes_version_key(1)) > 0
+
+
+@pytest.mark.asyncio
+async def test_bump_without_counter_starts_above_issued_versions(fake_redis):
+    # Счетчик пропал из Redis (истек или сброшен): новая версия не совпадет со старыми ETag
+    old = await get_notes_version(1)
+    await fake_redis.delete(get_notes_version_key(1))
+
+    await bump_notes_version(1)
+    assert await get_notes_version(1) > old
+
+
+@pytest.mark.asyncio
+async def test_notes_changed_invalidates_cached_response_body(fake_redis):
+    version = await get_notes_version(1)
+    cache = NotesResponseCache(make_request(), 1, version)
+    await async_cache.set(cache.body_key, "[]", user_id=1)
+
+    await notes_changed(1)
+
+    fresh = NotesResponseCache(make_request(), 1, await get_notes_version(1))
+    assert fresh.etag != cache.etag
+    assert await async_cache.get(fresh.body_key) is None
+
+
+@pytest.mark.asyncio
+async def test_notes_version_is_none_without_redis(fake_redis):
+    # Сервер fakeredis недоступен - клиент получает ConnectionError
+    fake_redis.connection_pool.connection_kwargs["server"].connected = False
+
+    assert await get_notes_version(1) is None
+    cache = NotesResponseCache(make_request(), 1, None)
+    assert cache.etag is None
+    assert cache.headers == {}
+
+
+def test_etag_and_body_key_follow_version_and_query():
+    cache = NotesResponseCache(make_request(query=b"limit=10&skip=0"), 1, 5)
+    same = NotesResponseCache(make_request(query=b"skip=0&limit=10"), 1, 5)
+    newer = NotesResponseCache(make_request(query=b"limit=10&skip=0"), 1, 6)
+    other_query = NotesResponseCache(make_request(query=b"limit=20&skip=0"), 1, 5)
+    other_path = NotesResponseCache(make_request("/notes/recent", b"limit=10&skip=0"), 1, 5)
+
+    # Порядок параметров не важен
+    assert same.etag == cache.etag and same.body_key == cache.body_key
+    for changed in (newer, other_query, other_path):
+        assert changed.etag != cache.etag
+        assert changed.body_key != cache.body_key
+    assert cache.etag.startswith('W/"5-')
+    assert cache.headers == {"ETag": cache.etag, "Cache-Control": "private, no-cache"}
+
+
+def test_etag_matching():
+    etag = 'W/"5-abc"'
+
+    assert _etag_matches('W/"5-abc"', etag)
+    assert _etag_matches('"5-abc"', etag)
+    assert _etag_matches('"other", W/"5-abc"', etag)
+    assert _etag_matches("*", etag)
+    assert not _etag_matches('W/"6-abc"', etag)
+    assert not _etag_matches(None, etag)
@@ -0,0 +1,44 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from notes.pagination import (
+    InvalidCursorError,
+    decode_cursor,
+    decode_note_cursor,
+    encode_cursor,
+    encode_note_cursor,
+)
+
+
+def test_cursor_round_trip():
+    payload = {"r": 0.125, "id": 42, "text": "заметка"}
+    cursor = encode_cursor(payload)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == payload
+
+
+def test_empty_cursor_is_first_page():
+    assert decode_cursor(None) is None
+    assert decode_cursor("") is None
+    assert decode_note_cursor("") is None
+
+
+def test_note_cursor_round_trip():
+    note = SimpleNamespace(created_at=datetime(2024, 5, 1, 12, 30, 15, 123456), id=7)
+
+    assert decode_note_cursor(encode_note_cursor(note)) == (note.created_at, 7)
+
+
+@pytest.mark.parametrize("cursor", ["not base64!", "e30x", encode_cursor([1, 2])])
+def test_corrupted_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("payload", [{"id": 1}, {"c": "yesterday", "id": 1}, {"c": "2024-01-01T00:00:00", "id": "x"}])
+def test_cursor_of_another_listing_is_rejected(payload):
+    with pytest.raises(InvalidCursorError):
+        decode_note_cursor(encode_cursor(payload))
@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+import pytest
+
+from redis_config import async_cache, get_user_index_key
+
+
+@pytest.mark.asyncio
+async def test_mset_and_mget_round_trip(fake_redis):
+    assert await async_cache.mset({"a": {"x": 1}, "b": [1, 2], "c": "текст"}, ttl=timedelta(minutes=5))
+
+    assert await async_cache.mget(["a", "missing", "b", "c"]) == [{"x": 1}, None, [1, 2], "текст"]
+    # Записи пакета получают TTL
+    assert 0 < await fake_redis.ttl("a") <= 300
+    assert await async_cache.mget([]) == []
+    assert await async_cache.mset({})
+
+
+@pytest.mark.asyncio
+async def test_mget_skips_values_that_are_not_json(fake_redis):
+    await fake_redis.set("broken", "{not json")
+    await async_cache.set("ok", 1)
+
+    assert await async_cache.mget(["broken", "ok"]) == [None, 1]
+
+
+@pytest.mark.asyncio
+async def test_get_or_set_computes_once(fake_redis):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"value": 42}
+
+    assert await async_cache.get_or_set("key", compute) == {"value": 42}
+    assert await async_cache.get_or_set("key", compute) == {"value": 42}
+    # Обычная функция тоже подходит
+    assert await async_cache.get_or_set("sync", lambda: [1]) == [1]
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_clear_pattern_deletes_only_matching_keys(fake_redis):
+    await async_cache.mset({f"notes:{i}": i for i in range(7)})
+    await async_cache.set("other:1", 1)
+
+    assert await async_cache.clear_pattern("notes:*", batch_size=3) == 7
+
+    assert await fake_redis.keys("*") == ["other:1"]
+
+
+@pytest.mark.asyncio
+async def test_clear_user_deletes_indexed_keys(fake_redis):
+    for i in range(5):
+        await async_cache.set(f"user1:{i}", i, user_id=1)
+    await async_cache.set("user2:0", 0, user_id=2)
+
+    assert await async_cache.clear_user(1, batch_size=2) == 5
+
+    assert sorted(await fake_redis.keys("*")) == sorted(["user2:0", get_user_index_key(2)])
+    # Индекса нет - удалять нечего
+    assert await async_cache.clear_user(1) == 0
+
+
+@pytest.mark.asyncio
+async def test_clear_user_keeps_keys_written_during_clearing(fake_redis, monkeypatch):
+    await async_cache.set("old", 1, user_id=1)
+    sscan_iter = fake_redis.sscan_iter
+    claimed = []
+
+    async def sscan_with_concurrent_write(name, **kwargs):
+        # Индекс уже переименован: новая запись попадает в новый индекс
+        claimed.append(name)
+        await async_cache.set("new", 2, user_id=1)
+        async for key in sscan_iter(name, **kwargs):
+            yield key
+
+    monkeypatch.setattr(fake_redis, "sscan_iter", sscan_with_concurrent_write)
+
+    assert await async_cache.clear_user(1) == 1
+
+    assert claimed[0].startswith(f"{get_user_index_key(1)}:clearing:")
+    assert not await fake_redis.exists(claimed[0])
+    assert await async_cache.get("old") is None
+    assert await async_cache.get("new") == 2
+    assert await fake_redis.smembers(get_user_index_key(1)) == {"new"}
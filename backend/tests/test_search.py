@@ -0,0 +1,41 @@
+from sqlalchemy.dialects import postgresql
+
+from notes.search import MAX_QUERY_TERMS, build_tsquery, extract_terms
+
+
+def compile_sql(expression):
+    return str(expression.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_extract_terms_drops_tsquery_operators():
+    assert extract_terms("Привет, МИР! a&b | c:* 'd'") == ["привет", "мир", "a", "b", "c", "d"]
+    assert extract_terms(None) == []
+
+
+def test_extract_terms_is_limited():
+    terms = extract_terms(" ".join(f"w{i}" for i in range(MAX_QUERY_TERMS + 5)))
+    assert len(terms) == MAX_QUERY_TERMS
+    assert terms[-1] == f"w{MAX_QUERY_TERMS - 1}"
+
+
+def test_build_tsquery_returns_none_without_terms():
+    assert build_tsquery("") is None
+    assert build_tsquery("!!! ???") is None
+
+
+def test_build_tsquery_matches_prefix_in_both_languages():
+    sql = compile_sql(build_tsquery("заметка"))
+
+    assert sql.count("to_tsquery") == 2
+    assert "CAST('russian' AS REGCONFIG)" in sql
+    assert "CAST('english' AS REGCONFIG)" in sql
+    assert "'''заметка'':*'" in sql
+    assert "||" in sql
+
+
+def test_build_tsquery_requires_every_term():
+    sql = compile_sql(build_tsquery("first second"))
+
+    assert sql.count("to_tsquery") == 4
+    assert sql.count("&&") == 1
+    assert "'''first'':*'" in sql and "'''second'':*'" in sql
@@ -0,0 +1,67 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from ai_agent.semantic_index import Embedder, HashingEmbedder, _stack_vectors, top_k
+
+
+def embed(embedder, texts):
+    return asyncio.run(embedder.embed(texts))
+
+
+def test_embedder_is_abstract():
+    with pytest.raises(TypeError):
+        Embedder()
+
+
+def test_hashing_embedder_is_deterministic_and_normalized():
+    embedder = HashingEmbedder(dimension=64)
+    first = embed(embedder, ["Купить молоко и хлеб", ""])
+    second = embed(embedder, ["купить МОЛОКО, и хлеб!"])
+
+    assert first.shape == (2, 64)
+    assert first.dtype == np.float32
+    assert np.allclose(np.linalg.norm(first[0]), 1.0)
+    # Пустой текст дает нулевой вектор, а не NaN
+    assert not first[1].any()
+    # Регистр и пунктуация не влияют на вектор
+    assert np.allclose(first[0], second[0])
+    assert embedder.name == "hashing:64"
+
+
+def test_hashing_embedder_ranks_similar_text_first():
+    embedder = HashingEmbedder()
+    notes = [
+        "рецепт борща со свеклой и капустой",
+        "отчет по продажам за третий квартал",
+        "план тренировок в спортзале",
+    ]
+    vectors = embed(embedder, notes)
+    ids = np.array([10, 20, 30], dtype=np.int64)
+    query = embed(embedder, ["продажи за квартал, отчет"])[0]
+
+    result = top_k(ids, vectors, query, k=2)
+
+    assert [note_id for note_id, _ in result][0] == 20
+    assert len(result) == 2
+    assert result[0][1] >= result[1][1]
+
+
+def test_top_k_excludes_ids_and_limits_k():
+    ids = np.array([1, 2, 3], dtype=np.int64)
+    vectors = np.eye(3, dtype=np.float32)
+    query = np.array([1.0, 0.5, 0.0], dtype=np.float32)
+
+    assert top_k(ids, vectors, query, k=10, exclude_ids={1}) == [(2, 0.5), (3, 0.0)]
+    assert top_k(ids, vectors, query, k=5, exclude_ids={1, 2, 3}) == []
+
+
+def test_stack_vectors_round_trips_stored_bytes():
+    vectors = embed(HashingEmbedder(dimension=8), ["первая заметка", "вторая заметка"])
+    rows = [(5, vectors[0].tobytes()), (7, vectors[1].tobytes())]
+
+    ids, stacked = _stack_vectors(rows, 8)
+
+    assert ids.tolist() == [5, 7]
+    assert np.array_equal(stacked, vectors)
@@ -0,0 +1,65 @@
+import pytest
+from fastapi import HTTPException
+
+from notes import router as notes_router
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+async def read_stream(response):
+    return [chunk async for chunk in response.body_iterator]
+
+
+@pytest.mark.asyncio
+async def test_task_owner_is_checked(fake_redis):
+    await notes_router.remember_task_owner("task-1", 7)
+
+    await notes_router._check_task_owner("task-1", 7)
+    assert await fake_redis.ttl(notes_router._task_owner_key("task-1")) > 0
+    for task_id, user_id in (("task-1", 8), ("unknown", 7)):
+        with pytest.raises(HTTPException) as error:
+            await notes_router._check_task_owner(task_id, user_id)
+        assert error.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_stream_of_foreign_task_is_not_found(fake_redis):
+    await notes_router.remember_task_owner("task-1", 7)
+
+    with pytest.raises(HTTPException) as error:
+        await notes_router.stream_task_status("task-1", interval=0.01, current_user=FakeUser(8))
+    assert error.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_stream_ends_on_revoked(fake_redis, monkeypatch):
+    states = iter(["PENDING", "PENDING", "REVOKED"])
+    monkeypatch.setattr(
+        notes_router, "_task_status_payload",
+        lambda task_id: {"status": next(states), "task_id": task_id}
+    )
+    await notes_router.remember_task_owner("task-1", 7)
+
+    response = await notes_router.stream_task_status("task-1", interval=0.01, current_user=FakeUser(7))
+    events = await read_stream(response)
+
+    assert len(events) == 2
+    assert '"REVOKED"' in events[-1]
+
+
+@pytest.mark.asyncio
+async def test_stream_stops_after_max_duration(fake_redis, monkeypatch):
+    monkeypatch.setattr(
+        notes_router, "_task_status_payload",
+        lambda task_id: {"status": "PENDING", "task_id": task_id}
+    )
+    monkeypatch.setattr(notes_router.settings, "TASK_STREAM_MAX_DURATION", 0)
+    await notes_router.remember_task_owner("task-1", 7)
+
+    response = await notes_router.stream_task_status("task-1", interval=0.01, current_user=FakeUser(7))
+    events = await read_stream(response)
+
+    assert events[-1].startswith("event: timeout")
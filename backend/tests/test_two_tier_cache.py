@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from redis_config import TwoTierCache, async_cache
+
+
+async def wait_coalesced(cache, count):
+    """Дождаться, пока count вызовов встанут в ожидание общего вычисления"""
+    while cache.counters["coalesced"] < count:
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def two_tier(fake_redis):
+    return TwoTierCache(async_cache, maxsize=4)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_computation(two_tier):
+    calls = []
+    release = asyncio.Event()
+
+    async def compute():
+        calls.append(1)
+        await release.wait()
+        return {"value": 1}
+
+    tasks = [asyncio.create_task(two_tier.get_or_compute("key", compute)) for _ in range(3)]
+    await wait_coalesced(two_tier, 2)
+    release.set()
+
+    assert await asyncio.gather(*tasks) == [{"value": 1}] * 3
+    assert len(calls) == 1
+    assert two_tier.counters["coalesced"] == 2
+    # Результат записан в Redis
+    assert await async_cache.get("key") == {"value": 1}
+
+
+@pytest.mark.asyncio
+async def test_waiter_recomputes_when_computing_caller_is_cancelled(two_tier):
+    started = asyncio.Event()
+    calls = []
+
+    async def slow():
+        calls.append("slow")
+        started.set()
+        await asyncio.Event().wait()
+
+    async def fast():
+        calls.append("fast")
+        return "value"
+
+    first = asyncio.create_task(two_tier.get_or_compute("key", slow))
+    await started.wait()
+    second = asyncio.create_task(two_tier.get_or_compute("key", fast))
+    await wait_coalesced(two_tier, 1)
+
+    # Клиент первого запроса отключился
+    first.cancel()
+
+    assert await second == "value"
+    assert first.cancelled()
+    assert calls == ["slow", "fast"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_computation(two_tier):
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def compute():
+        started.set()
+        await release.wait()
+        return "value"
+
+    first = asyncio.create_task(two_tier.get_or_compute("key", compute))
+    await started.wait()
+    waiter = asyncio.create_task(two_tier.get_or_compute("key", compute))
+    await wait_coalesced(two_tier, 1)
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    release.set()
+
+    assert await first == "value"
@@ -14,10 +14,18 @@ import {
 } from "react-icons/fi";
 import { useState, useRef, useEffect } from "react";
 import axios from "axios";
-import { getApiUrls } from "../config/api";
+import { buildApiUrl, getApiUrls } from "../config/api";
 import { useAuth } from "../contexts/AuthContext";
 import "../styles/Navbar.css";
 
+// Интервал опроса статуса фоновой задачи анализа заметок
+const ANALYZE_POLL_INTERVAL_MS = 2000;
+
+interface AnalyzeTaskStatus {
+  status: "PENDING" | "PROGRESS" | "SUCCESS" | "FAILURE" | "REVOKED";
+  error?: string;
+}
+
 interface NavbarProps {
   user?: {
     username?: string;
@@ -30,10 +38,21 @@ const Navbar: React.FC<NavbarProps> = ({ user }) => {
   const location = useLocation();
   const [isMobileMenuOpen, setIsMobileMenuOpen] = useState(false);
   const [isAnalyzing, setIsAnalyzing] = useState(false);
+  const [analyzeError, setAnalyzeError] = useState<string | null>(null);
   const [profileOpen, setProfileOpen] = useState(false);
   const { logout } = useAuth();
 
   const profileRef = useRef<HTMLDivElement | null>(null);
+  const analyzePollRef = useRef<number | null>(null);
+
+  // Останавливаем опрос статуса анализа при размонтировании
+  useEffect(() => {
+    return () => {
+      if (analyzePollRef.current !== null) {
+        window.clearTimeout(analyzePollRef.current);
+      }
+    };
+  }, []);
 
   useEffect(() => {
     const handleClickOutside = (e: MouseEvent) => {
@@ -64,15 +83,47 @@ const Navbar: React.FC<NavbarProps> = ({ user }) => {
 
   const handleAnalyzeNotes = async () => {
     if (isAnalyzing) return;
+
+    const fail = (message: string, err?: unknown) => {
+      console.error("Ошибка анализа заметок", err ?? message);
+      setAnalyzeError(message);
+      setIsAnalyzing(false);
+    };
+
     try {
       setIsAnalyzing(true);
+      setAnalyzeError(null);
       const apiUrls = getApiUrls();
-      await axios.post(apiUrls.notesAnalyzeAll, {}, { withCredentials: true });
-      // После анализа перезагружаем страницу, чтобы подтянуть обновленные данные
-      window.location.reload();
+      // Анализ выполняется в фоне: ответ 202 содержит адрес статуса задачи
+      const { data } = await axios.post(
+        apiUrls.notesAnalyzeAll,
+        {},
+        { withCredentials: true }
+      );
+      const statusUrl = buildApiUrl(data.status_url);
+
+      const poll = async () => {
+        try {
+          const { data: task } = await axios.get<AnalyzeTaskStatus>(statusUrl, {
+            withCredentials: true,
+          });
+          if (task.status === "SUCCESS") {
+            // После завершения анализа перезагружаем страницу, чтобы подтянуть обновленные данные
+            window.location.reload();
+            return;
+          }
+          if (task.status === "FAILURE" || task.status === "REVOKED") {
+            fail(task.error || "Analysis failed");
+            return;
+          }
+          analyzePollRef.current = window.setTimeout(poll, ANALYZE_POLL_INTERVAL_MS);
+        } catch (err) {
+          fail("Could not get analysis status", err);
+        }
+      };
+      await poll();
     } catch (err) {
-      console.error("Ошибка анализа заметок", err);
-      setIsAnalyzing(false);
+      fail("Could not start analysis", err);
     }
   };
 
@@ -176,9 +227,10 @@ const Navbar: React.FC<NavbarProps> = ({ user }) => {
                   <button
                     onClick={handleAnalyzeNotes}
                     disabled={isAnalyzing}
+                    title={analyzeError ?? undefined}
                     className={`nav-btn analyze-btn ${
                       isAnalyzing ? "disabled" : ""
-                    }`}
+                    } ${analyzeError ? "analyze-btn-error" : ""}`}
                   >
                     {isAnalyzing ? (
                       <svg
@@ -212,7 +264,11 @@ const Navbar: React.FC<NavbarProps> = ({ user }) => {
                       </motion.div>
                     )}
                     <span className="relative z-10 whitespace-nowrap">
-                      {isAnalyzing ? "Analyzing..." : "Analyze"}
+                      {isAnalyzing
+                        ? "Analyzing..."
+                        : analyzeError
+                          ? "Analysis failed, retry"
+                          : "Analyze"}
                     </span>
                   </button>
                 </motion.div>
@@ -394,9 +450,10 @@ const Navbar: React.FC<NavbarProps> = ({ user }) => {
                     toggleMobileMenu();
                   }}
                   disabled={isAnalyzing}
+                  title={analyzeError ?? undefined}
                   className={`nav-btn analyze-btn ${
                     isAnalyzing ? "disabled" : ""
-                  }`}
+                  } ${analyzeError ? "analyze-btn-error" : ""}`}
                 >
                   {isAnalyzing ? (
                     <svg
@@ -430,7 +487,11 @@ const Navbar: React.FC<NavbarProps> = ({ user }) => {
                     </motion.div>
                   )}
                   <span className="relative z-10">
-                    {isAnalyzing ? "Analyzing..." : "Analyze"}
+                    {isAnalyzing
+                      ? "Analyzing..."
+                      : analyzeError
+                        ? "Analysis failed, retry"
+                        : "Analyze"}
                   </span>
                 </button>
               </motion.div>